@@ -1,5 +1,7 @@
 from django.contrib import admin
 from .models import Profile, UserVideoHistory, Bookmark
+from utils.export import export_action
+from utils.pagination import EstimatedCountPaginator
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
@@ -14,6 +16,11 @@ class UserVideoHistoryAdmin(admin.ModelAdmin):
     list_filter = ('completed', 'watch_date')
     search_fields = ('user__user__username', 'video__title')
     date_hierarchy = 'watch_date'
+    list_select_related = ('user__user', 'video')
+    raw_id_fields = ('user', 'video')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [export_action('history', 'csv'), export_action('history', 'jsonl')]
 
 @admin.register(Bookmark)
 class BookmarkAdmin(admin.ModelAdmin):
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookmark',
+            index=models.Index(fields=['user', '-date_added'], name='bookmark_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uservideohistory',
+            index=models.Index(fields=['user', '-watch_date'], name='history_user_date_idx'),
+        ),
+    ]
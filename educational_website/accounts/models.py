@@ -1,12 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
+from utils import images
 
 class Profile(models.Model):
     """Profil utilisateur étendu"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     avatar = models.ImageField(upload_to='profile_avatars/', blank=True, null=True)
+    # Empreinte de l'avatar dans le cache d'images (utils.images), variantes redimensionnées
+    avatar_hash = models.CharField(max_length=64, blank=True, editable=False)
     bio = models.TextField(max_length=500, blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
     phone_number = models.CharField(max_length=20, blank=True)
@@ -42,6 +45,9 @@ class UserVideoHistory(models.Model):
         verbose_name_plural = "User video histories"
         ordering = ['-watch_date']
         unique_together = ['user', 'video', 'watch_date']
+        indexes = [
+            models.Index(fields=['user', '-watch_date'], name='history_user_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.user.username} - {self.video.title}"
@@ -56,6 +62,9 @@ class Bookmark(models.Model):
     class Meta:
         ordering = ['-date_added']
         unique_together = ['user', 'video']
+        indexes = [
+            models.Index(fields=['user', '-date_added'], name='bookmark_user_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.video.title}"
@@ -71,3 +80,11 @@ def save_user_profile(sender, instance, **kwargs):
     """Sauvegarde le profil quand l'utilisateur est sauvegardé"""
     instance.profile.save()
 
+@receiver(pre_save, sender=Profile)
+def cache_profile_avatar(sender, instance, raw=False, **kwargs):
+    """Met en cache un nouvel avatar et lance la génération de ses variantes"""
+    if not raw:
+        # Variantes dans la zone protégée : un avatar n'est pas public
+        digest = images.hash_upload(instance.avatar, private=True)
+        if digest is not None:
+            instance.avatar_hash = digest
@@ -1,5 +1,8 @@
+import json
+
 from django.contrib import admin
-from .models import StaticPage, SiteConfiguration, FAQ, ContactMessage
+from django.utils.html import format_html
+from .models import StaticPage, SiteConfiguration, FAQ, ContactMessage, ProfilingReport
 
 @admin.register(StaticPage)
 class StaticPageAdmin(admin.ModelAdmin):
@@ -60,3 +63,32 @@ class ContactMessageAdmin(admin.ModelAdmin):
     
     actions = [mark_as_read, mark_as_unread]
 
+@admin.register(ProfilingReport)
+class ProfilingReportAdmin(admin.ModelAdmin):
+    list_display = ('label', 'created_at', 'duration_ms', 'query_count', 'slow_query_count')
+    list_filter = ('created_at',)
+    search_fields = ('label',)
+    date_hierarchy = 'created_at'
+    fields = ('label', 'created_at', 'duration_ms', 'query_count', 'profile_file',
+              'slow_queries_display', 'top_functions_display', 'allocations_display')
+    readonly_fields = fields
+    
+    def has_add_permission(self, request):
+        # Les rapports sont produits par le middleware ou les commandes
+        return False
+    
+    def slow_query_count(self, obj):
+        return len(obj.slow_queries)
+    slow_query_count.short_description = "Requêtes lentes"
+    
+    def slow_queries_display(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.slow_queries, indent=2))
+    slow_queries_display.short_description = "Requêtes lentes"
+    
+    def top_functions_display(self, obj):
+        return format_html('<pre>{}</pre>', obj.top_functions)
+    top_functions_display.short_description = "Profil (cumulatif)"
+    
+    def allocations_display(self, obj):
+        return format_html('<pre>{}</pre>', obj.allocations)
+    allocations_display.short_description = "Allocations mémoire"
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from utils.query_cache import install_write_tracker
+
+        # Toute écriture SQL invalide les requêtes mises en cache sur la table touchée
+        connection_created.connect(install_write_tracker)
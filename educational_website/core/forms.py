@@ -1,4 +1,7 @@
+import datetime
+
 from django import forms
+from django.utils import timezone
 from .models import ContactMessage
 
 class ContactForm(forms.ModelForm):
@@ -24,3 +27,93 @@ class SearchForm(forms.Form):
         })
     )
     category = forms.CharField(required=False, widget=forms.HiddenInput())
+    mode = forms.ChoiceField(
+        choices=(('', 'Titres et descriptions'), ('transcript', 'Dans les vidéos (transcriptions)')),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+
+class ListingFilterForm(forms.Form):
+    """Tri et filtres des listes de vidéos (recherche, pages de catégorie)
+
+    Chaque tri correspond à un index de VideoCard (global et par catégorie),
+    et aux colonnes du snapshot du catalogue (utils.catalog_snapshot).
+    """
+    # Valeur du paramètre -> tri (noms des champs de VideoCard et des colonnes du snapshot)
+    SORTS = {
+        '': '-publish_date',
+        'views': '-views_count',
+        'likes': '-likes_count',
+        'shortest': 'duration',
+        'longest': '-duration',
+    }
+    # Durées en secondes : [min, max[
+    DURATIONS = {
+        'short': (None, 4 * 60),
+        'medium': (4 * 60, 20 * 60),
+        'long': (20 * 60, None),
+    }
+    PUBLISHED = {
+        'day': datetime.timedelta(days=1),
+        'week': datetime.timedelta(days=7),
+        'month': datetime.timedelta(days=30),
+        'year': datetime.timedelta(days=365),
+    }
+
+    sort = forms.ChoiceField(
+        choices=(('', 'Plus récentes'), ('views', 'Plus vues'), ('likes', 'Plus aimées'),
+                 ('shortest', 'Plus courtes'), ('longest', 'Plus longues')),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    duration = forms.ChoiceField(
+        choices=(('', 'Toutes durées'), ('short', 'Moins de 4 min'), ('medium', '4 à 20 min'),
+                 ('long', 'Plus de 20 min')),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    published = forms.ChoiceField(
+        choices=(('', 'Toutes dates'), ('day', "Aujourd'hui"), ('week', 'Cette semaine'),
+                 ('month', 'Ce mois-ci'), ('year', 'Cette année')),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+
+    def __init__(self, data=None, **kwargs):
+        super().__init__(data, **kwargs)
+        # Paramètres invalides : liste par défaut plutôt qu'une erreur
+        self.options = self.cleaned_data if self.is_valid() else {'sort': '', 'duration': '', 'published': ''}
+
+    def key(self):
+        """Valeurs des options, pour les clés de cache"""
+        return (self.options['sort'], self.options['duration'], self.options['published'])
+
+    def order_by(self):
+        return self.SORTS[self.options['sort']]
+
+    def filters(self):
+        """Filtres au format de CatalogSnapshot.query()"""
+        filters = {}
+        min_duration, max_duration = self.DURATIONS.get(self.options['duration'], (None, None))
+        if self.options['sort'] in ('shortest', 'longest') and min_duration is None:
+            # Trier par durée n'a de sens que pour les vidéos dont la durée est connue
+            min_duration = 0
+        if min_duration is not None:
+            filters['min_duration'] = min_duration
+        if max_duration is not None:
+            filters['max_duration'] = max_duration
+        if self.options['published']:
+            filters['published_after'] = timezone.now() - self.PUBLISHED[self.options['published']]
+        return filters
+
+    def apply(self, queryset):
+        """Mêmes filtres et tri sur un queryset de VideoCard"""
+        filters = self.filters()
+        if 'min_duration' in filters:
+            queryset = queryset.filter(duration__gte=datetime.timedelta(seconds=filters['min_duration']))
+        if 'max_duration' in filters:
+            queryset = queryset.filter(duration__lt=datetime.timedelta(seconds=filters['max_duration']))
+        if 'published_after' in filters:
+            queryset = queryset.filter(publish_date__gte=filters['published_after'])
+        return queryset.order_by(self.order_by())
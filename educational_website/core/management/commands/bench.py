@@ -0,0 +1,194 @@
+# core/management/commands/bench.py
+import json
+import re
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, NoReverseMatch
+from django.utils import timezone
+
+from payments.models import SubscriptionPlan
+from videos.models import Category, Video
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(sorted_values, pct):
+    """Percentile par interpolation linéaire d'une liste triée"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(durations, queries):
+    durations = sorted(durations)
+    return {
+        'requests': len(durations),
+        'p50_ms': percentile(durations, 50),
+        'p95_ms': percentile(durations, 95),
+        'p99_ms': percentile(durations, 99),
+        'mean_ms': sum(durations) / len(durations) if durations else None,
+        'queries_per_request': sum(queries) / len(queries) if queries else None,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the key pages and report latency percentiles and queries per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per page')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per page')
+        parser.add_argument('--pages', nargs='+', help='Only benchmark these pages')
+        parser.add_argument('--base-url', help='Drive a running server (e.g. http://127.0.0.1:8000) '
+                                               'instead of the in-process test client')
+        parser.add_argument('--concurrency', type=int, default=1, help='Parallel clients with --base-url')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare against a previous JSON result file')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_active=True, profile__isnull=False).order_by('pk').first()
+        pages = self.pages()
+        if options['pages']:
+            pages = {name: url for name, url in pages.items() if name in options['pages']}
+
+        results = {}
+        for name, url in pages.items():
+            if url is None:
+                self.stdout.write(self.style.WARNING(f'{name}: skipped (no data or URL not routed)'))
+                continue
+            if options['base_url']:
+                results[name] = self.run_http(options['base_url'] + url, options)
+            else:
+                results[name] = self.run_client(url, user, options)
+            results[name]['url'] = url
+            self.report(name, results[name])
+
+        payload = {
+            'created_at': timezone.now().isoformat(),
+            'mode': 'http' if options['base_url'] else 'client',
+            'requests_per_page': options['requests'],
+            'concurrency': options['concurrency'],
+            'dataset': {'videos': Video.objects.count(), 'categories': Category.objects.count()},
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(payload, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+        if options['baseline']:
+            self.compare(results, options['baseline'])
+
+    def pages(self):
+        """URLs des pages clés, construites à partir des données présentes"""
+        category = Category.objects.filter(videos__isnull=False).order_by('pk').first()
+        video = Video.objects.order_by('-views_count').first()
+        plan = SubscriptionPlan.objects.filter(is_active=True).order_by('pk').first()
+
+        def url(name, *args, query=''):
+            if any(arg is None for arg in args):
+                return None
+            try:
+                return reverse(name, args=args) + query
+            except NoReverseMatch:
+                return None
+
+        return {
+            'home': '/',
+            'category': url('category', category.slug if category else None),
+            'category_sorted': url('category', category.slug if category else None,
+                                   query='?sort=views&duration=medium&published=year'),
+            'search': url('search', query='?query=python'),
+            'search_sorted': url('search', query='?query=python&sort=longest&duration=long'),
+            'video_detail': url('video_detail', video.pk if video else None),
+            'profile': url('profile'),
+            'checkout': url('checkout', plan.pk if plan else None),
+        }
+
+    def run_client(self, url, user, options):
+        client = Client(HTTP_HOST='localhost')
+        if user is not None:
+            client.force_login(user)
+
+        durations, queries, statuses, error = [], [], {}, None
+        for i in range(options['warmup'] + options['requests']):
+            try:
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    elapsed = (time.perf_counter() - start) * 1000
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+                break
+            if i < options['warmup']:
+                continue
+            durations.append(elapsed)
+            queries.append(len(captured))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        return dict(summarize(durations, queries), statuses=statuses, error=error)
+
+    def run_http(self, url, options):
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=60) as response:
+                    response.read()
+                    status, headers = response.status, response.headers
+            except urllib.error.HTTPError as e:
+                status, headers = e.code, e.headers
+            elapsed = (time.perf_counter() - start) * 1000
+            # Le nombre de requêtes SQL est publié par PerformanceMetricsMiddleware
+            match = SERVER_TIMING_QUERIES.search(headers.get('Server-Timing', ''))
+            return elapsed, status, int(match.group(1)) if match else None
+
+        try:
+            for i in range(options['warmup']):
+                fetch(i)
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                samples = list(pool.map(fetch, range(options['requests'])))
+        except OSError as e:
+            raise CommandError(f'Could not reach {url}: {e}')
+
+        statuses = {}
+        for _, status, _ in samples:
+            statuses[status] = statuses.get(status, 0) + 1
+        queries = [count for _, _, count in samples if count is not None]
+        return dict(summarize([elapsed for elapsed, _, _ in samples], queries), statuses=statuses, error=None)
+
+    def report(self, name, result):
+        if result['error']:
+            self.stdout.write(self.style.ERROR(f'{name}: {result["error"]}'))
+            return
+        queries = result['queries_per_request']
+        self.stdout.write(
+            f'{name:<14} p50={result["p50_ms"]:8.1f}ms  p95={result["p95_ms"]:8.1f}ms  '
+            f'p99={result["p99_ms"]:8.1f}ms  queries={queries if queries is None else round(queries, 1)}  '
+            f'statuses={result["statuses"]}'
+        )
+
+    def compare(self, results, baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)['results']
+
+        self.stdout.write(f'\nCompared with {baseline_path}:')
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before or before.get('error') or result['error']:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'):
+                old, new = before.get(metric), result.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old * 100
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+                self.stdout.write(style(f'{name:<14} {metric:<20} {old:10.1f} -> {new:10.1f} ({change:+.0f}%)'))
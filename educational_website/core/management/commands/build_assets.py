@@ -0,0 +1,105 @@
+# core/management/commands/build_assets.py
+import gzip
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from utils.assets import build_bundle, check_vendored, missing_vendor_assets, vendor_copy, vendor_download
+from videos.models import Category, Video
+
+STATIC_REFERENCE = re.compile(r'(?:href|src)="%s([^"?#]+)' % re.escape(settings.STATIC_URL))
+
+
+def report_pages():
+    """Pages mesurées par le rapport de poids (une de chaque type)"""
+    pages = ['/']
+    category = Category.objects.filter(videos__isnull=False).order_by('pk').first()
+    if category:
+        pages.append(reverse('category', args=[category.slug]))
+    video = Video.objects.order_by('pk').first()
+    if video:
+        pages.append(reverse('video_detail', args=[video.pk]))
+    return pages
+
+
+def asset_sizes(name):
+    """Taille brute et compressée d'un fichier de STATIC_ROOT"""
+    path = Path(settings.STATIC_ROOT) / name
+    if not path.is_file():
+        return None
+    gz_path = path.with_name(path.name + '.gz')
+    raw = path.stat().st_size
+    compressed = gz_path.stat().st_size if gz_path.is_file() else len(gzip.compress(path.read_bytes()))
+    return raw, compressed
+
+
+class Command(BaseCommand):
+    help = 'Vendor third-party assets, build the minified bundles and collect hashed, precompressed static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', action='store_true',
+                            help='Download the VENDOR_ASSETS files again (integrity checked)')
+        parser.add_argument('--vendor-from', metavar='DIR',
+                            help='Copy the VENDOR_ASSETS files from a local directory (e.g. node_modules)')
+        parser.add_argument('--no-collect', action='store_true', help='Only build the bundles')
+        parser.add_argument('--report', action='store_true', help='Print the bytes transferred per page')
+        parser.add_argument('--host', default=settings.ALLOWED_HOSTS[0], help='Host header of the report requests')
+
+    def handle(self, *args, **options):
+        for name, spec in settings.VENDOR_ASSETS.items():
+            try:
+                if options['vendor']:
+                    vendor_download(name, spec)
+                elif options['vendor_from']:
+                    vendor_copy(name, spec, options['vendor_from'])
+                else:
+                    continue
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot vendor {name}: {e}')
+            self.stdout.write(f'Vendored {name}')
+
+        # Fichiers de static/vendor (versionnés) : aucun accès réseau nécessaire, empreinte vérifiée
+        missing = missing_vendor_assets()
+        for name, spec in settings.VENDOR_ASSETS.items():
+            if name not in missing:
+                try:
+                    check_vendored(name, spec)
+                except ValueError as e:
+                    raise CommandError(f'Vendored file modified: {e}')
+        if missing:
+            self.stderr.write(f'Missing vendored files: {", ".join(missing)}. Pages load them from their CDN; '
+                              'run with --vendor, or --vendor-from on a machine without network access.')
+
+        for name, sources in settings.ASSET_BUNDLES.items():
+            sources = [source for source in sources if source not in missing]
+            path = build_bundle(name, sources)
+            self.stdout.write(f'Built {name} ({path.stat().st_size} bytes from {len(sources)} files)')
+
+        if not options['no_collect']:
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.stdout.write(f'Collected hashed and precompressed files into {settings.STATIC_ROOT}')
+
+        if options['report']:
+            self.report(options['host'])
+
+    def report(self, host):
+        client = Client(HTTP_HOST=host)
+        self.stdout.write(f'\n{"page":40} {"requests":>8} {"bytes":>10} {"gzip":>10}')
+        for url in report_pages():
+            response = client.get(url)
+            html = response.content
+            requests, raw, compressed = 1, len(html), len(gzip.compress(html))
+            for name in sorted(set(STATIC_REFERENCE.findall(html.decode('utf-8', 'replace')))):
+                sizes = asset_sizes(name)
+                if sizes is None:
+                    self.stderr.write(f'{url}: {name} is not in STATIC_ROOT')
+                    continue
+                requests += 1
+                raw += sizes[0]
+                compressed += sizes[1]
+            self.stdout.write(f'{url:40} {requests:>8} {raw:>10} {compressed:>10}')
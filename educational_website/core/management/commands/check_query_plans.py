@@ -0,0 +1,128 @@
+# core/management/commands/check_query_plans.py
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from accounts.models import Profile, UserVideoHistory, Bookmark
+from core.forms import ListingFilterForm
+from payments.models import Order, UserSubscription, SubscriptionPlan
+from videos.models import Category, TranscriptPosting, Video, VideoCard
+
+
+def hot_queries():
+    """Requêtes critiques des pages clés, construites avec des valeurs réelles
+
+    Retourne une liste de (nom, queryset). Les valeurs utilisées sont prises
+    dans la base (idéalement remplie par seed_perf_data).
+    """
+    category = Category.objects.filter(videos__isnull=False).order_by('pk').first()
+    profile = Profile.objects.filter(uservideohistory__isnull=False).order_by('pk').first()
+    bookmark = Bookmark.objects.order_by('pk').first()
+    order = Order.objects.order_by('pk').first()
+    subscription = UserSubscription.objects.order_by('pk').first()
+    plan = SubscriptionPlan.objects.order_by('pk').first()
+    posting = TranscriptPosting.objects.order_by('pk').first()
+    cutoff = timezone.now() - datetime.timedelta(days=7)
+
+    queries = [
+        # Listes lues dans les fiches compactes (VideoCard), comme core.views
+        ('home.recent_videos', VideoCard.objects.order_by('-publish_date')[:12]),
+        ('home.featured_videos', VideoCard.objects.filter(featured=True).order_by('-publish_date')[:6]),
+        ('youtube.update_video_statistics', Video.objects.filter(publish_date__gte=cutoff)),
+    ]
+    if category:
+        queries.append(('category_page.videos',
+                        VideoCard.objects.filter(category=category).order_by('-publish_date')[:12]))
+    if profile:
+        queries.append(('profile.video_history',
+                        UserVideoHistory.objects.filter(user=profile).order_by('-watch_date')[:10]))
+    if bookmark:
+        queries.append(('profile.bookmarks',
+                        Bookmark.objects.filter(user_id=bookmark.user_id).order_by('-date_added')))
+    # get_or_create() et update_or_create() passent par get(), qui ignore le tri par défaut
+    if order and plan:
+        queries.append(('checkout.pending_order',
+                        Order.objects.filter(user_id=order.user_id, status='pending',
+                                             subscription_plan=plan).order_by()))
+    if subscription:
+        queries.append(('payment_success.active_subscription',
+                        UserSubscription.objects.filter(user_id=subscription.user_id, is_active=True).order_by()))
+    # Tris et filtres des listes (recherche et pages de catégorie), tels que ListingFilterForm les construit
+    listings = [{'sort': sort} for sort in ListingFilterForm.SORTS if sort] + [
+        {'duration': 'short', 'sort': 'views'},
+        {'duration': 'long', 'sort': 'longest'},
+        {'published': 'week'},
+        {'published': 'month', 'sort': 'likes'},
+    ]
+    for params in listings:
+        form = ListingFilterForm(params)
+        label = ','.join(f'{key}={value}' for key, value in sorted(params.items()))
+        queries.append((f'search.listing[{label}]', form.apply(VideoCard.objects.all())[:12]))
+        if category:
+            queries.append((f'category_page.listing[{label}]',
+                            form.apply(VideoCard.objects.filter(category=category))[:12]))
+    if posting:
+        # Recherche dans les transcriptions : une lecture d'index par terme
+        queries.append(('search.transcript_postings',
+                        TranscriptPosting.objects.filter(term=posting.term).values('transcript_id')))
+    return queries
+
+
+def plan_problems(plan, vendor):
+    """Liste les parcours complets de table et les tris hors index d'un plan"""
+    problems = []
+    if vendor == 'sqlite':
+        for line in plan.splitlines():
+            # « SCAN table » sans index = parcours complet ; « SCAN table USING INDEX » reste ordonné
+            if re.search(r'\bSCAN \w+\s*$', line):
+                problems.append('full table scan: ' + line.strip())
+            if 'USE TEMP B-TREE' in line:
+                problems.append('sort without index: ' + line.strip())
+    elif vendor == 'postgresql':
+        for line in plan.splitlines():
+            if 'Seq Scan' in line:
+                problems.append('full table scan: ' + line.strip())
+            if re.search(r'->\s*Sort\b|^\s*Sort\b', line):
+                problems.append('sort without index: ' + line.strip())
+    elif vendor == 'mysql':
+        if re.search(r'\bALL\b', plan):
+            problems.append('full table scan')
+        if 'Using filesort' in plan:
+            problems.append('sort without index')
+    return problems
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the hot queries and fail if one needs a full scan or an unindexed sort'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-analyze', action='store_false', dest='analyze',
+                            help='Keep the current planner statistics instead of refreshing them (ANALYZE)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan')
+
+    def handle(self, *args, **options):
+        # Sans statistiques (base tout juste remplie), SQLite choisit l'index du filtre plutôt que celui du tri
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        vendor = connection.vendor
+        failures = []
+        for name, queryset in hot_queries():
+            plan = queryset.explain()
+            problems = plan_problems(plan, vendor)
+            if problems:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'FAIL {name}'))
+                for problem in problems:
+                    self.stdout.write(f'     {problem}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'ok   {name}'))
+            if options['verbose_plans'] or problems:
+                self.stdout.write('     ' + plan.replace('\n', '\n     '))
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries are not supported by an index: {", ".join(failures)}')
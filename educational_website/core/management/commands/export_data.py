@@ -0,0 +1,52 @@
+# core/management/commands/export_data.py
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.export import DATASETS, FORMATS, write_export
+
+
+class Command(BaseCommand):
+    help = 'Stream a table (videos, orders, history) to a CSV or JSON Lines file in constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-',
+                            help='Output file, gzip-compressed if its name ends in .gz (default: standard output)')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output (implied by a .gz name)')
+        parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                            help='Filter the rows, e.g. status=paid or created_after=2024-01-01 (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched per round trip')
+
+    def handle(self, *args, **options):
+        filters = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Invalid filter {item!r}: expected NAME=VALUE')
+            filters[name] = value
+        compress = options['gzip'] or options['output'].endswith('.gz')
+
+        start = time.perf_counter()
+        try:
+            if options['output'] == '-':
+                written = write_export(options['dataset'], sys.stdout.buffer, options['format'], filters,
+                                       compress=compress, chunk_size=options['chunk_size'])
+                sys.stdout.buffer.flush()
+            else:
+                with open(options['output'], 'wb') as output:
+                    written = write_export(options['dataset'], output, options['format'], filters,
+                                           compress=compress, chunk_size=options['chunk_size'])
+        except BrokenPipeError:
+            # Output piped to a command that stopped reading (e.g. head): not an error
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'Exported {options["dataset"]} to {options["output"]} '
+                f'({written / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s)'))
@@ -0,0 +1,144 @@
+# core/management/commands/prerender_site.py
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max
+from django.test import Client
+from django.urls import reverse
+
+from core.models import SiteConfiguration, StaticPage, FAQ
+from utils.http_cache import most_recent
+from videos.models import Category, Video
+
+MANIFEST = 'manifest.json'
+
+
+def page_versions():
+    """Pages publiques à pré-générer, avec la date de dernière modification de leur contenu
+
+    Les dates suivent les fonctions last_modified des vues (core.views,
+    videos.views) et sont calculées en quelques requêtes groupées.
+    Retourne un dictionnaire {url: datetime}.
+    """
+    config = SiteConfiguration.objects.values_list('updated_at', flat=True).first()
+    categories = {
+        pk: (slug, most_recent(updated_at, latest_video))
+        for pk, slug, updated_at, latest_video in
+        Category.objects.annotate(latest_video=Max('videos__updated_at'))
+        .values_list('pk', 'slug', 'updated_at', 'latest_video')
+    }
+
+    pages = {'/': most_recent(config, *(changed for _, changed in categories.values()))}
+    for slug, changed in categories.values():
+        pages[reverse('category', args=[slug])] = most_recent(config, changed)
+    # La page d'une vidéo liste aussi les dernières vidéos de sa catégorie
+    for pk, category_id in Video.objects.values_list('pk', 'category_id').iterator(chunk_size=5000):
+        pages[reverse('video_detail', args=[pk])] = categories[category_id][1]
+    for slug, updated_at in StaticPage.objects.filter(is_published=True).values_list('slug', 'updated_at'):
+        pages[reverse('static_page', args=[slug])] = most_recent(config, updated_at)
+    pages[reverse('faq')] = most_recent(config, FAQ.objects.aggregate(latest=Max('updated_at'))['latest'])
+    return pages
+
+
+def output_path(root, url):
+    """Fichier servi par nginx pour une URL (« /a/b/ » -> « a/b/index.html »)"""
+    return Path(root) / url.strip('/') / 'index.html'
+
+
+def write_atomic(path, data, mtime):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_bytes(data)
+    # nginx envoie la date du fichier comme Last-Modified
+    os.utime(tmp_path, (mtime, mtime))
+    os.replace(tmp_path, path)
+
+
+def render_pages(root, host, pages):
+    """Génère une liste de pages dans un processus du pool
+
+    Retourne une liste de (url, erreur ou None).
+    """
+    client = Client(HTTP_HOST=host)
+    results = []
+    for url, mtime in pages:
+        try:
+            response = client.get(url)
+            if response.status_code != 200:
+                raise ValueError(f'HTTP {response.status_code}')
+            path = output_path(root, url)
+            write_atomic(path, response.content, mtime)
+            # Variante précompressée pour gzip_static
+            write_atomic(path.with_name(path.name + '.gz'), gzip.compress(response.content, 9, mtime=mtime), mtime)
+            results.append((url, None))
+        except Exception as e:
+            results.append((url, f'{type(e).__name__}: {e}'))
+    connections.close_all()
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the public catalog pages to static files (with .gz variants) for nginx'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.PRERENDER_DIR, help='Output directory')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Rendering processes')
+        parser.add_argument('--batch-size', type=int, default=200, help='Pages rendered per task')
+        parser.add_argument('--host', default=settings.ALLOWED_HOSTS[0], help='Host header of the requests')
+        parser.add_argument('--full', action='store_true', help='Re-render every page, not only the changed ones')
+
+    def handle(self, *args, **options):
+        root = Path(options['output'])
+        root.mkdir(parents=True, exist_ok=True)
+        manifest_path = root / MANIFEST
+        manifest = {}
+        if manifest_path.exists() and not options['full']:
+            manifest = json.loads(manifest_path.read_text())
+
+        pages = {url: changed.timestamp() if changed else 0 for url, changed in page_versions().items()}
+        stale = [(url, mtime) for url, mtime in pages.items()
+                 if manifest.get(url) != mtime or not output_path(root, url).exists()]
+        removed = [url for url in manifest if url not in pages]
+        self.stdout.write(f'{len(pages)} pages, {len(stale)} to render, {len(removed)} to remove')
+
+        start = time.perf_counter()
+        failed = {}
+        if stale:
+            batch_size = options['batch_size']
+            batches = [stale[i:i + batch_size] for i in range(0, len(stale), batch_size)]
+            # Les processus forkés ne doivent pas partager les connexions ouvertes du parent
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                for results in pool.map(render_pages, [root] * len(batches),
+                                        [options['host']] * len(batches), batches):
+                    for url, error in results:
+                        if error:
+                            failed[url] = error
+                            self.stderr.write(f'{url}: {error}')
+                        else:
+                            manifest[url] = pages[url]
+
+        for url in removed:
+            path = output_path(root, url)
+            for file in (path, path.with_name(path.name + '.gz')):
+                if file.exists():
+                    file.unlink()
+            del manifest[url]
+
+        for url in failed:
+            manifest.pop(url, None)
+        tmp_path = root / f'.{MANIFEST}.tmp'
+        tmp_path.write_text(json.dumps(manifest, indent=0, sort_keys=True))
+        os.replace(tmp_path, manifest_path)
+
+        elapsed = time.perf_counter() - start
+        rendered = len(stale) - len(failed)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {rendered} pages in {elapsed:.1f}s, removed {len(removed)}, {len(failed)} failed'))
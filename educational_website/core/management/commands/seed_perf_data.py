@@ -0,0 +1,220 @@
+# core/management/commands/seed_perf_data.py
+import datetime
+import random
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Profile, UserVideoHistory, Bookmark
+from payments.models import PaymentMethod, SubscriptionPlan, Order, UserSubscription
+from videos.models import Category, Subcategory, Video, VideoCard
+
+# Every generated row is tagged with this prefix so it can be removed with --clear
+PREFIX = 'perf'
+
+WORDS = (
+    'python javascript django programming code coding developer html css framework algorithm '
+    'ecommerce shop marketplace shopify amazon selling digital marketing entertainment funny '
+    'comedy movie music game gaming tutorial course lesson beginner advanced project api '
+    'database design pattern deploy server performance cache query index test debug'
+).split()
+
+
+def chunks(iterable, size):
+    """Découpe un itérable en listes de taille `size`"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic production-scale dataset for performance work'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--videos', type=int, default=200000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--subcategories', type=int, default=5, help='Subcategories per category')
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--history', type=int, default=5000000, help='UserVideoHistory rows')
+        parser.add_argument('--bookmarks', type=int, default=500000)
+        parser.add_argument('--orders', type=int, default=200000)
+        parser.add_argument('--subscriptions', type=int, default=50000)
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiply every volume, e.g. 0.01 for a quick dataset')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+
+        def volume(name):
+            return max(1, int(options[name] * options['scale']))
+
+        if options['clear']:
+            self.clear()
+
+        categories = self.seed_categories(volume('categories'), options['subcategories'])
+        video_ids = self.seed_videos(volume('videos'), categories)
+        user_ids, profile_ids = self.seed_users(volume('users'))
+        self.seed_history(volume('history'), profile_ids, video_ids)
+        self.seed_bookmarks(volume('bookmarks'), user_ids, video_ids)
+        self.seed_orders(volume('orders'), volume('subscriptions'), user_ids)
+
+        self.stdout.write(self.style.SUCCESS('Performance dataset ready'))
+
+    def log(self, message):
+        self.stdout.write(f'{timezone.now():%H:%M:%S} {message}')
+
+    def bulk_create(self, model, objects, **kwargs):
+        created = 0
+        for chunk in chunks(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, batch_size=self.batch_size, **kwargs)
+            created += len(chunk)
+        self.log(f'{model.__name__}: {created} rows')
+
+    def text(self, min_words, max_words):
+        return ' '.join(self.random.choices(WORDS, k=self.random.randint(min_words, max_words)))
+
+    def clear(self):
+        self.log('Deleting previously generated data')
+        UserVideoHistory.objects.filter(user__user__username__startswith=f'{PREFIX}_').delete()
+        Bookmark.objects.filter(user__username__startswith=f'{PREFIX}_').delete()
+        UserSubscription.objects.filter(user__username__startswith=f'{PREFIX}_').delete()
+        Order.objects.filter(user__username__startswith=f'{PREFIX}_').delete()
+        User.objects.filter(username__startswith=f'{PREFIX}_').delete()
+        Video.objects.filter(youtube_id__startswith=PREFIX).delete()
+        Category.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+
+    def seed_categories(self, count, subcategories_per_category):
+        self.bulk_create(Category, (
+            Category(name=f'Category {i}', slug=f'{PREFIX}-category-{i}', description=self.text(10, 30))
+            for i in range(count)
+        ), ignore_conflicts=True)
+        categories = list(Category.objects.filter(slug__startswith=f'{PREFIX}-'))
+
+        self.bulk_create(Subcategory, (
+            Subcategory(category=category, name=f'{category.name} / {j}', slug=f'{PREFIX}-sub-{j}')
+            for category in categories
+            for j in range(subcategories_per_category)
+        ), ignore_conflicts=True)
+        return categories
+
+    def seed_videos(self, count, categories):
+        subcategories = {}
+        for subcategory in Subcategory.objects.filter(category__in=categories):
+            subcategories.setdefault(subcategory.category_id, []).append(subcategory.pk)
+        start = Video.objects.filter(youtube_id__startswith=PREFIX).count()
+
+        def videos():
+            for i in range(start, start + count):
+                category = self.random.choice(categories)
+                subcategory_ids = subcategories.get(category.pk, [])
+                yield Video(
+                    category=category,
+                    subcategory_id=self.random.choice(subcategory_ids) if subcategory_ids and self.random.random() < 0.3 else None,
+                    title=self.text(3, 10).capitalize(),
+                    # Descriptions volumineuses, comme celles importées de YouTube
+                    description=self.text(100, 400),
+                    youtube_id=f'{PREFIX}{i:011d}',
+                    thumbnail_url=f'https://i.ytimg.com/vi/{PREFIX}{i:011d}/hqdefault.jpg',
+                    duration=datetime.timedelta(seconds=self.random.randint(30, 3 * 3600)),
+                    publish_date=self.now - datetime.timedelta(minutes=self.random.randint(0, 5 * 365 * 24 * 60)),
+                    views_count=int(self.random.paretovariate(1.2) * 100),
+                    likes_count=int(self.random.paretovariate(1.5) * 10),
+                    featured=self.random.random() < 0.01,
+                )
+
+        self.bulk_create(Video, videos())
+        video_ids = list(Video.objects.filter(youtube_id__startswith=PREFIX).values_list('id', flat=True))
+        # bulk_create n'envoie pas post_save : les fiches lues par les listes sont construites ici
+        cards = VideoCard.objects.refresh(video_ids, chunk_size=self.batch_size)
+        self.log(f'VideoCard: {cards} rows')
+        return video_ids
+
+    def seed_users(self, count):
+        # Un seul hachage pour tous les comptes : le hachage est volontairement lent
+        password = make_password('perf-password')
+        start = User.objects.filter(username__startswith=f'{PREFIX}_').count()
+
+        self.bulk_create(User, (
+            User(username=f'{PREFIX}_user_{i}', email=f'{PREFIX}_user_{i}@example.com', password=password)
+            for i in range(start, start + count)
+        ))
+        user_ids = list(User.objects.filter(username__startswith=f'{PREFIX}_').values_list('id', flat=True))
+
+        # bulk_create n'envoie pas post_save : les profils sont créés ici
+        existing = set(Profile.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        self.bulk_create(Profile, (Profile(user_id=user_id) for user_id in user_ids if user_id not in existing))
+        profile_ids = list(Profile.objects.filter(user__username__startswith=f'{PREFIX}_').values_list('id', flat=True))
+        return user_ids, profile_ids
+
+    def seed_history(self, count, profile_ids, video_ids):
+        self.bulk_create(UserVideoHistory, (
+            UserVideoHistory(
+                user_id=self.random.choice(profile_ids),
+                video_id=self.random.choice(video_ids),
+                watch_duration=self.random.randint(5, 3600),
+                completed=self.random.random() < 0.4,
+            )
+            for _ in range(count)
+        ), ignore_conflicts=True)
+
+    def seed_bookmarks(self, count, user_ids, video_ids):
+        self.bulk_create(Bookmark, (
+            Bookmark(user_id=self.random.choice(user_ids), video_id=self.random.choice(video_ids))
+            for _ in range(count)
+        ), ignore_conflicts=True)
+
+    def seed_orders(self, order_count, subscription_count, user_ids):
+        for code, name in (('stripe', 'Stripe'), ('paypal', 'PayPal'), ('cod', 'Paiement à la livraison')):
+            PaymentMethod.objects.get_or_create(code=code, defaults={'name': name})
+        for code, name, price, days in (('monthly', 'Mensuel', '9.99', 30),
+                                        ('quarterly', 'Trimestriel', '24.99', 90),
+                                        ('yearly', 'Annuel', '89.99', 365)):
+            SubscriptionPlan.objects.get_or_create(code=code, defaults={
+                'name': name, 'price': Decimal(price), 'duration_days': days,
+                'description': name, 'features': 'Accès premium',
+            })
+        plans = list(SubscriptionPlan.objects.all())
+        payment_method_ids = list(PaymentMethod.objects.values_list('id', flat=True))
+        statuses = [code for code, _ in Order.STATUS_CHOICES]
+
+        def orders():
+            for _ in range(order_count):
+                plan = self.random.choice(plans)
+                yield Order(
+                    user_id=self.random.choice(user_ids),
+                    subscription_plan=plan,
+                    payment_method_id=self.random.choice(payment_method_ids),
+                    status=self.random.choices(statuses, weights=[20, 5, 60, 2, 2, 8, 3])[0],
+                    amount=plan.price,
+                )
+
+        self.bulk_create(Order, orders())
+
+        def subscriptions():
+            for _ in range(subscription_count):
+                plan = self.random.choice(plans)
+                start_date = self.now - datetime.timedelta(days=self.random.randint(0, 2 * 365))
+                end_date = start_date + datetime.timedelta(days=plan.duration_days)
+                yield UserSubscription(
+                    user_id=self.random.choice(user_ids),
+                    subscription_plan=plan,
+                    start_date=start_date,
+                    end_date=end_date,
+                    is_active=end_date > self.now,
+                )
+
+        self.bulk_create(UserSubscription, subscriptions())
@@ -0,0 +1,76 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from utils import metrics
+from utils.profiling import profiled, save_report
+
+
+def route_name(request):
+    """Nom de route stable (faible cardinalité) pour les métriques"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class PerformanceMetricsMiddleware:
+    """Mesure la durée des requêtes (totale, base de données, templates, cache)
+
+    Ajoute un en-tête Server-Timing à chaque réponse et alimente les
+    histogrammes exposés par la vue /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.begin_request()
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.db_wrapper))
+            response = self.get_response(request)
+
+        total = time.perf_counter() - start
+        metrics.end_request(route_name(request), request.method, response.status_code, total)
+        response['Server-Timing'] = metrics.server_timing(stats, total)
+        return response
+
+
+class ProfilingMiddleware:
+    """Profilage à la demande d'une requête
+
+    Activé pour le staff avec l'en-tête « X-Profile: 1 » ou le paramètre
+    « ?_profile=1 », ou pour un échantillon de requêtes selon
+    PROFILING_SAMPLE_RATE. L'en-tête X-Profile-Report n'est envoyé qu'au staff
+    qui l'a demandé. Doit être placé après AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def requested_by_staff(self, request):
+        if request.headers.get('X-Profile') != '1' and request.GET.get('_profile') != '1':
+            return False
+        # Session lue seulement si demandé : sinon toutes les réponses auraient « Vary: Cookie »
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def __call__(self, request):
+        requested = self.requested_by_staff(request)
+        sampled = settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE
+        if not requested and not sampled:
+            return self.get_response(request)
+
+        with profiled(f'{request.method} {request.path}') as result:
+            response = self.get_response(request)
+        report = save_report(result)
+        # Requêtes échantillonnées (visiteurs compris) : rapport consultable dans l'admin seulement
+        if requested:
+            response['X-Profile-Report'] = str(report.pk)
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilingReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('duration_ms', models.FloatField()),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('slow_queries', models.JSONField(blank=True, default=list, help_text='Requêtes lentes avec leur plan EXPLAIN')),
+                ('top_functions', models.TextField(blank=True)),
+                ('allocations', models.TextField(blank=True, help_text='Résumé tracemalloc des allocations')),
+                ('profile_file', models.CharField(blank=True, help_text='Fichier .prof (pstats, snakeviz)', max_length=500)),
+            ],
+            options={
+                'verbose_name': 'Rapport de profilage',
+                'verbose_name_plural': 'Rapports de profilage',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
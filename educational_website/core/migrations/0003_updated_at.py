@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_profilingreport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faq',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='siteconfiguration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,5 +1,11 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.text import slugify
+from utils.query_cache import CachingManager
+from utils.cache import invalidate
+from utils import cdn
+from utils.http_cache import SITE_KEY
 
 class StaticPage(models.Model):
     """Pages statiques du site (à propos, contact, etc.)"""
@@ -45,6 +51,7 @@ class SiteConfiguration(models.Model):
     show_trending_videos = models.BooleanField(default=True)
     videos_per_page = models.PositiveIntegerField(default=12)
     enable_comments = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     # Un seul enregistrement autorisé
     class Meta:
@@ -60,6 +67,12 @@ class SiteConfiguration(models.Model):
             return
         super().save(*args, **kwargs)
 
+@receiver(post_save, sender=SiteConfiguration)
+def invalidate_site_config(sender, **kwargs):
+    """La configuration est mise en cache par get_site_config() et affichée sur toutes les pages"""
+    invalidate('config')
+    cdn.purge(SITE_KEY)
+
 class FAQ(models.Model):
     """Questions fréquemment posées"""
     question = models.CharField(max_length=255)
@@ -67,6 +80,9 @@ class FAQ(models.Model):
     category = models.CharField(max_length=100, blank=True)
     order = models.PositiveIntegerField(default=0)
     is_published = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CachingManager()
     
     class Meta:
         ordering = ['order', 'question']
@@ -91,3 +107,35 @@ class ContactMessage(models.Model):
     def __str__(self):
         return f"{self.name} - {self.subject}"
 
+class ProfilingReport(models.Model):
+    """Rapport de profilage d'une requête ou d'une commande"""
+    label = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    slow_queries = models.JSONField(default=list, blank=True, help_text="Requêtes lentes avec leur plan EXPLAIN")
+    top_functions = models.TextField(blank=True)
+    allocations = models.TextField(blank=True, help_text="Résumé tracemalloc des allocations")
+    profile_file = models.CharField(max_length=500, blank=True, help_text="Fichier .prof (pstats, snakeviz)")
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Rapport de profilage"
+        verbose_name_plural = "Rapports de profilage"
+    
+    def __str__(self):
+        return f"{self.label} ({self.duration_ms:.0f} ms)"
+
+@receiver(post_save, sender=FAQ)
+@receiver(post_delete, sender=FAQ)
+def purge_faq_pages(sender, instance, raw=False, **kwargs):
+    """Les FAQ sont affichées sur les pages FAQ et contact"""
+    if not raw:
+        cdn.purge('faq')
+
+@receiver(post_save, sender=StaticPage)
+@receiver(post_delete, sender=StaticPage)
+def purge_static_page(sender, instance, raw=False, **kwargs):
+    """Retire la page statique du CDN"""
+    if not raw:
+        cdn.purge(cdn.page_key(instance.pk))
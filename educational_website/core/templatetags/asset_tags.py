@@ -0,0 +1,25 @@
+# core/templatetags/asset_tags.py
+from django import template
+from django.conf import settings
+from django.utils.html import format_html_join
+
+from utils.assets import missing_vendor_assets
+
+register = template.Library()
+
+TAGS = {
+    'css': '<link rel="stylesheet" href="{}" integrity="{}" crossorigin="anonymous">',
+    'js': '<script src="{}" integrity="{}" crossorigin="anonymous"></script>',
+}
+
+
+@register.simple_tag
+def vendor_fallback(kind):
+    """Balises des fichiers tiers absents de static/vendor, chargés depuis leur CDN (empreinte SRI vérifiée)
+
+    Placée avant le bundle qui les aurait contenus : {% vendor_fallback 'css' %}
+    """
+    specs = [settings.VENDOR_ASSETS[name] for name in missing_vendor_assets() if name.endswith(f'.{kind}')]
+    if not specs:
+        return ''
+    return format_html_join('\n    ', TAGS[kind], ((spec['url'], spec['integrity']) for spec in specs))
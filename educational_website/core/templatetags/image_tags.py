@@ -0,0 +1,34 @@
+# core/templatetags/image_tags.py
+from django import template
+from django.conf import settings
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from utils import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_url(digest, width=None, extension='jpg', private=False):
+    """URL d'une variante d'image mise en cache (par défaut la plus petite, en JPEG)
+
+    private=True pour les images de la zone protégée (avatars).
+    """
+    return images.variant_url(digest, width or settings.IMAGE_VARIANT_WIDTHS[0], extension, private)
+
+
+@register.simple_tag
+def picture(digest, sizes='100vw', private=False, **attrs):
+    """Élément <picture> : WebP pour les navigateurs qui le lisent, JPEG sinon
+
+    Les autres paramètres deviennent des attributs de <img> :
+    {% picture video.thumbnail_hash sizes="33vw" alt=video.title class="card-img-top" loading="lazy" %}
+    """
+    attrs.setdefault('decoding', 'async')
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        images.srcset(digest, 'webp', private), sizes,
+        image_url(digest, private=private), images.srcset(digest, 'jpg', private), sizes, flatatt(attrs),
+    )
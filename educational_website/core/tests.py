@@ -1,3 +1,520 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Profile, UserVideoHistory
+from core.management.commands.check_query_plans import plan_problems
+from core.models import FAQ, ProfilingReport
+from payments.models import Order, UserSubscription
+from utils import metrics, query_cache
+from utils.assets import serve_static
+from utils.profiling import profiled, prune_reports, save_report
+from utils.cache import get_or_compute, is_overloaded, make_key
+from videos.models import Category, Subcategory, Video, VideoCard
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Pages rendered without collected static files (no manifest)
+PLAIN_STATIC_STORAGES = {**settings.STORAGES,
+                         'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryCacheTests(TransactionTestCase):
+    # Outside of a transaction: cached() bypasses the cache inside atomic blocks
+
+    def setUp(self):
+        FAQ.objects.create(question='How?', answer='Like this.')
+
+    def test_cached_query_is_invalidated_by_a_write(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(len(FAQ.objects.filter(is_published=True).cached()), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(FAQ.objects.filter(is_published=True).cached()), 1)
+
+        FAQ.objects.create(question='Why?', answer='Because.')
+        with self.assertNumQueries(1):
+            self.assertEqual(len(FAQ.objects.filter(is_published=True).cached()), 2)
+
+    def test_writes_to_other_tables_keep_versions(self):
+        versions = query_cache.table_versions(['core_faq', 'django_session'])
+        Session.objects.create(session_key='k' * 32, session_data='', expire_date=timezone.now())
+        self.assertEqual(query_cache.table_versions(['core_faq', 'django_session']), versions)
+
+    def test_subquery_on_untracked_table_is_not_cached(self):
+        category = Category.objects.create(name='Maths', slug='maths')
+        subcategory = Subcategory.objects.create(category=category, name='Algebra', slug='algebra')
+        queryset = Subcategory.objects.filter(pk__in=Video.objects.values('subcategory'))
+        self.assertEqual(list(queryset.cached()), [])
+
+        Video.objects.create(category=category, subcategory=subcategory, title='Groups', description='',
+                             youtube_id='vid00000001', thumbnail_url='https://example.com/t.jpg',
+                             publish_date=timezone.now())
+        self.assertEqual(list(queryset.cached()), [subcategory])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CACHE_SLOW_COMPUTE_SECONDS=-1, CACHE_OVERLOAD_SLOW_COMPUTES=3,
+                   CACHE_COLD_KEY_WAIT=0.1)
+class GetOrComputeTests(SimpleTestCase):
+    # CACHE_SLOW_COMPUTE_SECONDS=-1: every computation counts as slow
+
+    def setUp(self):
+        cache.clear()
+
+    def test_overload_needs_several_slow_computes_and_stays_in_its_namespace(self):
+        get_or_compute('exports', ('a',), lambda: 1, ttl=60)
+        get_or_compute('exports', ('b',), lambda: 2, ttl=60)
+        self.assertFalse(is_overloaded('exports'))
+
+        with self.assertLogs('utils.cache', 'WARNING'):
+            get_or_compute('exports', ('c',), lambda: 3, ttl=60)
+        self.assertTrue(is_overloaded('exports'))
+        self.assertFalse(is_overloaded('catalog'))
+
+    def test_database_error_serves_the_stale_value(self):
+        get_or_compute('catalog', ('home',), lambda: 'old', ttl=0)
+
+        def failing():
+            raise DatabaseError('too many connections')
+
+        with self.assertLogs('utils.cache', 'WARNING'):
+            self.assertEqual(get_or_compute('catalog', ('home',), failing, ttl=60), 'old')
+        self.assertTrue(is_overloaded('catalog'))
+        # Overloaded: the stale value is served without computing
+        self.assertEqual(get_or_compute('catalog', ('home',), failing, ttl=60), 'old')
+
+    def test_cold_key_locked_elsewhere_is_computed_after_a_short_wait(self):
+        cache.add(make_key('search', 'q') + ':lock', 'other-worker', 10)
+        start = time.monotonic()
+        self.assertEqual(get_or_compute('search', ('q',), lambda: 'fresh', ttl=60), 'fresh')
+        self.assertLess(time.monotonic() - start, 1)
+
+
+class ServeMediaTests(TestCase):
+    avatar = 'profile_avatars/ab/cd/avatar.png'
+    digest = 'f' * 64
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(MEDIA_ROOT=directory.name, MEDIA_SERVE_MODE='django')
+        override.enable()
+        self.addCleanup(override.disable)
+        variant = f'private_images/ff/{self.digest}/320.jpg'
+        for name, data in ((self.avatar, b'avatar'), (variant, b'variant'), ('images/aa/video 1.jpg', bytes(range(100)))):
+            os.makedirs(os.path.join(directory.name, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(directory.name, name), 'wb') as f:
+                f.write(data)
+        self.variant = variant
+
+        self.owner = User.objects.create_user('owner', password='secret')
+        self.other = User.objects.create_user('other', password='secret')
+        # Through the profile: logging in saves user.profile again
+        self.owner.profile.avatar = self.avatar
+        self.owner.profile.avatar_hash = self.digest
+        self.owner.profile.save()
+        self.client = Client(HTTP_HOST='localhost')
+
+    def get(self, name, **headers):
+        return self.client.get('/media/' + name, **headers)
+
+    def test_range_request_is_partial(self):
+        response = self.get('images/aa/video 1.jpg', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+        self.assertEqual(self.get('images/aa/video 1.jpg', HTTP_RANGE='bytes=200-').status_code, 416)
+
+    def test_avatars_are_readable_by_their_owner_only(self):
+        for name in (self.avatar, self.variant):
+            self.assertEqual(self.get(name).status_code, 404)
+            self.client.force_login(self.other)
+            self.assertEqual(self.get(name).status_code, 404)
+            self.client.force_login(self.owner)
+            self.assertEqual(self.get(name).status_code, 200)
+            self.client.logout()
+
+    def test_dot_segments_do_not_dodge_protection(self):
+        self.assertEqual(self.get('images/../' + self.avatar).status_code, 404)
+
+    def test_accel_redirect_is_quoted(self):
+        with override_settings(MEDIA_SERVE_MODE='x-accel'):
+            response = self.get('images/aa/video 1.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/images/aa/video%201.jpg')
+
+
+class MetricsMergeTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        override = override_settings(METRICS_DIR=self.root, METRICS_FLUSH_INTERVAL=5)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write(self, pid, value, age=0):
+        path = os.path.join(self.root, f'{pid}.json')
+        with open(path, 'w') as f:
+            json.dump({'counters': [['tests_total', {}, value]], 'histograms': []}, f)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_files_of_dead_workers_are_skipped_and_deleted(self):
+        finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                  capture_output=True, text=True, check=True)
+        dead = self.write(int(finished.stdout), 1)
+        running = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+        self.addCleanup(running.wait)
+        self.addCleanup(running.kill)
+        # Live pid, but not rewritten for long: reused by another process
+        reused = self.write(running.pid, 10, age=3600)
+        live = self.write(os.getppid(), 100)
+
+        counters, _ = metrics._merged_snapshots()
+        self.assertEqual(counters.get(('tests_total', ())), 100)
+        self.assertFalse(os.path.exists(dead))
+        self.assertFalse(os.path.exists(reused))
+        self.assertTrue(os.path.exists(live))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ExportDataTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Maths', slug='maths')
+        for i in range(5):
+            Video.objects.create(category=category, title=f'Video {i}', description='', youtube_id=f'vid{i:08d}',
+                                 thumbnail_url='https://example.com/t.jpg', publish_date=timezone.now(),
+                                 featured=i < 2)
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        self.url = reverse('export_data', args=['videos'])
+
+    def test_filtered_csv_is_streamed(self):
+        response = self.client.get(self.url, {'featured': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'youtube_id', 'title'])
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['vid00000000', 'vid00000001'])
+
+    def test_gzipped_jsonl(self):
+        response = self.client.get(self.url, {'format': 'jsonl', 'gzip': '1', 'published_before': '2000-01-01'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'')
+
+        response = self.client.get(self.url, {'format': 'jsonl', 'gzip': '1'})
+        rows = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual([row['youtube_id'] for row in rows], [f'vid{i:08d}' for i in range(5)])
+        self.assertEqual(rows[0]['category'], 'Maths')
+
+    def test_bad_filters_are_rejected_before_streaming(self):
+        for params in ({'featured': 'maybe'}, {'published_after': '31/01/2024'}, {'owner': 'admin'},
+                       {'format': 'xml'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertFalse(response.streaming)
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user('learner'))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.assertEqual(self.client.get(reverse('export_data', args=['unknown'])).status_code, 302)
+
+
+
+
+@override_settings(CACHES=LOCMEM_CACHES, METRICS_TOKEN='s3cret')
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_local_address_is_not_enough(self):
+        # Behind nginx every request comes from 127.0.0.1
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+    def test_bearer_token_or_staff(self):
+        metrics.inc('http_requests_total', route='home', method='GET', status='200')
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+        self.assertIn(b'# TYPE http_requests_total counter', response.content)
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STATIC_STORAGES)
+class PrerenderSiteTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        category = Category.objects.create(name='Maths', slug='maths')
+        self.videos = [Video.objects.create(category=category, title=f'Video {i}', description='',
+                                            youtube_id=f'vid{i:08d}', thumbnail_url='https://example.com/t.jpg',
+                                            publish_date=timezone.now()) for i in range(2)]
+
+    def prerender(self, *args):
+        out = io.StringIO()
+        call_command('prerender_site', '--output', self.root, '--workers', '1', '--host', 'localhost', *args,
+                     stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_pages_are_rendered_once_with_gzip_variants(self):
+        out = self.prerender()
+        self.assertIn('to render, 0 to remove', out)
+        self.assertIn(', 0 failed', out)
+        manifest = json.loads(open(os.path.join(self.root, 'manifest.json')).read())
+        video_url = reverse('video_detail', args=[self.videos[0].pk])
+        self.assertIn('/', manifest)
+        self.assertIn(reverse('category', args=['maths']), manifest)
+        page = os.path.join(self.root, video_url.strip('/'), 'index.html')
+        with open(page, 'rb') as f, open(page + '.gz', 'rb') as gz:
+            html = f.read()
+            self.assertIn(b'Video 0', html)
+            self.assertEqual(gzip.decompress(gz.read()), html)
+        self.assertEqual(os.path.getmtime(page), manifest[video_url])
+
+        # Nothing changed: nothing to render again
+        self.assertIn(f'{len(manifest)} pages, 0 to render, 0 to remove', self.prerender())
+        self.assertIn(f'{len(manifest)} to render', self.prerender('--full'))
+
+    def test_changed_and_deleted_videos(self):
+        self.prerender()
+        deleted_url = reverse('video_detail', args=[self.videos[1].pk])
+        self.videos[1].delete()
+        self.videos[0].title = 'Renamed'
+        self.videos[0].save()
+
+        out = self.prerender()
+        # The home page, the category page and the video of the changed category
+        self.assertIn('3 to render, 1 to remove', out)
+        self.assertFalse(os.path.exists(os.path.join(self.root, deleted_url.strip('/'), 'index.html')))
+        page = os.path.join(self.root, reverse('video_detail', args=[self.videos[0].pk]).strip('/'), 'index.html')
+        with open(page, 'rb') as f:
+            self.assertIn(b'Renamed', f.read())
+
+
+class SeedPerfDataTests(TestCase):
+    def seed(self, *args):
+        call_command('seed_perf_data', '--videos', '40', '--categories', '3', '--subcategories', '2', '--users', '10',
+                     '--history', '50', '--bookmarks', '20', '--orders', '15', '--subscriptions', '5',
+                     '--batch-size', '16', *args, stdout=io.StringIO())
+
+    def test_dataset_is_generated_with_its_cards_and_profiles(self):
+        self.seed()
+        self.assertEqual(Category.objects.filter(slug__startswith='perf-').count(), 3)
+        self.assertEqual(Subcategory.objects.filter(slug__startswith='perf-').count(), 6)
+        self.assertEqual(Video.objects.filter(youtube_id__startswith='perf').count(), 40)
+        # bulk_create skips post_save: the command builds the cards and the profiles itself
+        self.assertEqual(VideoCard.objects.count(), 40)
+        self.assertEqual(Profile.objects.filter(user__username__startswith='perf_').count(), 10)
+        self.assertEqual(Order.objects.count(), 15)
+        self.assertEqual(UserSubscription.objects.count(), 5)
+        self.assertLessEqual(UserVideoHistory.objects.count(), 50)
+
+    def test_runs_add_up_and_clear_starts_over(self):
+        self.seed('--scale', '0.5')
+        self.assertEqual(Video.objects.count(), 20)
+        self.seed('--scale', '0.5', '--seed', '1')
+        self.assertEqual(Video.objects.count(), 40)
+        self.assertEqual(User.objects.count(), 10)
+
+        self.seed('--clear')
+        self.assertEqual(Video.objects.count(), 40)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Order.objects.count(), 15)
+
+
+class PlanProblemsTests(SimpleTestCase):
+    def test_sqlite(self):
+        self.assertEqual(plan_problems('SCAN videos_video USING INDEX videos_vide_categor_idx', 'sqlite'), [])
+        self.assertEqual(plan_problems('SEARCH accounts_bookmark USING INDEX accounts_bo_user_id_idx (user_id=?)',
+                                       'sqlite'), [])
+        self.assertEqual(plan_problems('SCAN videos_video\nUSE TEMP B-TREE FOR ORDER BY', 'sqlite'),
+                         ['full table scan: SCAN videos_video', 'sort without index: USE TEMP B-TREE FOR ORDER BY'])
+
+    def test_postgresql_and_mysql(self):
+        plan = ('Limit  (cost=0.42..1.2 rows=12 width=8)\n'
+                '  ->  Sort  (cost=10.1..10.2 rows=40 width=8)\n'
+                '        ->  Seq Scan on videos_video  (cost=0.00..9.4 rows=40 width=8)')
+        self.assertEqual([problem.split(':')[0] for problem in plan_problems(plan, 'postgresql')],
+                         ['sort without index', 'full table scan'])
+        self.assertEqual(plan_problems('Index Scan using videos_vide_categor_idx on videos_video', 'postgresql'), [])
+        self.assertEqual(plan_problems('1\tSIMPLE\tvideos_video\tALL\tNULL\tUsing where; Using filesort', 'mysql'),
+                         ['full table scan', 'sort without index'])
+        self.assertEqual(plan_problems('1\tSIMPLE\tvideos_video\tref\tvideos_vide_categor_idx\tNULL', 'mysql'), [])
+
+
+SEED_OPTIONS = ['--videos', '2000', '--categories', '5', '--users', '100', '--history', '1000', '--bookmarks', '200',
+                '--orders', '100', '--subscriptions', '50', '--batch-size', '500']
+
+
+class QueryPlanTests(TransactionTestCase):
+    # ANALYZE cannot run inside the transaction of a TestCase on every backend
+
+    def test_hot_queries_of_a_freshly_seeded_database_use_indexes(self):
+        call_command('seed_perf_data', *SEED_OPTIONS, stdout=io.StringIO(), stderr=io.StringIO())
+        out = io.StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('ok   category_page.listing[duration=short,sort=views]', out.getvalue())
+        self.assertIn('ok   category_page.listing[published=month,sort=likes]', out.getvalue())
+        # Composite indexes of the profile and payment pages
+        for name in ('profile.video_history', 'profile.bookmarks', 'checkout.pending_order',
+                     'payment_success.active_subscription'):
+            self.assertIn(f'ok   {name}\n', out.getvalue())
+
+
+VENDOR_CSS = b'.btn{display:inline-block}'
+
+
+@override_settings(CACHES=LOCMEM_CACHES, DEBUG=False)
+class SiteRenderingTests(TestCase):
+    """Pages rendered through the middlewares, the templates and the manifest static storage."""
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        source = os.path.join(directory.name, 'static')
+        shutil.copytree(settings.STATICFILES_DIRS[0], source, ignore=shutil.ignore_patterns('dist'))
+        # Bootstrap CSS vendored (a stand-in with its own hash), Bootstrap JS missing: loaded from its CDN
+        css, js = settings.VENDOR_ASSETS
+        os.makedirs(os.path.join(source, 'vendor', 'bootstrap'), exist_ok=True)
+        with open(os.path.join(source, css), 'wb') as f:
+            f.write(VENDOR_CSS)
+        if os.path.exists(os.path.join(source, js)):
+            os.remove(os.path.join(source, js))
+        vendor_assets = {
+            css: {'url': 'https://cdn.example.com/bootstrap.min.css',
+                  'integrity': 'sha384-' + base64.b64encode(hashlib.sha384(VENDOR_CSS).digest()).decode()},
+            js: settings.VENDOR_ASSETS[js],
+        }
+        cls.enterClassContext(override_settings(STATICFILES_DIRS=[source],
+                                                STATIC_ROOT=os.path.join(directory.name, 'staticfiles'),
+                                                VENDOR_ASSETS=vendor_assets))
+        call_command('build_assets', stdout=io.StringIO(), stderr=io.StringIO())
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Maths', slug='maths')
+        cls.video = Video.objects.create(category=cls.category, title='Quadratic equations', description='Roots',
+                                         youtube_id='vid00000001', thumbnail_url='https://example.com/t.jpg',
+                                         publish_date=timezone.now())
+        VideoCard.objects.refresh([cls.video.pk])
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_pages_render_with_hashed_bundles(self):
+        for url in ('/', reverse('category', args=['maths']), reverse('video_detail', args=[self.video.pk]),
+                    reverse('search') + '?q=quadratic'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            html = response.content.decode()
+            self.assertRegex(html, r'/static/dist/site\.[0-9a-f]{12}\.css', url)
+            self.assertRegex(html, r'/static/dist/site\.[0-9a-f]{12}\.js', url)
+
+    def test_missing_vendor_file_is_loaded_from_its_cdn(self):
+        html = self.client.get('/').content.decode()
+        js = settings.VENDOR_ASSETS['vendor/bootstrap/bootstrap.bundle.min.js']
+        self.assertIn(f'<script src="{js["url"]}" integrity="{js["integrity"]}"', html)
+        self.assertNotIn('cdn.example.com', html)
+
+    def test_bundle_contains_the_vendored_file_and_is_served_compressed(self):
+        html = self.client.get('/').content.decode()
+        name = re.search(r'/static/(dist/site\.[0-9a-f]{12}\.css)', html).group(1)
+        # Served by nginx in production, by serve_static() with SERVE_STATIC
+        response = serve_static(RequestFactory().get('/static/' + name, HTTP_ACCEPT_ENCODING='gzip'), name)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(gzip.decompress(b''.join(response.streaming_content)).startswith(VENDOR_CSS))
+
+    def test_modified_vendored_file_is_rejected(self):
+        css = os.path.join(settings.STATICFILES_DIRS[0], 'vendor', 'bootstrap', 'bootstrap.min.css')
+        with open(css, 'ab') as f:
+            f.write(b'/* edited */')
+        self.addCleanup(lambda: open(css, 'wb').write(VENDOR_CSS))
+        with self.assertRaisesMessage(CommandError, 'Vendored file modified'):
+            call_command('build_assets', '--no-collect', stdout=io.StringIO(), stderr=io.StringIO())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STATIC_STORAGES)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        override = override_settings(PROFILING_DIR=self.root, PROFILING_KEEP_REPORTS=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_report_header_is_for_the_staff_who_asked(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            response = self.client.get('/faq/')
+        self.assertNotIn('X-Profile-Report', response)
+        self.assertEqual(ProfilingReport.objects.count(), 1)
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get('/faq/?_profile=1')
+        self.assertEqual(response['X-Profile-Report'], str(ProfilingReport.objects.latest('pk').pk))
+
+    def test_old_reports_are_pruned_with_their_files(self):
+        for i in range(3):
+            with profiled(f'job {i}') as result:
+                pass
+            save_report(result)
+        self.assertEqual(list(ProfilingReport.objects.order_by('pk').values_list('label', flat=True)),
+                         ['job 1', 'job 2'])
+        self.assertEqual(len(os.listdir(self.root)), 4)
+        self.assertEqual(prune_reports(keep=0), 2)
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_overlapping_blocks_share_tracemalloc(self):
+        second_entered, first_done = threading.Event(), threading.Event()
+        errors = []
+
+        def second():
+            try:
+                with profiled('second'):
+                    second_entered.set()
+                    first_done.wait()
+                    # The first block, which started tracemalloc, has exited
+                    self.assertTrue(tracemalloc.is_tracing())
+            except Exception as e:
+                errors.append(e)
+
+        with profiled('first'):
+            thread = threading.Thread(target=second)
+            thread.start()
+            second_entered.wait()
+        first_done.set()
+        thread.join()
+        self.assertEqual(errors, [])
+        self.assertFalse(tracemalloc.is_tracing())
@@ -9,4 +9,6 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('faq/', views.faq, name='faq'),
     path('page/<slug:slug>/', views.static_page, name='static_page'),
+    path('metrics', views.metrics, name='metrics'),
+    path('exports/<slug:dataset>/', views.export_data, name='export_data'),
 ]
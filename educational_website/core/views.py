@@ -1,17 +1,32 @@
+import hmac
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse, HttpResponse, Http404
 from django.views.generic import ListView, DetailView
 from django.views.decorators.http import require_POST
 
-from videos.models import Category, Video, Subcategory
+from videos.models import Category, Video, Subcategory, VideoCard
 from .models import StaticPage, SiteConfiguration, FAQ, ContactMessage
-from .forms import ContactForm, SearchForm
+from .forms import ContactForm, ListingFilterForm, SearchForm
+from utils.metrics import render_prometheus
+from utils.export import DATASETS, export_response
+from utils.catalog_snapshot import listing as catalog_listing
+from utils.cache import get_or_compute
+from utils.transcripts import search_transcripts
+from utils.http_cache import cache_policy, latest_change, most_recent
+from utils import cdn
 
 def get_site_config():
-    """Récupère ou crée la configuration du site"""
+    """Récupère ou crée la configuration du site (cache partagé, invalidé à l'enregistrement)"""
+    return get_or_compute('config', ('site',), _load_site_config, ttl=3600)
+
+def _load_site_config():
     config, created = SiteConfiguration.objects.get_or_create(
         pk=1, 
         defaults={
@@ -21,16 +36,51 @@ def get_site_config():
     )
     return config
 
+# Date de dernière modification et clés de substitution des pages (requêtes conditionnelles, CDN)
+
+def catalog_changed(request, *args, **kwargs):
+    return most_recent(
+        get_site_config().updated_at,
+        latest_change(Video.objects.all()),
+        latest_change(Category.objects.all()),
+    )
+
+def category_changed(request, slug):
+    return most_recent(
+        get_site_config().updated_at,
+        latest_change(Category.objects.filter(slug=slug)),
+        latest_change(Video.objects.filter(category__slug=slug)),
+    )
+
+def category_keys(request, slug):
+    return [cdn.category_key(pk) for pk in Category.objects.filter(slug=slug).values_list('pk', flat=True)]
+
+def static_page_changed(request, slug):
+    return most_recent(get_site_config().updated_at, latest_change(StaticPage.objects.filter(slug=slug)))
+
+def static_page_keys(request, slug):
+    return [cdn.page_key(pk) for pk in StaticPage.objects.filter(slug=slug).values_list('pk', flat=True)]
+
+def faq_changed(request):
+    return most_recent(get_site_config().updated_at, latest_change(FAQ.objects.all()))
+
+@cache_policy('catalog', last_modified=catalog_changed, surrogate_keys=lambda request: ['catalog'])
 def home(request):
     """Page d'accueil du site"""
     # Récupérer toutes les catégories avec le nombre de vidéos
-    categories = Category.objects.annotate(video_count=Count('videos'))
+    categories = get_or_compute(
+        'catalog', ('home_categories',),
+        lambda: list(Category.objects.annotate(video_count=Count('videos'))),
+        ttl=300,
+    )
     
-    # Récupérer les vidéos mises en avant
-    featured_videos = Video.objects.filter(featured=True).order_by('-publish_date')[:6]
+    # Récupérer les vidéos mises en avant (fiches compactes, via le snapshot du catalogue si disponible)
+    featured_videos = catalog_listing(
+        VideoCard.objects.filter(featured=True).order_by('-publish_date'), featured=True
+    )[:6]
     
     # Récupérer les vidéos récentes
-    recent_videos = Video.objects.order_by('-publish_date')[:12]
+    recent_videos = catalog_listing(VideoCard.objects.order_by('-publish_date'))[:12]
     
     # Récupérer la configuration du site
     site_config = get_site_config()
@@ -48,19 +98,26 @@ def home(request):
     
     return render(request, 'core/home.html', context)
 
+@cache_policy('catalog', last_modified=category_changed, surrogate_keys=category_keys)
 def category_page(request, slug):
     """Page d'une catégorie"""
     category = get_object_or_404(Category, slug=slug)
-    subcategories = category.subcategories.all()
+    subcategories = category.subcategories.cached()
     
-    # Récupérer les vidéos de cette catégorie
-    videos = Video.objects.filter(category=category).order_by('-publish_date')
+    # Récupérer les vidéos de cette catégorie, avec le tri et les filtres demandés
+    listing_form = ListingFilterForm(request.GET)
+    videos = listing_form.apply(VideoCard.objects.filter(category=category))
+    filters = {'category': category.pk, **listing_form.filters()}
     
     # Filtrer par sous-catégorie si spécifiée
     subcategory_slug = request.GET.get('subcategory')
     if subcategory_slug:
         subcategory = get_object_or_404(Subcategory, slug=subcategory_slug, category=category)
         videos = videos.filter(subcategory=subcategory)
+        filters['subcategory'] = subcategory.pk
+    
+    # Snapshot NumPy partagé entre workers si disponible, sinon la base de données
+    videos = catalog_listing(videos, listing_form.order_by(), **filters)
     
     # Pagination
     site_config = get_site_config()
@@ -71,49 +128,95 @@ def category_page(request, slug):
     context = {
         'category': category,
         'subcategories': subcategories,
+        'subcategory_slug': subcategory_slug or '',
+        'listing_form': listing_form,
         'page_obj': page_obj,
-        'videos_count': videos.count(),
+        'videos_count': paginator.count,
         'site_config': site_config,
     }
     
     return render(request, 'core/category.html', context)
 
+@cache_policy('search', last_modified=catalog_changed, surrogate_keys=lambda request: ['search'])
 def search(request):
     """Recherche de vidéos"""
     form = SearchForm(request.GET)
     query = request.GET.get('query', '')
     category_slug = request.GET.get('category', '')
+    mode = request.GET.get('mode', '')
     
-    videos = Video.objects.all()
+    if mode == 'transcript':
+        return search_transcript(request, form, query, category_slug)
+    
+    # Tri et filtres (durée, date de publication)
+    listing_form = ListingFilterForm(request.GET)
+    videos = listing_form.apply(VideoCard.objects.all())
     
     # Filtrer par recherche
     if query:
         videos = videos.filter(
             Q(title__icontains=query) | 
-            Q(description__icontains=query)
+            Q(video__description__icontains=query)
         )
     
     # Filtrer par catégorie si spécifiée
     if category_slug:
         videos = videos.filter(category__slug=category_slug)
     
-    # Pagination
+    # Pagination : le nombre de résultats et les identifiants de la page sont mis en cache,
+    # ce qui évite de refaire les recherches LIKE sur toute la table
     site_config = get_site_config()
     paginator = Paginator(videos, site_config.videos_per_page)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    
+    def search_page():
+        page = paginator.get_page(page_number)
+        return {'count': paginator.count, 'number': page.number, 'ids': [card.pk for card in page]}
+    
+    result = get_or_compute('search', (query, category_slug, *listing_form.key(), page_number, paginator.per_page),
+                            search_page, ttl=120)
+    paginator.count = result['count']
+    page_obj = paginator.get_page(result['number'])
+    cards = VideoCard.objects.in_bulk(result['ids'])
+    page_obj.object_list = [cards[pk] for pk in result['ids'] if pk in cards]
     
     context = {
         'query': query,
         'category_slug': category_slug,
+        'listing_form': listing_form,
         'page_obj': page_obj,
-        'videos_count': videos.count(),
+        'videos_count': paginator.count,
         'site_config': site_config,
         'form': form,
     }
     
     return render(request, 'core/search_results.html', context)
 
+def search_transcript(request, form, query, category_slug):
+    """Recherche dans les transcriptions : vidéos et moments où les mots sont prononcés (liens ?t=)"""
+    site_config = get_site_config()
+    # Résultats complets en cache (bornés par TRANSCRIPT_SEARCH_LIMIT), paginés ensuite
+    results = get_or_compute('search', ('transcript', query, category_slug),
+                             lambda: search_transcripts(query, category_slug), ttl=120)
+    paginator = Paginator(results, site_config.videos_per_page)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    cards = VideoCard.objects.in_bulk([result['video_id'] for result in page_obj])
+    page_obj.object_list = [{'video': cards[result['video_id']], 'moments': result['moments']}
+                            for result in page_obj if result['video_id'] in cards]
+    
+    context = {
+        'query': query,
+        'category_slug': category_slug,
+        'mode': 'transcript',
+        'page_obj': page_obj,
+        'videos_count': paginator.count,
+        'site_config': site_config,
+        'form': form,
+    }
+    
+    return render(request, 'core/search_results.html', context)
+
+@cache_policy('content', last_modified=static_page_changed, surrogate_keys=static_page_keys)
 def static_page(request, slug):
     """Affichage d'une page statique"""
     page = get_object_or_404(StaticPage, slug=slug, is_published=True)
@@ -126,6 +229,7 @@ def static_page(request, slug):
     
     return render(request, 'core/static_page.html', context)
 
+@cache_policy('private')
 def contact(request):
     """Page de contact"""
     if request.method == 'POST':
@@ -138,7 +242,7 @@ def contact(request):
         form = ContactForm()
     
     site_config = get_site_config()
-    faqs = FAQ.objects.filter(is_published=True).order_by('order')
+    faqs = FAQ.objects.filter(is_published=True).order_by('order').cached()
     
     context = {
         'form': form,
@@ -148,13 +252,17 @@ def contact(request):
     
     return render(request, 'core/contact.html', context)
 
+@cache_policy('content', last_modified=catalog_changed, surrogate_keys=lambda request: ['catalog'])
 def about(request):
     """Page à propos"""
     site_config = get_site_config()
     
     # Statistiques
-    videos_count = Video.objects.count()
-    categories_count = Category.objects.count()
+    videos_count, categories_count = get_or_compute(
+        'catalog', ('about_stats',),
+        lambda: (Video.objects.count(), Category.objects.count()),
+        ttl=300,
+    )
     
     context = {
         'site_config': site_config,
@@ -164,12 +272,13 @@ def about(request):
     
     return render(request, 'core/about.html', context)
 
+@cache_policy('content', last_modified=faq_changed, surrogate_keys=lambda request: ['faq'])
 def faq(request):
     """Page FAQ"""
     site_config = get_site_config()
     
     # Récupérer toutes les FAQs et les regrouper par catégorie
-    faqs = FAQ.objects.filter(is_published=True).order_by('category', 'order')
+    faqs = FAQ.objects.filter(is_published=True).order_by('category', 'order').cached()
     
     # Créer un dictionnaire pour regrouper les FAQs par catégorie
     faq_by_category = {}
@@ -186,3 +295,39 @@ def faq(request):
     
     return render(request, 'core/faq.html', context)
 
+def metrics(request):
+    """Métriques de performance au format texte Prometheus
+
+    Réservées au staff connecté ou à Prometheus avec « Authorization: Bearer <METRICS_TOKEN> »
+    (l'adresse ne suffit pas : derrière nginx, toutes les requêtes viennent de 127.0.0.1).
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    authorized = (settings.METRICS_TOKEN and scheme.lower() == 'bearer'
+                  and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()))
+    if not authorized and not request.user.is_staff:
+        raise Http404
+    
+    response = HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+@staff_member_required
+def export_data(request, dataset):
+    """Export en flux d'une table (CSV ou JSONL, gzip en option), filtres en paramètres GET
+
+    Exemple : /exports/orders/?format=csv&gzip=1&status=paid&created_after=2024-01-01
+    """
+    if dataset not in DATASETS:
+        raise Http404
+    opts = DATASETS[dataset].model._meta
+    if not request.user.has_perm(f'{opts.app_label}.view_{opts.model_name}'):
+        raise PermissionDenied
+    
+    params = request.GET.dict()
+    fmt = params.pop('format', 'csv')
+    compress = params.pop('gzip', '') in ('1', 'true', 'yes')
+    try:
+        return export_response(dataset, fmt, filters=params, compress=compress)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400, content_type='text/plain; charset=utf-8')
@@ -25,23 +25,26 @@ INSTALLED_APPS = [
     'accounts',
     'videos',
     'payments',
+    'jobs',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PerformanceMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'educational_website.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'utils.metrics.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -100,10 +103,51 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# Fichiers statiques renommés avec leur empreinte (manifeste) et précompressés en .gz
+STORAGES = {
+    # Fichiers envoyés nommés d'après l'empreinte de leur contenu (dédupliqués, répertoires répartis)
+    'default': {'BACKEND': 'utils.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'utils.assets.GzipManifestStaticFilesStorage'},
+}
+
+# Bundles générés par « manage.py build_assets » dans static/dist (concaténés et minifiés)
+ASSET_BUNDLES = {
+    'dist/site.css': ['vendor/bootstrap/bootstrap.min.css', 'global/css/styles.css'],
+    'dist/site.js': ['vendor/bootstrap/bootstrap.bundle.min.js', 'global/js/script.js'],
+    'dist/videos.css': ['videos/css/video.css'],
+}
+
+# Dépendances tierces hébergées localement (static/vendor), vérifiées par leur empreinte SRI
+# Un fichier absent de static/vendor est chargé depuis son url (template tag vendor_fallback)
+VENDOR_ASSETS = {
+    'vendor/bootstrap/bootstrap.min.css': {
+        'url': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+        'integrity': 'sha384-1BmE4kWBq78iYhFldvKuhfTAU6auU8tT94WrHftjDbrCEXSU1oBoqyl2QvZ6jIW3',
+    },
+    'vendor/bootstrap/bootstrap.bundle.min.js': {
+        'url': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+        'integrity': 'sha384-ka7Sk0Gln4gmtz2MlQnikT1wXgYsOg+OMhuP+IlRH9sENBO0LRn5q+8nbTov4+1p',
+    },
+}
+
+# Service des fichiers statiques par Django (utils.assets.serve_static) quand nginx ne s'en charge pas
+SERVE_STATIC = os.environ.get('SERVE_STATIC', str(DEBUG)) == 'True'
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Service des médias (utils.storage.serve_media) : Django vérifie l'accès, le serveur web envoie le fichier
+#   'x-accel' : nginx, avec « location /protected-media/ { internal; alias <MEDIA_ROOT>/; } »
+#   'x-sendfile' : Apache (mod_xsendfile) ou lighttpd
+#   'django' : envoi par Django avec prise en charge des requêtes Range (développement)
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django' if DEBUG else 'x-accel')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Réservés aux utilisateurs connectés ; les avatars (envois et variantes) à leur propriétaire et au staff
+MEDIA_PROTECTED_PREFIXES = ('profile_avatars/', 'private_images/')
+# Les noms dépendent du contenu : les fichiers publics peuvent être mis en cache longtemps
+MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', str(365 * 24 * 3600)))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -116,3 +160,134 @@ PAYPAL_CLIENT_SECRET = os.environ.get('PAYPAL_CLIENT_SECRET', '')
 
 # YouTube API
 YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY', '')
+
+# Mesures de performance (en-tête Server-Timing et vue /metrics)
+# Par défaut dans /dev/shm pour que les workers partagent leurs métriques en mémoire
+METRICS_DIR = os.environ.get(
+    'METRICS_DIR',
+    '/dev/shm/educational_website_metrics' if os.path.isdir('/dev/shm') else str(BASE_DIR / 'var' / 'metrics'),
+)
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+# Jeton attendu dans « Authorization: Bearer ... » par la vue /metrics (vide : staff connecté seulement)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Profilage à la demande (staff : en-tête X-Profile: 1 ou ?_profile=1)
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'var' / 'profiles'))
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SLOW_QUERY_MS = float(os.environ.get('PROFILING_SLOW_QUERY_MS', '100'))
+# Rapports conservés (base et fichiers de PROFILING_DIR), les plus anciens sont supprimés
+PROFILING_KEEP_REPORTS = int(os.environ.get('PROFILING_KEEP_REPORTS', '500'))
+
+# Snapshot colonnaire du catalogue (NumPy, mappé en mémoire par tous les workers)
+CATALOG_SNAPSHOT_DIR = os.environ.get('CATALOG_SNAPSHOT_DIR', str(BASE_DIR / 'var' / 'catalog'))
+CATALOG_SNAPSHOT_CHECK_INTERVAL = float(os.environ.get('CATALOG_SNAPSHOT_CHECK_INTERVAL', '2'))
+
+# Cache partagé entre les workers : Redis si REDIS_URL est défini, sinon fichiers locaux
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'edu',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'var' / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
+# utils.cache : durée de conservation des valeurs périmées, verrou de recalcul, surcharge
+CACHE_STALE_TTL = int(os.environ.get('CACHE_STALE_TTL', '3600'))
+CACHE_LOCK_TIMEOUT = int(os.environ.get('CACHE_LOCK_TIMEOUT', '10'))
+CACHE_SLOW_COMPUTE_SECONDS = float(os.environ.get('CACHE_SLOW_COMPUTE_SECONDS', '2'))
+CACHE_OVERLOAD_COOLDOWN = int(os.environ.get('CACHE_OVERLOAD_COOLDOWN', '30'))
+# Calculs lents d'un même espace de noms, dans la fenêtre CACHE_OVERLOAD_COOLDOWN, avant de servir du périmé
+CACHE_OVERLOAD_SLOW_COMPUTES = int(os.environ.get('CACHE_OVERLOAD_SLOW_COMPUTES', '3'))
+# Attente maximale d'une clé froide recalculée par un autre worker, avant de la calculer soi-même
+CACHE_COLD_KEY_WAIT = float(os.environ.get('CACHE_COLD_KEY_WAIT', '0.5'))
+
+# Cache des résultats de requêtes ORM (modèles utilisant CachingManager, via .cached())
+QUERY_CACHE_ALIAS = 'default'
+QUERY_CACHE_TIMEOUT = int(os.environ.get('QUERY_CACHE_TIMEOUT', '300'))
+
+# Politiques Cache-Control par type de page (utils.http_cache.cache_policy)
+# max_age : navigateurs ; s_maxage : CDN ; stale_while_revalidate : copie périmée servie pendant la revalidation
+HTTP_CACHE_POLICIES = {
+    'catalog': {'public': True, 'max_age': 60, 's_maxage': 300, 'stale_while_revalidate': 600},
+    'search': {'public': True, 'max_age': 0, 's_maxage': 60, 'stale_while_revalidate': 120},
+    'content': {'public': True, 'max_age': 300, 's_maxage': 3600, 'stale_while_revalidate': 86400},
+    # Pages personnalisées (utilisateur connecté, formulaires) : jamais dans un cache partagé
+    'private': {'private': True, 'no_cache': True},
+}
+
+# Purge du CDN par clés de substitution (en-tête Surrogate-Key), désactivée si l'URL est vide
+CDN_PURGE_URL = os.environ.get('CDN_PURGE_URL', '')
+CDN_PURGE_TOKEN = os.environ.get('CDN_PURGE_TOKEN', '')
+CDN_PURGE_TIMEOUT = float(os.environ.get('CDN_PURGE_TIMEOUT', '5'))
+
+# Pages publiques pré-générées par « manage.py prerender_site » (fichiers .html et .html.gz)
+# nginx peut les servir aux visiteurs anonymes sans passer par Django, par exemple :
+#   if ($cookie_sessionid = "") { set $prerender $document_root/prerender; }
+#   try_files /prerender$uri/index.html @django;   (avec gzip_static on)
+PRERENDER_DIR = os.environ.get('PRERENDER_DIR', str(BASE_DIR / 'var' / 'prerender'))
+
+# Images mises en cache sous MEDIA_ROOT/images (miniatures YouTube, icônes, avatars)
+# et déclinées en WebP et JPEG à ces largeurs
+IMAGE_VARIANT_WIDTHS = (320, 480, 640)
+# Zone protégée (MEDIA_PROTECTED_PREFIXES) des images privées : avatars et leurs variantes
+IMAGE_PRIVATE_DIR = 'private_images'
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+IMAGE_DOWNLOAD_TIMEOUT = float(os.environ.get('IMAGE_DOWNLOAD_TIMEOUT', '10'))
+
+# File de tâches de fond en base (app jobs, « manage.py run_jobs »)
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', '2'))
+# Nouvelles tentatives : délai de base doublé à chaque échec, plafonné
+JOBS_RETRY_BASE_DELAY = int(os.environ.get('JOBS_RETRY_BASE_DELAY', '30'))
+JOBS_RETRY_MAX_DELAY = int(os.environ.get('JOBS_RETRY_MAX_DELAY', '3600'))
+# Une tâche sans battement de cœur depuis JOBS_STALE_AFTER secondes est remise en file
+JOBS_HEARTBEAT_INTERVAL = int(os.environ.get('JOBS_HEARTBEAT_INTERVAL', '15'))
+JOBS_STALE_AFTER = int(os.environ.get('JOBS_STALE_AFTER', '120'))
+
+# Client YouTube partagé (utils.youtube_client) : nouvelles tentatives sur les limites de débit
+# et les erreurs 5xx, cache disque des réponses (requêtes conditionnelles ETag) et points de reprise
+YOUTUBE_TIMEOUT = float(os.environ.get('YOUTUBE_TIMEOUT', '30'))
+YOUTUBE_MAX_RETRIES = int(os.environ.get('YOUTUBE_MAX_RETRIES', '5'))
+YOUTUBE_RETRY_BASE_DELAY = float(os.environ.get('YOUTUBE_RETRY_BASE_DELAY', '1'))
+YOUTUBE_RETRY_MAX_DELAY = float(os.environ.get('YOUTUBE_RETRY_MAX_DELAY', '60'))
+YOUTUBE_CACHE_DIR = os.environ.get('YOUTUBE_CACHE_DIR', str(BASE_DIR / 'var' / 'youtube'))
+
+# Notifications push YouTube (WebSub) : le hub appelle WEBSUB_CALLBACK_BASE_URL + /videos/websub/<id>/
+# Les abonnements sont renouvelés par « manage.py websub_subscribe --renew » (cron quotidien)
+WEBSUB_HUB_URL = os.environ.get('WEBSUB_HUB_URL', 'https://pubsubhubbub.appspot.com/subscribe')
+WEBSUB_CALLBACK_BASE_URL = os.environ.get('WEBSUB_CALLBACK_BASE_URL', 'http://localhost:8000')
+WEBSUB_LEASE_SECONDS = int(os.environ.get('WEBSUB_LEASE_SECONDS', str(5 * 24 * 3600)))
+WEBSUB_RENEW_BEFORE = int(os.environ.get('WEBSUB_RENEW_BEFORE', str(2 * 24 * 3600)))
+WEBSUB_TIMEOUT = float(os.environ.get('WEBSUB_TIMEOUT', '10'))
+# Durée pendant laquelle une même notification (vidéo, date de mise à jour) est ignorée
+WEBSUB_DEDUPE_TTL = int(os.environ.get('WEBSUB_DEDUPE_TTL', str(24 * 3600)))
+
+# Classement automatique des sous-catégories (utils.subcategories) : modèle entraîné par
+# « manage.py train_subcategory_classifier », prédictions sous le seuil envoyées en vérification
+SUBCATEGORY_MODEL_PATH = os.environ.get('SUBCATEGORY_MODEL_PATH', str(BASE_DIR / 'var' / 'models' / 'subcategory.npz'))
+SUBCATEGORY_CONFIDENCE_THRESHOLD = float(os.environ.get('SUBCATEGORY_CONFIDENCE_THRESHOLD', '0.7'))
+SUBCATEGORY_HASH_FEATURES = 2 ** 18
+SUBCATEGORY_SMOOTHING = 0.5
+
+# Détection des quasi-doublons (utils.duplicates) : signatures MinHash du titre et de la description,
+# paires au-dessus du seuil de similarité (Jaccard estimé) proposées dans l'admin
+DUPLICATE_SIMILARITY_THRESHOLD = float(os.environ.get('DUPLICATE_SIMILARITY_THRESHOLD', '0.8'))
+
+# Recherche dans les transcriptions (utils.transcripts) : fichiers <youtube_id>[.<langue>].vtt|.srt
+# importés par « manage.py index_transcripts », liens vers la vidéo au moment cité (?t=secondes)
+TRANSCRIPT_DIR = os.environ.get('TRANSCRIPT_DIR', str(BASE_DIR / 'var' / 'transcripts'))
+# Transcriptions examinées par requête, écart maximal (en sous-titres) entre les mots d'un passage
+TRANSCRIPT_SEARCH_LIMIT = int(os.environ.get('TRANSCRIPT_SEARCH_LIMIT', '200'))
+TRANSCRIPT_MATCH_WINDOW = int(os.environ.get('TRANSCRIPT_MATCH_WINDOW', '1'))
+
+# Listes de l'admin (utils.pagination) : au-delà de ce nombre de lignes, une liste non filtrée
+# affiche le total estimé par le planificateur au lieu d'un COUNT(*) sur toute la table
+ADMIN_COUNT_ESTIMATE_MIN_ROWS = int(os.environ.get('ADMIN_COUNT_ESTIMATE_MIN_ROWS', '10000'))
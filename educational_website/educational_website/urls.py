@@ -1,7 +1,10 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from utils.assets import serve_static
+from utils.storage import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -9,9 +12,15 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('videos/', include('videos.urls')),
     path('payments/', include('payments.urls')),
+    path('jobs/', include('jobs.urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.SERVE_STATIC:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.STATIC_URL.lstrip('/')), serve_static),
+    ]
+
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media),
+]
 
@@ -0,0 +1,53 @@
+import json
+
+from django.contrib import admin, messages
+from django.utils import timezone
+from django.utils.html import format_html
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'progress_display', 'attempts', 'priority', 'created_by', 'created_at',
+                    'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'error')
+    date_hierarchy = 'created_at'
+    list_select_related = ('created_by',)
+    fields = ('name', 'status', 'progress_display', 'kwargs_display', 'priority', 'attempts', 'max_attempts',
+              'run_at', 'worker', 'created_by', 'created_at', 'started_at', 'finished_at', 'heartbeat_at',
+              'result_display', 'error_display')
+    readonly_fields = fields
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        # Les tâches sont créées par enqueue()
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def progress_display(self, obj):
+        if obj.progress_total:
+            return f"{obj.progress_done} / {obj.progress_total} ({obj.percent} %)"
+        return obj.progress_done or "-"
+    progress_display.short_description = "Progression"
+
+    def kwargs_display(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.kwargs, indent=2))
+    kwargs_display.short_description = "Arguments"
+
+    def result_display(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.result, indent=2))
+    result_display.short_description = "Résultat"
+
+    def error_display(self, obj):
+        return format_html('<pre>{}</pre>', obj.error)
+    error_display.short_description = "Erreur"
+
+    @admin.action(description="Relancer les tâches échouées")
+    def retry(self, request, queryset):
+        count = queryset.filter(status='failed').update(
+            status='queued', attempts=0, run_at=timezone.now(), finished_at=None, worker='')
+        self.message_user(request, f"{count} tâche(s) remise(s) en file", messages.SUCCESS)
@@ -0,0 +1,55 @@
+# jobs/management/commands/run_jobs.py
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.registry import REGISTRY
+from jobs.worker import claim_next, execute, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Run the background jobs queued in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--only', action='append', metavar='NAME',
+                            help='Only run jobs of this name (repeatable)')
+        parser.add_argument('--sleep', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help='Seconds between two polls of an empty queue')
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        # Arrêt propre : la tâche en cours se termine avant la sortie
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f'Worker {worker_id} ready, jobs: {", ".join(sorted(REGISTRY)) or "none registered"}')
+        done = 0
+        while not self.stopping:
+            stale = requeue_stale()
+            if stale:
+                self.stderr.write(f'Requeued {stale} jobs of lost workers')
+            job = claim_next(worker_id, names=options['only'])
+            if job is None:
+                if options['burst']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            self.stdout.write(f'Running {job} (attempt {job.attempts}/{job.max_attempts})')
+            job = execute(job)
+            done += 1
+            if job.status == 'succeeded':
+                self.stdout.write(self.style.SUCCESS(f'{job} done: {job.result}'))
+            elif job.status == 'queued':
+                self.stderr.write(f'{job} failed, retry at {job.run_at:%H:%M:%S}')
+            else:
+                self.stderr.write(self.style.ERROR(f'{job} failed:\n{job.error}'))
+        self.stdout.write(f'Worker {worker_id} stopped after {done} jobs')
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Tâche de fond exécutée par « manage.py run_jobs »
+
+    La file est la table elle-même : pas de broker externe. Un worker réserve
+    une tâche par une mise à jour conditionnelle (status='queued' -> 'running'),
+    ce qui fonctionne sur SQLite comme sur PostgreSQL et MySQL.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'En attente'),
+        ('running', 'En cours'),
+        ('succeeded', 'Terminée'),
+        ('failed', 'Échouée'),
+    )
+
+    name = models.CharField(max_length=100, help_text="Nom de la tâche enregistrée avec @job")
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    priority = models.IntegerField(default=0, help_text="Les priorités les plus hautes passent en premier")
+
+    # Nouvelles tentatives
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Pas exécutée avant cette date (délai entre tentatives)")
+
+    # Progression (par ex. vidéos traitées / total)
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    # Suivi de l'exécution
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Tâche"
+        verbose_name_plural = "Tâches"
+        indexes = [
+            # Réservation : tâches en attente par priorité puis date d'exécution
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_queue_idx'),
+            # Limites de concurrence : tâches en cours par type
+            models.Index(fields=['name', 'status'], name='job_name_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    @property
+    def percent(self):
+        if not self.progress_total:
+            return None
+        return round(100 * self.progress_done / self.progress_total, 1)
+
+    def report_progress(self, done, total=None):
+        """Enregistre l'avancement (au plus une écriture par seconde) et sert de battement de cœur"""
+        self.progress_done = done
+        if total is not None:
+            self.progress_total = total
+        now = time.monotonic()
+        if now - getattr(self, '_progress_saved_at', 0) < 1 and done != self.progress_total:
+            return
+        self._progress_saved_at = now
+        Job.objects.filter(pk=self.pk).update(
+            progress_done=self.progress_done, progress_total=self.progress_total, heartbeat_at=timezone.now())
+
+    def as_dict(self):
+        return {
+            'id': self.pk,
+            'name': self.name,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'progress_done': self.progress_done,
+            'progress_total': self.progress_total,
+            'percent': self.percent,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+        }
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+
+from .models import Job
+
+# Nom -> JobType des tâches déclarées avec @job
+REGISTRY = {}
+
+
+@dataclass
+class JobType:
+    """Tâche enregistrée et ses réglages par défaut"""
+    name: str
+    func: object
+    concurrency: int = None
+    max_attempts: int = 3
+    priority: int = 0
+
+
+def job(name, concurrency=None, max_attempts=3, priority=0):
+    """Déclare une fonction comme tâche de fond
+
+    La fonction reçoit l'objet Job (pour report_progress) puis ses arguments
+    nommés, qui doivent être sérialisables en JSON :
+
+        @job('videos.import_channel', concurrency=1)
+        def import_channel(job, channel_id):
+            ...
+
+    concurrency limite le nombre d'exécutions simultanées de ce type de tâche
+    sur l'ensemble des workers (None : pas de limite).
+    """
+    def decorator(func):
+        REGISTRY[name] = JobType(name, func, concurrency, max_attempts, priority)
+        func.job_name = name
+        return func
+    return decorator
+
+
+def enqueue(name, priority=None, run_at=None, created_by=None, **kwargs):
+    """Ajoute une tâche à la file, visible des workers après la validation de la transaction
+
+    Retourne le Job créé.
+    """
+    job_type = REGISTRY[name]
+    fields = {
+        'name': name,
+        'kwargs': kwargs,
+        'priority': job_type.priority if priority is None else priority,
+        'max_attempts': job_type.max_attempts,
+        'created_by': created_by,
+    }
+    if run_at is not None:
+        fields['run_at'] = run_at
+    return Job.objects.create(**fields)
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .registry import REGISTRY, enqueue, job
+from .worker import _claim, claim_next, execute, requeue_stale
+
+
+@job('tests.single', concurrency=1)
+def single(job):
+    return {'ok': True}
+
+
+@job('tests.broken', max_attempts=2)
+def broken(job):
+    raise RuntimeError('boom')
+
+
+@override_settings(JOBS_STALE_AFTER=60, JOBS_RETRY_BASE_DELAY=0, JOBS_RETRY_MAX_DELAY=0)
+class WorkerTests(TestCase):
+    def test_claim_counts_the_attempt(self):
+        queued = enqueue('tests.single')
+        claimed = claim_next('worker-1', names=['tests.single'])
+
+        self.assertEqual(claimed.pk, queued.pk)
+        self.assertEqual((claimed.status, claimed.worker, claimed.attempts), ('running', 'worker-1', 1))
+
+    def test_concurrency_limit_holds_when_the_limit_was_read_before_a_concurrent_claim(self):
+        first, second = enqueue('tests.single'), enqueue('tests.single')
+        self.assertTrue(_claim(first.pk, REGISTRY['tests.single'], 'worker-1', timezone.now()))
+        # The second worker read "none running" before the first claim: the claim itself refuses
+        self.assertFalse(_claim(second.pk, REGISTRY['tests.single'], 'worker-2', timezone.now()))
+        self.assertIsNone(claim_next('worker-2', names=['tests.single']))
+        self.assertEqual(Job.objects.get(pk=second.pk).status, 'queued')
+
+    def test_failed_job_is_retried_then_failed(self):
+        enqueue('tests.broken')
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            self.assertEqual(execute(claim_next('worker-1', names=['tests.broken'])).status, 'queued')
+            retried = execute(claim_next('worker-1', names=['tests.broken']))
+        self.assertEqual((retried.status, retried.attempts), ('failed', 2))
+        self.assertIn('boom', retried.error)
+
+    def test_stale_jobs_are_requeued_until_their_attempts_run_out(self):
+        stale = timezone.now() - timedelta(minutes=5)
+        lost = Job.objects.create(name='tests.single', status='running', attempts=1, max_attempts=3,
+                                  heartbeat_at=stale, worker='worker-1')
+        exhausted = Job.objects.create(name='tests.single', status='running', attempts=3, max_attempts=3,
+                                       heartbeat_at=stale, worker='worker-2')
+        alive = Job.objects.create(name='tests.single', status='running', attempts=1, heartbeat_at=timezone.now())
+
+        with self.assertLogs('jobs.worker', 'WARNING'):
+            self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=lost.pk).status, 'queued')
+        self.assertEqual(Job.objects.get(pk=exhausted.pk).status, 'failed')
+        self.assertEqual(Job.objects.get(pk=alive.pk).status, 'running')
@@ -0,0 +1,6 @@
+from django.urls import path
+from jobs import views
+
+urlpatterns = [
+    path('<int:pk>/status/', views.job_status, name='job_status'),
+]
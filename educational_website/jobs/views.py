@@ -0,0 +1,14 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from .models import Job
+
+
+@staff_member_required
+def job_status(request, pk):
+    """État d'une tâche en JSON, interrogé périodiquement par l'admin"""
+    job = get_object_or_404(Job, pk=pk)
+    response = JsonResponse(job.as_dict())
+    response['Cache-Control'] = 'no-store'
+    return response
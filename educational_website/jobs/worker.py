@@ -0,0 +1,123 @@
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Job
+from .registry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+def backoff(attempts):
+    """Délai avant la tentative suivante : exponentiel, plafonné, avec une part aléatoire"""
+    delay = min(settings.JOBS_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def requeue_stale():
+    """Remet en file les tâches dont le worker a disparu (plus de battement de cœur)
+
+    L'exécution perdue compte comme une tentative : une tâche qui fait tomber
+    son worker à chaque fois échoue après max_attempts au lieu de tourner en
+    boucle. Retourne le nombre de tâches remises en file.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=now - timedelta(seconds=settings.JOBS_STALE_AFTER))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', worker='', finished_at=now, error='Worker perdu, tentatives épuisées')
+    if failed:
+        logger.warning('%s jobs of lost workers failed after their last attempt', failed)
+    return stale.update(status='queued', worker='', error='Worker perdu, tâche remise en file')
+
+
+def claim_next(worker_id, names=None):
+    """Réserve la prochaine tâche exécutable pour ce worker, ou retourne None
+
+    Les types de tâches ayant atteint leur limite de concurrence sont sautés.
+    La réservation est une mise à jour conditionnelle : si un autre worker a
+    pris la tâche entre-temps, on passe à la suivante. Elle compte la tentative.
+    """
+    now = timezone.now()
+    running = dict(Job.objects.filter(status='running').values_list('name').annotate(n=Count('pk')))
+    full = [name for name, job_type in REGISTRY.items()
+            if job_type.concurrency is not None and running.get(name, 0) >= job_type.concurrency]
+
+    candidates = Job.objects.filter(status='queued', run_at__lte=now, name__in=list(REGISTRY)).exclude(name__in=full)
+    if names:
+        candidates = candidates.filter(name__in=names)
+    for pk, name in candidates.order_by('-priority', 'run_at', 'pk').values_list('pk', 'name')[:20]:
+        if _claim(pk, REGISTRY[name], worker_id, now):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def _claim(pk, job_type, worker_id, now):
+    """Passe une tâche en cours si elle est toujours en attente et que son type n'est pas à sa limite"""
+    claim = Job.objects.filter(pk=pk, status='queued')
+    changes = {'status': 'running', 'worker': worker_id, 'started_at': now, 'heartbeat_at': now, 'error': '',
+               'attempts': F('attempts') + 1}
+    if job_type.concurrency is None:
+        return claim.update(**changes)
+
+    running = Job.objects.filter(name=job_type.name, status='running')
+    if connection.features.has_select_for_update:
+        with transaction.atomic():
+            # Les workers réservant ce type attendent le verrou de la même ligne : le compte
+            # des tâches en cours lu ensuite inclut les réservations concurrentes validées
+            head = (Job.objects.select_for_update().filter(name=job_type.name, status='queued')
+                    .order_by('pk').values_list('pk', flat=True).first())
+            if head is None or running.count() >= job_type.concurrency:
+                return 0
+            return claim.update(**changes)
+    # SQLite n'a pas de SELECT FOR UPDATE mais un seul écrivain à la fois :
+    # l'UPDATE vérifie lui-même la limite
+    running_count = running.order_by().values('name').annotate(n=Count('pk')).values('n')
+    return (claim.alias(running=Coalesce(Subquery(running_count), 0))
+            .filter(running__lt=job_type.concurrency).update(**changes))
+
+
+def _heartbeat(pk, stop):
+    """Battement de cœur régulier pendant l'exécution, même sans report_progress()"""
+    try:
+        while not stop.wait(settings.JOBS_HEARTBEAT_INTERVAL):
+            Job.objects.filter(pk=pk, status='running').update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def execute(job):
+    """Exécute une tâche réservée et enregistre son résultat, ou planifie une nouvelle tentative"""
+    job_type = REGISTRY[job.name]
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job.pk, stop), daemon=True).start()
+    try:
+        result = job_type.func(job, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Job %s failed (attempt %s/%s)', job, job.attempts, job.max_attempts)
+        if job.attempts < job.max_attempts:
+            job.status, job.run_at = 'queued', timezone.now() + backoff(job.attempts)
+        else:
+            job.status, job.finished_at = 'failed', timezone.now()
+        job.error = error
+        job.worker = ''
+        Job.objects.filter(pk=job.pk).update(status=job.status, run_at=job.run_at, finished_at=job.finished_at,
+                                             error=error, worker='')
+    else:
+        job.status, job.result, job.finished_at = 'succeeded', result, timezone.now()
+        if job.progress_total is not None:
+            job.progress_done = job.progress_total
+        Job.objects.filter(pk=job.pk).update(status='succeeded', result=result, finished_at=job.finished_at,
+                                             progress_done=job.progress_done)
+    finally:
+        stop.set()
+        close_old_connections()
+    return job
@@ -1,3 +1,19 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Order
+from utils.export import export_action
+from utils.pagination import EstimatedCountPaginator
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'subscription_plan', 'status', 'amount', 'created_at', 'paid_at')
+    list_filter = ('status', 'created_at')
+    list_select_related = ('user', 'subscription_plan')
+    search_fields = ('=id', 'user__username', 'user__email', 'transaction_id')
+    raw_id_fields = ('user',)
+    date_hierarchy = 'created_at'
+    readonly_fields = ('created_at', 'updated_at', 'paid_at', 'transaction_id', 'payment_details')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [export_action('orders', 'csv'), export_action('orders', 'jsonl')]
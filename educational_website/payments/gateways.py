@@ -4,6 +4,7 @@ from django.conf import settings
 import stripe
 import paypalrestsdk
 from .models import Order, PaymentMethod
+from utils.metrics import external_call
 
 class PaymentGateway(ABC):
     """Classe abstraite pour les passerelles de paiement"""
@@ -24,6 +25,7 @@ class StripeGateway(PaymentGateway):
     def __init__(self):
         stripe.api_key = settings.STRIPE_SECRET_KEY
     
+    @external_call('stripe', 'process_payment')
     def process_payment(self, order, request):
         # Création d'une intention de paiement Stripe
         try:
@@ -46,6 +48,7 @@ class StripeGateway(PaymentGateway):
                 'redirect_url': None
             }
     
+    @external_call('stripe', 'verify_payment')
     def verify_payment(self, order, request_data):
         # Vérification du paiement Stripe
         try:
@@ -76,6 +79,7 @@ class PayPalGateway(PaymentGateway):
             "client_secret": settings.PAYPAL_CLIENT_SECRET
         })
     
+    @external_call('paypal', 'process_payment')
     def process_payment(self, order, request):
         # Création d'un paiement PayPal
         try:
@@ -125,6 +129,7 @@ class PayPalGateway(PaymentGateway):
                 'redirect_url': None
             }
     
+    @external_call('paypal', 'verify_payment')
     def verify_payment(self, order, request_data):
         # Vérification du paiement PayPal
         try:
@@ -0,0 +1,96 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('processing', 'En cours de traitement'), ('paid', 'Payé'), ('shipped', 'Expédié'), ('delivered', 'Livré'), ('cancelled', 'Annulé'), ('refunded', 'Remboursé')], default='pending', max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('shipping_address', models.TextField(blank=True)),
+                ('billing_address', models.TextField(blank=True)),
+                ('order_notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('transaction_id', models.CharField(blank=True, max_length=255)),
+                ('payment_details', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentMethod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('code', models.SlugField(unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('icon', models.ImageField(blank=True, upload_to='payment_icons/')),
+                ('is_active', models.BooleanField(default=True)),
+                ('requires_shipping', models.BooleanField(default=False)),
+                ('sort_order', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['sort_order', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SubscriptionPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('code', models.SlugField(unique=True)),
+                ('description', models.TextField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('duration_days', models.IntegerField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('features', models.TextField(help_text='Liste des fonctionnalités séparées par des sauts de ligne')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateTimeField()),
+                ('end_date', models.DateTimeField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('auto_renew', models.BooleanField(default=False)),
+                ('order', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='payments.order')),
+                ('subscription_plan', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='payments.subscriptionplan')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-end_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payment_method',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='payments.paymentmethod'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subscription_plan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='payments.subscriptionplan'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'status', 'subscription_plan'], name='order_user_status_plan_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['user', 'is_active'], name='subscription_user_active_idx'),
+        ),
+    ]
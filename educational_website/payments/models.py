@@ -2,6 +2,7 @@
 from django.db import models
 from django.conf import settings
 from videos.models import Video
+from utils.query_cache import CachingManager
 
 class PaymentMethod(models.Model):
     """Méthodes de paiement disponibles sur la plateforme"""
@@ -13,6 +14,8 @@ class PaymentMethod(models.Model):
     requires_shipping = models.BooleanField(default=False)
     sort_order = models.IntegerField(default=0)
     
+    objects = CachingManager()
+    
     def __str__(self):
         return self.name
     
@@ -29,6 +32,8 @@ class SubscriptionPlan(models.Model):
     is_active = models.BooleanField(default=True)
     features = models.TextField(help_text="Liste des fonctionnalités séparées par des sauts de ligne")
     
+    objects = CachingManager()
+    
     def __str__(self):
         return f"{self.name} ({self.price}€)"
 
@@ -67,6 +72,10 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Recherche de la commande en attente lors du checkout
+            models.Index(fields=['user', 'status', 'subscription_plan'], name='order_user_status_plan_idx'),
+        ]
 
 class UserSubscription(models.Model):
     """Abonnement actif d'un utilisateur"""
@@ -83,3 +92,6 @@ class UserSubscription(models.Model):
     
     class Meta:
         ordering = ['-end_date']
+        indexes = [
+            models.Index(fields=['user', 'is_active'], name='subscription_user_active_idx'),
+        ]
@@ -15,7 +15,7 @@ from .gateways import get_gateway
 @login_required
 def subscription_plans(request):
     """Affiche les plans d'abonnement disponibles"""
-    plans = SubscriptionPlan.objects.filter(is_active=True)
+    plans = SubscriptionPlan.objects.filter(is_active=True).cached()
     return render(request, 'payments/subscription_plans.html', {
         'plans': plans
     })
@@ -24,7 +24,7 @@ def subscription_plans(request):
 def checkout(request, plan_id):
     """Page de paiement pour un plan spécifique"""
     plan = get_object_or_404(SubscriptionPlan, id=plan_id, is_active=True)
-    payment_methods = PaymentMethod.objects.filter(is_active=True)
+    payment_methods = PaymentMethod.objects.filter(is_active=True).cached()
     
     # Créer une commande temporaire si elle n'existe pas
     order, created = Order.objects.get_or_create(
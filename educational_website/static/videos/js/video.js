@@ -0,0 +1,51 @@
+// static/videos/js/video.js
+// Lecteur YouTube allégé : la page affiche une miniature et un bouton lecture,
+// l'iframe (et ses centaines de Ko de JavaScript tiers) n'est chargée qu'au clic.
+(function () {
+    'use strict';
+
+    var EMBED_ORIGIN = 'https://www.youtube-nocookie.com';
+    var preconnected = false;
+    // Lien de la recherche dans les transcriptions (?t=secondes) : la lecture démarre à ce moment.
+    // Lu ici plutôt que dans le gabarit : la page en cache reste la même pour tous les ?t=
+    var start = parseInt(new URLSearchParams(window.location.search).get('t'), 10);
+    start = start > 0 ? start : 0;
+
+    // Ouvre les connexions dès le survol pour que l'iframe démarre plus vite
+    function preconnect() {
+        if (preconnected) {
+            return;
+        }
+        preconnected = true;
+        [EMBED_ORIGIN, 'https://www.google.com', 'https://i.ytimg.com'].forEach(function (origin) {
+            var link = document.createElement('link');
+            link.rel = 'preconnect';
+            link.href = origin;
+            document.head.appendChild(link);
+        });
+    }
+
+    function play(facade) {
+        var iframe = document.createElement('iframe');
+        iframe.src = EMBED_ORIGIN + '/embed/' + encodeURIComponent(facade.dataset.youtubeId) + '?autoplay=1' + (start ? '&start=' + start : '');
+        iframe.title = facade.dataset.title || '';
+        iframe.allow = 'accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture';
+        iframe.allowFullscreen = true;
+        facade.replaceChildren(iframe);
+        facade.classList.add('youtube-facade-active');
+        iframe.focus();
+    }
+
+    document.querySelectorAll('.youtube-facade').forEach(function (facade) {
+        var link = facade.querySelector('.youtube-facade-play');
+        if (start && link) {
+            link.href += '&t=' + start + 's';
+        }
+        facade.addEventListener('pointerover', preconnect, { once: true });
+        facade.addEventListener('focusin', preconnect, { once: true });
+        facade.addEventListener('click', function (event) {
+            event.preventDefault();
+            play(facade);
+        }, { once: true });
+    });
+})();
@@ -0,0 +1,239 @@
+# utils/assets.py
+"""
+Static asset pipeline: vendoring, bundling, minification and serving.
+
+build_assets (management command) checks the third-party files vendored in
+static/vendor against their SRI hashes, concatenates and minifies the
+bundles of ASSET_BUNDLES into static/dist, then runs collectstatic. A vendor
+file missing from static/vendor is left out of its bundle and loaded from
+its CDN url instead (vendor_fallback template tag). The staticfiles storage below writes
+content-hashed copies with a manifest (ManifestStaticFilesStorage) plus a
+precompressed .gz sibling of every text file, and serve_static() sends
+hashed files with far-future immutable cache headers.
+"""
+import base64
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import rjsmin
+except ImportError:  # optional: JavaScript is then only concatenated
+    rjsmin = None
+
+# Extensions worth precompressing (images and fonts are already compressed)
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+# Names written by ManifestStaticFilesStorage: styles.1a2b3c4d5e6f.css
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def source_dir():
+    """Directory holding the sources of the bundles (first STATICFILES_DIRS entry)."""
+    return Path(settings.STATICFILES_DIRS[0])
+
+
+# ---------------------------------------------------------------------------
+# Vendoring
+# ---------------------------------------------------------------------------
+
+def check_integrity(data, integrity):
+    """
+    Check downloaded bytes against a Subresource Integrity value.
+
+    Parameters:
+    data (bytes): File content
+    integrity (str): SRI value, e.g. 'sha384-...'
+
+    Returns:
+    bool: Whether the content matches
+    """
+    algorithm, _, expected = integrity.partition('-')
+    digest = base64.b64encode(hashlib.new(algorithm, data).digest()).decode()
+    return digest == expected
+
+
+def missing_vendor_assets():
+    """Names of the VENDOR_ASSETS files not vendored in the static source directory."""
+    return [name for name in settings.VENDOR_ASSETS if not (source_dir() / name).is_file()]
+
+
+def check_vendored(name, spec):
+    """
+    Check a vendored file against its integrity.
+
+    Raises:
+    ValueError: The file does not match spec['integrity']
+    """
+    if not check_integrity((source_dir() / name).read_bytes(), spec['integrity']):
+        raise ValueError(f'{name} does not match {spec["integrity"]}')
+
+
+def vendor_download(name, spec):
+    """
+    Download a vendored file and verify its integrity.
+
+    Parameters:
+    name (str): Destination, relative to the static source directory
+    spec (dict): 'url' and 'integrity' of the file (see VENDOR_ASSETS)
+
+    Returns:
+    Path: The written file
+    """
+    with urllib.request.urlopen(spec['url'], timeout=30) as response:
+        data = response.read()
+    if not check_integrity(data, spec['integrity']):
+        raise ValueError(f'Integrity check failed for {spec["url"]}')
+    path = source_dir() / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def vendor_copy(name, spec, directory):
+    """
+    Copy a vendored file from a local directory (e.g. node_modules/bootstrap/dist).
+
+    The file is looked up by its base name anywhere below the directory and
+    must match the integrity of spec, like a downloaded one.
+
+    Returns:
+    Path: The written file
+    """
+    basename = Path(name).name
+    matches = [match for match in sorted(Path(directory).rglob(basename))
+               if check_integrity(match.read_bytes(), spec['integrity'])]
+    if not matches:
+        raise FileNotFoundError(f'No {basename} matching {spec["integrity"]} in {directory}')
+    path = source_dir() / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(matches[0].read_bytes())
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Bundling and minification
+# ---------------------------------------------------------------------------
+
+def minify_css(text):
+    """Remove comments and insignificant whitespace from a stylesheet."""
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    # Inside declaration blocks only, where ':' cannot be a pseudo-class
+    text = re.sub(r'\{[^{}]*\}', lambda block: re.sub(r':\s+', ':', block.group()), text)
+    text = text.replace(';}', '}')
+    return text.strip()
+
+
+def minify_js(text):
+    """Minify a script with rjsmin when installed, else only trim blank lines."""
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return '\n'.join(line.rstrip() for line in text.splitlines() if line.strip())
+
+
+def build_bundle(name, sources):
+    """
+    Concatenate and minify the sources of a bundle into the static source directory.
+
+    Files already minified (.min.css, .min.js) are copied as they are.
+
+    Parameters:
+    name (str): Bundle path, relative to the static source directory
+    sources (list): Source paths, relative to the static source directory
+
+    Returns:
+    Path: The written bundle
+    """
+    root = source_dir()
+    minify = minify_css if name.endswith('.css') else minify_js
+    parts = []
+    for source in sources:
+        text = (root / source).read_text(encoding='utf-8')
+        if '.min.' not in source:
+            text = minify(text)
+        parts.append(text)
+    separator = '\n' if name.endswith('.css') else ';\n'
+    path = root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(separator.join(parts) + '\n', encoding='utf-8')
+    return path
+
+
+def write_gzip(path):
+    """Write the .gz sibling of a file, with the same modification time."""
+    path = Path(path)
+    data = path.read_bytes()
+    mtime = path.stat().st_mtime
+    gz_path = path.with_name(path.name + '.gz')
+    gz_path.write_bytes(gzip.compress(data, 9, mtime=int(mtime)))
+    os.utime(gz_path, (mtime, mtime))
+    return gz_path
+
+
+class GzipManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed static files with a manifest, plus a precompressed .gz of each text file."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        written = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and not isinstance(processed, Exception):
+                written.update(n for n in (name, hashed_name) if n)
+            yield name, hashed_name, processed
+        for name in sorted(written):
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                write_gzip(self.path(name))
+
+
+# ---------------------------------------------------------------------------
+# Serving
+# ---------------------------------------------------------------------------
+
+def serve_static(request, path):
+    """
+    Serve a collected static file (STATIC_ROOT), preferring its .gz sibling.
+
+    Content-hashed names never change content, so they are cached for a
+    year as immutable; other names are revalidated after a short delay.
+    """
+    try:
+        full_path = Path(safe_join(settings.STATIC_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not full_path.is_file():
+        raise Http404
+
+    stat = full_path.stat()
+    last_modified = int(stat.st_mtime)
+    immutable = bool(HASHED_NAME.search(full_path.name))
+    directives = ({'public': True, 'max_age': IMMUTABLE_MAX_AGE, 'immutable': True} if immutable
+                  else {'public': True, 'max_age': 300})
+
+    response = get_conditional_response(request, last_modified=last_modified)
+    if response is None:
+        content_type, _ = mimetypes.guess_type(full_path.name)
+        gz_path = full_path.with_name(full_path.name + '.gz')
+        if 'gzip' in request.headers.get('Accept-Encoding', '') and gz_path.is_file():
+            response = FileResponse(gz_path.open('rb'), content_type=content_type)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = FileResponse(full_path.open('rb'), content_type=content_type)
+        response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, **directives)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
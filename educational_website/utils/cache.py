@@ -0,0 +1,170 @@
+# utils/cache.py
+"""
+Shared cache helpers: namespaced keys, stampede protection and stale serving.
+
+Values are stored in an envelope holding their logical expiry and the time
+it took to compute them, and kept physically for CACHE_STALE_TTL seconds
+longer. get_or_compute() then:
+
+- refreshes a value probabilistically before it expires (XFetch), the
+  probability growing as expiry approaches and with the compute cost, so hot
+  keys are renewed by a single request instead of all at once;
+- lets a single worker recompute an expired value (single-flight lock), the
+  others keep serving the stale copy, or wait for it at most
+  CACHE_COLD_KEY_WAIT seconds when there is none;
+- serves stale values of a namespace without recomputing them while it is
+  overloaded, i.e. one of its computations recently failed with a
+  DatabaseError, or CACHE_OVERLOAD_SLOW_COMPUTES of them took longer than
+  CACHE_SLOW_COMPUTE_SECONDS within CACHE_OVERLOAD_COOLDOWN seconds.
+"""
+import hashlib
+import logging
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+
+def namespace_version(namespace):
+    """Current version of a namespace (bumped by invalidate())."""
+    key = f'cache:ns:{namespace}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def invalidate(*namespaces):
+    """
+    Invalidate every key of the given namespaces at once.
+
+    Keys embed the namespace version, so bumping it makes old entries
+    unreachable; they expire on their own.
+    """
+    for namespace in namespaces:
+        key = f'cache:ns:{namespace}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, None)
+
+
+def make_key(namespace, *parts):
+    """
+    Build a versioned cache key.
+
+    Parameters:
+    namespace (str): Group of keys invalidated together (e.g. 'catalog')
+    parts: Values identifying the entry inside the namespace
+
+    Returns:
+    str: The cache key
+    """
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'{namespace}:v{namespace_version(namespace)}:{digest}'
+
+
+def is_overloaded(namespace):
+    """Whether stale values of a namespace should be served instead of querying the database."""
+    return bool(cache.get(f'cache:overloaded:{namespace}'))
+
+
+def mark_overloaded(namespace, reason):
+    logger.warning('Serving stale %s cache entries for %ss: %s', namespace, settings.CACHE_OVERLOAD_COOLDOWN, reason)
+    cache.set(f'cache:overloaded:{namespace}', True, settings.CACHE_OVERLOAD_COOLDOWN)
+
+
+def record_slow_compute(namespace, reason):
+    """Count a slow computation; several within the cooldown window mark the namespace overloaded."""
+    key = f'cache:slow:{namespace}'
+    cache.add(key, 0, settings.CACHE_OVERLOAD_COOLDOWN)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, 1, settings.CACHE_OVERLOAD_COOLDOWN)
+        count = 1
+    if count >= settings.CACHE_OVERLOAD_SLOW_COMPUTES:
+        mark_overloaded(namespace, reason)
+
+
+def _store(key, value, delta, ttl):
+    envelope = {'value': value, 'expires': time.time() + ttl, 'delta': delta}
+    cache.set(key, envelope, ttl + settings.CACHE_STALE_TTL)
+
+
+def _compute_and_store(namespace, key, compute, ttl):
+    start = time.perf_counter()
+    value = compute()
+    delta = time.perf_counter() - start
+    if delta > settings.CACHE_SLOW_COMPUTE_SECONDS:
+        record_slow_compute(namespace, f'computing {key} took {delta:.2f}s')
+    _store(key, value, delta, ttl)
+    return value
+
+
+def get_or_compute(namespace, parts, compute, ttl, beta=1.0):
+    """
+    Return a cached value, computing it at most once across workers.
+
+    Parameters:
+    namespace (str): Namespace of the key, see make_key()
+    parts (tuple): Values identifying the entry inside the namespace
+    compute (callable): Function computing the value when needed
+    ttl (int): Freshness lifetime in seconds
+    beta (float): Eagerness of early refresh (1.0 is the usual XFetch value)
+
+    Returns:
+    The cached or freshly computed value
+    """
+    key = make_key(namespace, *parts)
+    envelope = cache.get(key)
+    now = time.time()
+
+    if envelope is not None:
+        # XFetch : -log(random) est une variable exponentielle de moyenne 1
+        early = envelope['delta'] * beta * -math.log(random.random() or 1e-12)
+        if now + early < envelope['expires']:
+            metrics.record_cache_access(True)
+            return envelope['value']
+        if is_overloaded(namespace):
+            metrics.record_cache_access(True)
+            return envelope['value']
+    metrics.record_cache_access(False)
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, settings.CACHE_LOCK_TIMEOUT):
+        try:
+            return _compute_and_store(namespace, key, compute, ttl)
+        except DatabaseError as e:
+            if envelope is None:
+                raise
+            mark_overloaded(namespace, e)
+            return envelope['value']
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    # Another worker is recomputing: serve the stale copy if there is one
+    if envelope is not None:
+        return envelope['value']
+
+    # Cold key: wait briefly for the other worker, then compute rather than hold the request
+    deadline = time.monotonic() + settings.CACHE_COLD_KEY_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        envelope = cache.get(key)
+        if envelope is not None:
+            return envelope['value']
+    return _compute_and_store(namespace, key, compute, ttl)
@@ -0,0 +1,103 @@
+# utils/captions.py
+"""
+Streaming parser for WebVTT (.vtt) and SubRip (.srt) caption files.
+
+Both formats are sequences of blank-line separated blocks whose timing line
+reads "start --> end"; the text lines follow it. The file is read line by
+line, so a caption track of any length is parsed in constant memory.
+"""
+import html
+import re
+from collections import namedtuple
+
+Cue = namedtuple('Cue', 'start end text')
+
+CAPTION_EXTENSIONS = ('.vtt', '.srt')
+
+# 01:02:03.456 (VTT), 01:02:03,456 (SRT) or 02:03.456 (VTT without hours)
+TIMESTAMP = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})')
+TAG = re.compile(r'<[^>]*>')
+# Blocks of a VTT file that hold no caption
+VTT_HEADERS = ('WEBVTT', 'NOTE', 'STYLE', 'REGION')
+
+
+def parse_timestamp(value):
+    """Seconds (float) of a caption timestamp, or None if it cannot be parsed."""
+    match = TIMESTAMP.search(value)
+    if match is None:
+        return None
+    hours, minutes, seconds, fraction = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(fraction.ljust(3, '0')) / 1000
+
+
+def clean_text(line):
+    """Caption text without styling tags (<b>, <c.color>, inline <00:00:01.000> timings) and entities."""
+    return ' '.join(html.unescape(TAG.sub('', line)).split())
+
+
+def parse_captions(lines):
+    """
+    Parse caption lines.
+
+    Automatic YouTube captions repeat the previous line at the top of each
+    cue (rolling captions); lines already shown by the previous cue are
+    dropped so each spoken word is indexed once.
+
+    Parameters:
+    lines (iterable): Lines of a .vtt or .srt file
+
+    Yields:
+    Cue: (start, end, text) with times in seconds, in file order
+    """
+    shown = ()
+    block = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            block.append(line)
+            continue
+        if block:
+            cue, shown = _parse_block(block, shown)
+            if cue is not None:
+                yield cue
+        block = []
+    if block:
+        cue, _ = _parse_block(block, shown)
+        if cue is not None:
+            yield cue
+
+
+def _parse_block(block, shown):
+    """
+    Cue of a block and its text lines.
+
+    Returns:
+    tuple: (Cue or None, lines shown by the block); headers, notes, malformed
+        blocks and cues without new text give no Cue
+    """
+    if block[0].startswith(VTT_HEADERS):
+        return None, shown
+    for index, line in enumerate(block):
+        if '-->' in line:
+            start, _, end = line.partition('-->')
+            start, end = parse_timestamp(start), parse_timestamp(end)
+            if start is None or end is None:
+                return None, shown
+            lines = [text for text in map(clean_text, block[index + 1:]) if text]
+            new = [text for text in lines if text not in shown]
+            return (Cue(start, end, ' '.join(new)) if new else None), lines
+    return None, shown
+
+
+def read_captions(path):
+    """
+    Stream the cues of a caption file.
+
+    Parameters:
+    path (str): .vtt or .srt file (UTF-8, with or without BOM)
+
+    Yields:
+    Cue: (start, end, text) in seconds
+    """
+    with open(path, encoding='utf-8-sig', errors='replace') as f:
+        yield from parse_captions(f)
@@ -0,0 +1,304 @@
+# utils/catalog_snapshot.py
+"""
+Columnar in-memory snapshot of the video catalog.
+
+The catalog only changes when ingestion runs, yet home and category pages
+filter and sort it on every request. build_snapshot() exports the card
+metadata into one NumPy array per column (.npy files) in a new version
+directory, then atomically repoints the CATALOG_SNAPSHOT_DIR/current symlink.
+Workers open the arrays with mmap_mode='r', so every gunicorn worker shares
+the same page-cache pages (zero copy) and picks up a new version on its next
+check without a restart.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from videos.models import VideoCard
+from utils.cache import invalidate
+
+# Column name -> (NumPy dtype, VideoCard field)
+COLUMNS = {
+    'ids': (np.int64, 'pk'),
+    'publish_date': (np.int64, 'publish_date'),
+    'views_count': (np.int64, 'views_count'),
+    'likes_count': (np.int64, 'likes_count'),
+    'duration': (np.int32, 'duration'),
+    'category': (np.int32, 'category_id'),
+    'subcategory': (np.int32, 'subcategory_id'),
+    'featured': (np.bool_, 'featured'),
+}
+
+# Sort keys accepted by CatalogSnapshot.query(), named like the model fields
+SORTABLE = ('publish_date', 'views_count', 'likes_count', 'duration')
+
+# Versions kept on disk besides the current one (workers may still map them)
+KEEP_VERSIONS = 2
+
+
+def _root():
+    return Path(settings.CATALOG_SNAPSHOT_DIR)
+
+
+def _to_row(values):
+    pk, publish_date, views, likes, duration, category, subcategory, featured = values
+    return (
+        pk,
+        int(publish_date.timestamp()),
+        views,
+        likes,
+        int(duration.total_seconds()) if duration is not None else -1,
+        category,
+        subcategory if subcategory is not None else -1,
+        featured,
+    )
+
+
+def build_snapshot(chunk_size=10000):
+    """
+    Export the catalog into a new snapshot version and make it current.
+
+    Parameters:
+    chunk_size (int): Rows read from the database per round trip
+
+    Returns:
+    Path: Directory of the new version
+    """
+    fields = [field for _, field in COLUMNS.values()]
+    count = VideoCard.objects.count()
+
+    root = _root()
+    root.mkdir(parents=True, exist_ok=True)
+    version = f'v{timezone.now():%Y%m%d%H%M%S%f}'
+    tmp_dir = root / f'.{version}.{os.getpid()}.tmp'
+    tmp_dir.mkdir()
+
+    # Columns are written in place, chunk by chunk: memory stays constant whatever the catalog size
+    columns = {name: np.lib.format.open_memmap(tmp_dir / f'{name}.npy', mode='w+', dtype=dtype, shape=(count,))
+               for name, (dtype, _) in COLUMNS.items()}
+    rows = VideoCard.objects.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+    filled = 0
+    while filled < count:
+        # Cards created after count() are left for the next build
+        chunk = [_to_row(values) for values in islice(rows, min(chunk_size, count - filled))]
+        if not chunk:
+            break
+        for position, column in enumerate(columns.values()):
+            column[filled:filled + len(chunk)] = [row[position] for row in chunk]
+        filled += len(chunk)
+    for column in columns.values():
+        column.flush()
+    del columns
+    if filled < count:
+        # Cards deleted after count(): drop the unused tail
+        for name in COLUMNS:
+            path, trimmed = tmp_dir / f'{name}.npy', tmp_dir / f'{name}.trimmed.npy'
+            np.save(trimmed, np.load(path, mmap_mode='r')[:filled])
+            os.replace(trimmed, path)
+    (tmp_dir / 'meta.json').write_text(json.dumps({
+        'version': version, 'count': filled, 'built_at': timezone.now().isoformat(),
+    }))
+
+    version_dir = root / version
+    os.rename(tmp_dir, version_dir)
+
+    # Atomic swap: readers see either the old or the new version, never a mix
+    link_tmp = root / f'.current.{os.getpid()}.tmp'
+    if link_tmp.is_symlink():
+        link_tmp.unlink()
+    os.symlink(version, link_tmp)
+    os.replace(link_tmp, root / 'current')
+
+    _remove_old_versions(root, version)
+    return version_dir
+
+
+def _remove_old_versions(root, current):
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and p.name.startswith('v') and p.name != current)
+    for path in versions[:-KEEP_VERSIONS]:
+        # Workers that still map these files keep their pages until they reload
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class CatalogSnapshot:
+    """Read-only view over one snapshot version, memory-mapped from disk."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.meta = json.loads((self.directory / 'meta.json').read_text())
+        self.columns = {
+            name: np.load(self.directory / f'{name}.npy', mmap_mode='r')
+            for name in COLUMNS
+        }
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    def __len__(self):
+        return self.meta['count']
+
+    def _mask(self, category=None, subcategory=None, featured=None,
+              min_duration=None, max_duration=None, published_after=None):
+        columns = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        if category is not None:
+            mask &= columns['category'] == category
+        if subcategory is not None:
+            mask &= columns['subcategory'] == subcategory
+        if featured is not None:
+            mask &= columns['featured'] == featured
+        if min_duration is not None:
+            mask &= columns['duration'] >= min_duration
+        if max_duration is not None:
+            mask &= (columns['duration'] >= 0) & (columns['duration'] < max_duration)
+        if published_after is not None:
+            mask &= columns['publish_date'] >= int(published_after.timestamp())
+        return mask
+
+    def count(self, **filters):
+        """Number of videos matching the filters."""
+        return int(np.count_nonzero(self._mask(**filters)))
+
+    def query(self, order_by='-publish_date', offset=0, limit=12, **filters):
+        """
+        Filter, sort and paginate the catalog.
+
+        Only the first offset + limit positions are ordered (top-k with
+        argpartition), so deep catalogs cost the same as small pages.
+
+        Parameters:
+        order_by (str): One of SORTABLE, prefixed with '-' for descending order
+        offset (int): Number of matching videos to skip
+        limit (int): Maximum number of ids returned
+        filters: category, subcategory, featured, min_duration, max_duration,
+            published_after
+
+        Returns:
+        list: Video primary keys, in order
+        """
+        descending = order_by.startswith('-')
+        field = order_by.lstrip('-')
+        if field not in SORTABLE:
+            raise ValueError(f'Unsupported sort key: {order_by}')
+
+        positions = np.flatnonzero(self._mask(**filters))
+        wanted = min(offset + limit, len(positions))
+        if wanted <= 0:
+            return []
+
+        keys = np.asarray(self.columns[field][positions], dtype=np.int64)
+        if descending:
+            keys = -keys
+        if wanted < len(positions):
+            top = np.argpartition(keys, wanted - 1)[:wanted]
+            top = top[np.argsort(keys[top], kind='stable')]
+        else:
+            top = np.argsort(keys, kind='stable')
+        return self.columns['ids'][positions[top[offset:wanted]]].tolist()
+
+    def listing(self, order_by='-publish_date', **filters):
+        """Lazy, sliceable sequence of VideoCard objects (usable by Paginator)."""
+        return SnapshotListing(self, order_by, filters)
+
+
+class SnapshotListing:
+    """Sequence of video cards backed by a snapshot query, loaded slice by slice."""
+
+    def __init__(self, snapshot, order_by, filters):
+        self.snapshot = snapshot
+        self.order_by = order_by
+        self.filters = filters
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.snapshot.count(**self.filters)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[0:self.count()])
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        stop = self.count() if item.stop is None else item.stop
+        ids = self.snapshot.query(self.order_by, offset=start, limit=max(stop - start, 0), **self.filters)
+        cards = VideoCard.objects.in_bulk(ids)
+        # Videos deleted since the snapshot was built are skipped
+        return [cards[pk] for pk in ids if pk in cards]
+
+
+_lock = threading.Lock()
+_current = None
+_checked_at = 0.0
+
+
+def get_snapshot():
+    """
+    Return the current snapshot, or None if none has been built yet.
+
+    The current version is re-checked at most every
+    CATALOG_SNAPSHOT_CHECK_INTERVAL seconds, so a new import is picked up by
+    every worker shortly after build_snapshot() swaps it in.
+    """
+    global _current, _checked_at
+    now = time.monotonic()
+    if _current is not None and now - _checked_at < settings.CATALOG_SNAPSHOT_CHECK_INTERVAL:
+        return _current
+
+    with _lock:
+        _checked_at = now
+        link = _root() / 'current'
+        try:
+            version = os.readlink(link)
+        except OSError:
+            _current = None
+            return None
+        if _current is None or _current.version != version:
+            try:
+                _current = CatalogSnapshot(_root() / version)
+            except (OSError, ValueError):
+                # Version removed between readlink() and load: keep the previous one
+                pass
+        return _current
+
+
+def listing(fallback, order_by='-publish_date', **filters):
+    """
+    Catalog listing from the snapshot when one exists, else the fallback queryset.
+
+    Parameters:
+    fallback (QuerySet): Equivalent VideoCard queryset used without a snapshot
+    order_by (str): Sort key, see CatalogSnapshot.query()
+    filters: Filters, see CatalogSnapshot.query()
+    """
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return fallback
+    return snapshot.listing(order_by, **filters)
+
+
+def publish_catalog():
+    """
+    Make the result of an import visible: build a new snapshot and invalidate
+    the cached catalog and search results.
+
+    Returns:
+    Path: Directory of the new snapshot version
+    """
+    version_dir = build_snapshot()
+    invalidate('catalog', 'search')
+    return version_dir
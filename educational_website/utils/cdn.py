@@ -0,0 +1,93 @@
+# utils/cdn.py
+"""
+CDN purge by surrogate key.
+
+Pages send a Surrogate-Key header listing what they display (see
+utils.http_cache); when a model changes, its signal handlers call purge()
+with the matching keys so the CDN drops every page showing it. Purges are
+sent after the transaction commits, and grouped when they happen inside
+batch() (e.g. a YouTube import saving hundreds of videos).
+"""
+import json
+import logging
+import threading
+import urllib.request
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from utils.metrics import external_call
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def video_key(pk):
+    return f'video-{pk}'
+
+
+def category_key(pk):
+    return f'category-{pk}'
+
+
+def page_key(pk):
+    return f'page-{pk}'
+
+
+def send_purge(keys):
+    """
+    Ask the CDN to drop every cached page tagged with one of the keys.
+
+    Parameters:
+    keys (iterable): Surrogate keys
+
+    Returns:
+    bool: Whether the purge request succeeded (False when no CDN is configured)
+    """
+    keys = sorted(set(keys))
+    if not settings.CDN_PURGE_URL or not keys:
+        return False
+    request = urllib.request.Request(
+        settings.CDN_PURGE_URL,
+        data=json.dumps({'surrogate_keys': keys}).encode(),
+        headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {settings.CDN_PURGE_TOKEN}'},
+        method='POST',
+    )
+    try:
+        with external_call('cdn', 'purge'):
+            with urllib.request.urlopen(request, timeout=settings.CDN_PURGE_TIMEOUT) as response:
+                response.read()
+    except OSError as e:
+        # The CDN falls back on max-age expiry: a failed purge must not break a save
+        logger.warning('CDN purge of %s failed: %s', ', '.join(keys), e)
+        return False
+    return True
+
+
+def purge(*keys):
+    """Purge the given surrogate keys once the current transaction commits."""
+    if not settings.CDN_PURGE_URL:
+        return
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.update(keys)
+    else:
+        transaction.on_commit(lambda: send_purge(keys))
+
+
+@contextmanager
+def batch():
+    """Group the purges requested inside the block into a single request."""
+    if getattr(_local, 'pending', None) is not None:
+        # Nested batch: the outermost one sends
+        yield
+        return
+    _local.pending = set()
+    try:
+        yield
+    finally:
+        keys, _local.pending = _local.pending, None
+        if keys:
+            transaction.on_commit(lambda: send_purge(keys))
@@ -0,0 +1,163 @@
+# utils/classifier.py
+"""
+Multinomial Naive Bayes text classifier on hashed n-gram features, in NumPy.
+
+Texts are tokenized into unigrams and bigrams (title tokens are tagged so a
+word weighs differently in the title and in the description), and each
+n-gram is hashed into one of n_features buckets: no vocabulary to store, and
+unseen words need no special case. A batch of texts becomes a CSR-like
+sparse matrix (indptr, indices, counts) without SciPy; training is one
+bincount over (class, bucket) pairs, prediction one gather and segmented sum
+over the log-likelihood matrix, so both run in vectorized batches.
+"""
+import re
+import zlib
+
+import numpy as np
+
+TOKEN = re.compile(r'[^\W_]+', re.UNICODE)
+
+# Feature -> crc32 memo (vocabularies repeat a lot: hashing dominates otherwise)
+_bucket_cache = {}
+_BUCKET_CACHE_LIMIT = 1_000_000
+
+
+def ngrams(title, description=''):
+    """Unigrams and bigrams of a video text, title tokens prefixed with 't:'."""
+    features = []
+    for prefix, text in (('t:', title), ('', description)):
+        tokens = TOKEN.findall((text or '').lower())
+        features.extend(prefix + token for token in tokens)
+        features.extend(f'{prefix}{a} {b}' for a, b in zip(tokens, tokens[1:]))
+    return features
+
+
+def _hashes(features):
+    """crc32 of each feature, through the memo (dict lookups run at C speed with map())."""
+    try:
+        return list(map(_bucket_cache.__getitem__, features))
+    except KeyError:
+        pass
+    if len(_bucket_cache) >= _BUCKET_CACHE_LIMIT:
+        _bucket_cache.clear()
+    crc32 = zlib.crc32
+    _bucket_cache.update({feature: crc32(feature.encode()) for feature in set(features).difference(_bucket_cache)})
+    return list(map(_bucket_cache.__getitem__, features))
+
+
+def vectorize(documents, n_features):
+    """
+    Hash a batch of documents into a sparse count matrix.
+
+    Parameters:
+    documents (iterable): (title, description) pairs
+    n_features (int): Number of hash buckets
+
+    Returns:
+    tuple: (indptr, indices, counts) arrays in CSR layout, one row per document
+    """
+    features = []
+    lengths = []
+    for title, description in documents:
+        document_features = ngrams(title, description)
+        features.extend(document_features)
+        lengths.append(len(document_features))
+    n_documents = len(lengths)
+    rows = np.repeat(np.arange(n_documents, dtype=np.int64), lengths)
+    hashes = np.fromiter(_hashes(features), dtype=np.int64, count=len(features))
+    # One (document, bucket) key per feature occurrence; unique() sorts and counts them in one pass
+    keys, counts = np.unique(rows * n_features + hashes % n_features, return_counts=True)
+    indptr = np.zeros(n_documents + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n_features, minlength=n_documents), out=indptr[1:])
+    return indptr, keys % n_features, counts.astype(np.float32)
+
+
+class NaiveBayesClassifier:
+    """
+    Multinomial Naive Bayes with Laplace/Lidstone smoothing.
+
+        model = NaiveBayesClassifier().fit(documents, labels)
+        labels, confidences = model.predict(documents)
+    """
+
+    def __init__(self, n_features=2 ** 18, alpha=0.5):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.classes = None
+        self.class_log_prior = None
+        # (n_classes, n_features) log P(bucket | class), float32 to halve memory
+        self.feature_log_prob = None
+
+    def fit(self, documents, labels):
+        """
+        Learn from labelled documents.
+
+        Parameters:
+        documents (list): (title, description) pairs
+        labels (list): Class of each document (e.g. subcategory pks)
+        """
+        self.classes, y = np.unique(np.asarray(labels), return_inverse=True)
+        n_classes = len(self.classes)
+        indptr, indices, counts = vectorize(documents, self.n_features)
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        feature_counts = np.bincount(y[rows] * self.n_features + indices, weights=counts,
+                                     minlength=n_classes * self.n_features).reshape(n_classes, self.n_features)
+        smoothed = feature_counts + self.alpha
+        self.feature_log_prob = (np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))).astype(np.float32)
+        class_counts = np.bincount(y, minlength=n_classes)
+        self.class_log_prior = np.log(class_counts / class_counts.sum())
+        return self
+
+    def joint_log_likelihood(self, documents):
+        """(n_documents, n_classes) unnormalized log posteriors."""
+        indptr, indices, counts = vectorize(documents, self.n_features)
+        n_documents = len(indptr) - 1
+        scores = np.tile(self.class_log_prior, (n_documents, 1))
+        nonempty = np.flatnonzero(np.diff(indptr))
+        if len(nonempty):
+            # Contribution of every (document, bucket) pair, summed per document
+            contributions = self.feature_log_prob[:, indices].T * counts[:, None]
+            scores[nonempty] += np.add.reduceat(contributions, indptr[nonempty], axis=0)
+        return scores
+
+    def predict(self, documents, allowed=None):
+        """
+        Most likely class of each document and its probability.
+
+        Parameters:
+        documents (list): (title, description) pairs
+        allowed (ndarray): Optional (n_documents, n_classes) boolean mask of the
+            classes each document may take (e.g. subcategories of its category)
+
+        Returns:
+        tuple: (classes array, confidences array); documents without any allowed
+            class get class None and confidence 0
+        """
+        scores = self.joint_log_likelihood(documents)
+        if allowed is not None:
+            scores = np.where(allowed, scores, -np.inf)
+        best = scores.argmax(axis=1)
+        top = scores[np.arange(len(scores)), best]
+        valid = np.isfinite(top)
+        # Softmax probability of the best class, computed stably
+        with np.errstate(invalid='ignore'):
+            confidences = np.where(valid, 1 / np.exp(scores - top[:, None]).sum(axis=1), 0.0)
+        labels = np.where(valid, self.classes[best], None) if len(scores) else np.array([], dtype=object)
+        return labels, confidences
+
+    def save(self, path):
+        """Store the model in a .npz file."""
+        np.savez_compressed(path, classes=self.classes, class_log_prior=self.class_log_prior,
+                            feature_log_prob=self.feature_log_prob,
+                            params=np.array([self.n_features, self.alpha]))
+
+    @classmethod
+    def load(cls, path):
+        """Model stored by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            n_features, alpha = data['params']
+            model = cls(int(n_features), float(alpha))
+            model.classes = data['classes']
+            model.class_log_prior = data['class_log_prior']
+            model.feature_log_prob = data['feature_log_prob']
+        return model
@@ -0,0 +1,204 @@
+# utils/duplicates.py
+"""
+Near-duplicate video detection (re-uploads, mirrored channels, copied descriptions).
+
+Each video gets a MinHash signature of its title and description
+(VideoSignature) and one LSH key per band (VideoSignatureBand, indexed).
+Indexing a batch of videos looks up the other videos sharing one of their
+keys, estimates the similarity from the signatures, and records the pairs
+above DUPLICATE_SIMILARITY_THRESHOLD as DuplicateCandidate rows, the older
+video being the original. Admins then merge, hide or dismiss them.
+"""
+import hashlib
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import Bookmark, UserVideoHistory
+from utils import cdn, minhash
+from utils.cache import invalidate
+from videos.models import DuplicateCandidate, Resource, Video, VideoCard, VideoSignature, VideoSignatureBand
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def text_hash(title, description):
+    """Fingerprint of the signed text, to skip videos whose text did not change."""
+    return hashlib.sha1(f'{title}\n{description}'.encode()).hexdigest()
+
+
+def index_videos(video_ids=None, threshold=None, batch_size=500, force=False):
+    """
+    Sign videos, update the LSH index and record their duplicate candidates.
+
+    Parameters:
+    video_ids (iterable): Primary keys of the videos, or None for every video
+    threshold (float): Minimum estimated similarity (default: DUPLICATE_SIMILARITY_THRESHOLD)
+    batch_size (int): Videos signed and looked up per batch
+    force (bool): Re-sign videos whose text did not change
+
+    Returns:
+    dict: Number of videos 'indexed' and new 'candidates'
+    """
+    threshold = settings.DUPLICATE_SIMILARITY_THRESHOLD if threshold is None else threshold
+    counts = {'indexed': 0, 'candidates': 0}
+    videos = Video.objects.order_by('pk')
+    if video_ids is not None:
+        videos = videos.filter(pk__in=list(video_ids))
+    rows = videos.values_list('pk', 'title', 'description', 'duplicate_of_id')
+    for batch in _chunks(rows.iterator(chunk_size=batch_size), batch_size):
+        known = dict(VideoSignature.objects.filter(video_id__in=[row[0] for row in batch])
+                     .values_list('video_id', 'text_hash'))
+        now = timezone.now()
+        signed, signatures, bands = {}, [], []
+        for pk, title, description, duplicate_of_id in batch:
+            digest = text_hash(title, description)
+            if not force and known.get(pk) == digest:
+                continue
+            sig = minhash.signature(minhash.shingles(title, description))
+            if sig is None:
+                continue
+            signatures.append(VideoSignature(video_id=pk, minhash=minhash.to_bytes(sig), text_hash=digest,
+                                             computed_at=now))
+            bands.extend(VideoSignatureBand(video_id=pk, key=key) for key in minhash.band_keys(sig))
+            # Hidden duplicates stay in the index (as originals of nothing) but are not paired again
+            if duplicate_of_id is None:
+                signed[pk] = sig
+        if not signatures:
+            continue
+        changed = [signature.video_id for signature in signatures]
+        with transaction.atomic():
+            VideoSignature.objects.bulk_create(signatures, update_conflicts=True, unique_fields=['video'],
+                                               update_fields=['minhash', 'text_hash', 'computed_at'])
+            VideoSignatureBand.objects.filter(video_id__in=changed).delete()
+            VideoSignatureBand.objects.bulk_create(bands, batch_size=2000)
+            # The pending pairs of a changed text are found again below if they still match
+            DuplicateCandidate.objects.filter(Q(video_id__in=changed) | Q(original_id__in=changed),
+                                              status='pending').delete()
+            counts['candidates'] += _record_candidates(signed, threshold)
+        counts['indexed'] += len(signatures)
+    return counts
+
+
+def _record_candidates(signed, threshold):
+    """Compare the signed videos with the videos sharing one of their LSH keys; returns the number of new pairs."""
+    if not signed:
+        return 0
+    keys = {pk: minhash.band_keys(sig) for pk, sig in signed.items()}
+    buckets = {}
+    for key, video_id in (VideoSignatureBand.objects
+                          .filter(key__in={key for video_keys in keys.values() for key in video_keys},
+                                  video__duplicate_of__isnull=True)
+                          .values_list('key', 'video_id')):
+        buckets.setdefault(key, set()).add(video_id)
+    neighbours = {pk: set().union(*(buckets.get(key, ()) for key in video_keys)) - {pk}
+                  for pk, video_keys in keys.items()}
+    others = set().union(*neighbours.values()) - set(signed)
+    stored = {video_id: minhash.from_bytes(data) for video_id, data in
+              VideoSignature.objects.filter(video_id__in=others).values_list('video_id', 'minhash')}
+    all_signatures = {**stored, **signed}
+
+    pairs = {}
+    for pk, candidates in neighbours.items():
+        candidates = [other for other in candidates if other in all_signatures]
+        if not candidates:
+            continue
+        scores = minhash.similarity(signed[pk], np.stack([all_signatures[other] for other in candidates]))
+        for other, score in zip(candidates, scores):
+            if score >= threshold:
+                pairs[min(pk, other), max(pk, other)] = float(score)
+    if not pairs:
+        return 0
+
+    # The older video is kept as the original (ties: the first imported)
+    dates = dict(Video.objects.filter(pk__in={pk for pair in pairs for pk in pair}).values_list('pk', 'publish_date'))
+    rows = []
+    for (first, second), score in pairs.items():
+        video, original = (second, first) if (dates[first], first) <= (dates[second], second) else (first, second)
+        rows.append((video, original, score))
+    existing = set(DuplicateCandidate.objects.filter(video_id__in=[row[0] for row in rows])
+                   .values_list('video_id', 'original_id'))
+    # ignore_conflicts: pairs already merged, hidden or dismissed keep their status
+    new = [DuplicateCandidate(video_id=video, original_id=original, similarity=score)
+           for video, original, score in rows if (video, original) not in existing]
+    DuplicateCandidate.objects.bulk_create(new, ignore_conflicts=True)
+    return len(new)
+
+
+def hide_duplicates(candidates, status='hidden'):
+    """
+    Hide the duplicate video of each candidate pair behind its original.
+
+    The duplicate keeps its row (and its YouTube id, so imports do not
+    recreate it) but loses its card: list pages no longer show it once the
+    catalog snapshot is rebuilt (queued here), and its page redirects to the
+    original.
+
+    Parameters:
+    candidates (QuerySet): DuplicateCandidate rows to resolve
+    status (str): Status recorded on the pairs
+
+    Returns:
+    dict: Original pk by hidden video pk
+    """
+    pairs = dict(candidates.exclude(status__in=['merged', 'hidden']).filter(video__duplicate_of__isnull=True)
+                 .values_list('video_id', 'original_id'))
+    # An original hidden in the meantime is replaced by its own original
+    hidden_originals = dict(Video.objects.filter(pk__in=set(pairs.values()), duplicate_of__isnull=False)
+                            .values_list('pk', 'duplicate_of_id'))
+    targets = {video: hidden_originals.get(original, original) for video, original in pairs.items()
+               if hidden_originals.get(original, original) != video}
+    if not targets:
+        return {}
+    now = timezone.now()
+    by_original = {}
+    for video, original in targets.items():
+        by_original.setdefault(original, []).append(video)
+    with transaction.atomic():
+        for original, videos in by_original.items():
+            # Videos already hidden behind one of these duplicates follow it to the original
+            Video.objects.filter(Q(pk__in=videos) | Q(duplicate_of__in=videos)).update(
+                duplicate_of=original, updated_at=now)
+        candidates.filter(video_id__in=list(targets)).update(status=status, resolved_at=now)
+        # update() skips the signals: the cards of the hidden videos are dropped here
+        VideoCard.objects.refresh(list(targets))
+
+    # videos.jobs imports this module through utils.youtube_api
+    from videos.jobs import schedule_publish_catalog
+
+    categories = dict(Video.objects.filter(pk__in=[*targets, *by_original]).values_list('pk', 'category_id'))
+    invalidate('catalog', 'search')
+    cdn.purge(*[cdn.video_key(pk) for pk in categories], *{cdn.category_key(c) for c in categories.values()},
+              'catalog', 'search')
+    # Snapshot listings (home, categories) still count the hidden videos until rebuilt
+    schedule_publish_catalog()
+    return targets
+
+
+def merge_duplicates(candidates):
+    """
+    Hide the duplicates and move their resources, bookmarks and watch history to the originals.
+
+    Returns:
+    dict: Original pk by merged video pk
+    """
+    with transaction.atomic():
+        targets = hide_duplicates(candidates, status='merged')
+        for video, original in targets.items():
+            Resource.objects.filter(video_id=video).update(video_id=original)
+            # A user who bookmarked both keeps the bookmark of the original
+            Bookmark.objects.filter(video_id=video, user__bookmarks__video_id=original).delete()
+            Bookmark.objects.filter(video_id=video).update(video_id=original)
+            UserVideoHistory.objects.filter(video_id=video).update(video_id=original)
+    return targets
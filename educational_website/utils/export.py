@@ -0,0 +1,222 @@
+# utils/export.py
+"""
+Streaming bulk exports (CSV or JSON Lines, optionally gzip-compressed).
+
+Rows are read with values_list().iterator(chunk_size) - a server-side
+cursor on PostgreSQL, fetchmany() on SQLite - serialized a chunk at a time
+and compressed incrementally, so memory stays constant whatever the table
+size. The same generator feeds StreamingHttpResponse (staff views and admin
+actions) and files (« manage.py export_data »).
+
+    rows = stream_export('orders', 'csv', filters={'status': 'paid'}, compress=True)
+"""
+import csv
+import datetime
+import io
+import json
+import zlib
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from accounts.models import UserVideoHistory
+from payments.models import Order
+from videos.models import Video
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+@dataclass
+class Dataset:
+    """An exportable table: exported columns and accepted filters."""
+    model: type
+    # (column name, lookup passed to values_list())
+    columns: list
+    # filter name -> queryset lookup; '*_after'/'*_before' filters take dates
+    filters: dict = field(default_factory=dict)
+
+    def queryset(self):
+        return self.model._default_manager.all()
+
+
+DATASETS = {
+    'videos': Dataset(
+        Video,
+        columns=[('id', 'pk'), ('youtube_id', 'youtube_id'), ('title', 'title'), ('category', 'category__name'),
+                 ('subcategory', 'subcategory__name'), ('duration', 'duration'), ('publish_date', 'publish_date'),
+                 ('views_count', 'views_count'), ('likes_count', 'likes_count'), ('featured', 'featured')],
+        filters={'category': 'category__slug', 'featured': 'featured',
+                 'published_after': 'publish_date__gte', 'published_before': 'publish_date__lt'},
+    ),
+    'orders': Dataset(
+        Order,
+        columns=[('id', 'pk'), ('user', 'user__username'), ('email', 'user__email'),
+                 ('plan', 'subscription_plan__code'), ('payment_method', 'payment_method__code'),
+                 ('status', 'status'), ('amount', 'amount'), ('transaction_id', 'transaction_id'),
+                 ('created_at', 'created_at'), ('paid_at', 'paid_at')],
+        filters={'status': 'status', 'user': 'user__username',
+                 'created_after': 'created_at__gte', 'created_before': 'created_at__lt'},
+    ),
+    'history': Dataset(
+        UserVideoHistory,
+        columns=[('id', 'pk'), ('user', 'user__user__username'), ('video_id', 'video_id'),
+                 ('youtube_id', 'video__youtube_id'), ('watch_date', 'watch_date'),
+                 ('watch_duration', 'watch_duration'), ('completed', 'completed')],
+        filters={'user': 'user__user__username', 'video': 'video_id', 'completed': 'completed',
+                 'watched_after': 'watch_date__gte', 'watched_before': 'watch_date__lt'},
+    ),
+}
+
+
+def _filter_value(dataset, name, value):
+    """Parse a filter value: dates for *_after/*_before, booleans for boolean fields."""
+    if name.endswith(('_after', '_before')):
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name}: expected a YYYY-MM-DD date, got {value!r}')
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    model_field = dataset.model._meta.get_field(dataset.filters[name].split('__')[0])
+    if isinstance(model_field, models.BooleanField):
+        if value.lower() not in ('true', 'false', '1', '0', 'yes', 'no'):
+            raise ValueError(f'{name}: expected true or false, got {value!r}')
+        return value.lower() in ('true', '1', 'yes')
+    return value
+
+
+def filtered_queryset(name, filters=None, queryset=None):
+    """
+    Rows of a dataset, filtered and in primary key order.
+
+    Parameters:
+    name (str): Key of DATASETS
+    filters (dict): Filter name -> string value (see Dataset.filters)
+    queryset (QuerySet): Optional starting queryset (e.g. an admin selection)
+
+    Raises:
+    ValueError: Unknown dataset or filter, invalid filter value
+    """
+    if name not in DATASETS:
+        raise ValueError(f'Unknown dataset {name!r} (choices: {", ".join(DATASETS)})')
+    dataset = DATASETS[name]
+    queryset = dataset.queryset() if queryset is None else queryset
+    for filter_name, value in (filters or {}).items():
+        if filter_name not in dataset.filters:
+            raise ValueError(f'Unknown filter {filter_name!r} for {name} (choices: {", ".join(dataset.filters)})')
+        queryset = queryset.filter(**{dataset.filters[filter_name]: _filter_value(dataset, filter_name, value)})
+    return queryset.order_by('pk')
+
+
+def _serialize(header, rows, fmt):
+    """Text of a chunk of rows."""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        csv.writer(buffer).writerows(rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder, ensure_ascii=False))
+            buffer.write('\n')
+    return buffer.getvalue()
+
+
+def stream_export(name, fmt='csv', filters=None, queryset=None, compress=False, chunk_size=2000):
+    """
+    Serialize a dataset chunk by chunk.
+
+    Parameters:
+    name (str): Key of DATASETS
+    fmt (str): 'csv' (with a header row) or 'jsonl'
+    filters (dict): See filtered_queryset()
+    queryset (QuerySet): Optional starting queryset
+    compress (bool): gzip the output on the fly
+    chunk_size (int): Rows fetched and serialized at a time
+
+    Yields:
+    bytes: Successive parts of the file
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r} (choices: {", ".join(FORMATS)})')
+    # Validate before the first byte is sent: errors cannot be reported once streaming started
+    queryset = filtered_queryset(name, filters, queryset)
+    dataset = DATASETS[name]
+    rows = queryset.values_list(*[lookup for _, lookup in dataset.columns])
+    header = [column for column, _ in dataset.columns]
+
+    def parts():
+        if fmt == 'csv':
+            yield _serialize(header, [header], fmt).encode()
+        iterator = rows.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield _serialize(header, chunk, fmt).encode()
+
+    if not compress:
+        return parts()
+    return _gzip(parts())
+
+
+def _gzip(parts):
+    # wbits=31: gzip container, readable by gunzip and zcat
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for part in parts:
+        data = compressor.compress(part)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def filename(name, fmt, compress=False):
+    """Download name of an export, e.g. orders-20240131-120000.csv.gz"""
+    return f'{name}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}' + ('.gz' if compress else '')
+
+
+def export_response(name, fmt='csv', filters=None, queryset=None, compress=False):
+    """
+    StreamingHttpResponse downloading a dataset.
+
+    Raises:
+    ValueError: See filtered_queryset()
+    """
+    parts = stream_export(name, fmt, filters, queryset, compress)
+    response = StreamingHttpResponse(parts, content_type='application/gzip' if compress else FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename(name, fmt, compress)}"'
+    # Exports contain personal data: never stored by a shared cache
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def write_export(name, output, fmt='csv', filters=None, compress=False, chunk_size=2000):
+    """
+    Write a dataset to a binary file object.
+
+    Returns:
+    int: Number of bytes written
+    """
+    written = 0
+    for part in stream_export(name, fmt, filters, compress=compress, chunk_size=chunk_size):
+        output.write(part)
+        written += len(part)
+    return written
+
+
+def export_action(name, fmt):
+    """
+    Admin action downloading the selected rows (or every filtered row with « select all ») as gzipped fmt.
+
+        actions = [export_action('orders', 'csv'), export_action('orders', 'jsonl')]
+    """
+    def action(modeladmin, request, queryset):
+        return export_response(name, fmt, queryset=queryset, compress=True)
+    action.__name__ = f'export_{fmt}'
+    action.short_description = f"Exporter la sélection ({fmt.upper()}.gz)"
+    action.allowed_permissions = ('view',)
+    return action
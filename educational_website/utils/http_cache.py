@@ -0,0 +1,98 @@
+# utils/http_cache.py
+"""
+HTTP caching of pages: Cache-Control policies, conditional GET and surrogate keys.
+
+A view decorated with cache_policy() gets:
+
+- the Cache-Control header of its policy (settings.HTTP_CACHE_POLICIES),
+  downgraded to 'private' for logged-in users whose pages are personalized;
+- ETag and Last-Modified headers computed by a cheap last_modified function
+  (typically a Max('updated_at') query), and a 304 response *before* the view
+  runs when the client's copy is still current;
+- a Surrogate-Key header listing what the page displays, so a model change
+  can purge exactly the affected pages from the CDN (see utils.cdn).
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+# Key shared by every page, purged when the site configuration changes
+SITE_KEY = 'site'
+
+
+def latest_change(queryset, field='updated_at'):
+    """
+    Most recent modification time of a queryset (one indexed aggregate).
+
+    Returns:
+    datetime: The latest value of field, or None if the queryset is empty
+    """
+    return queryset.aggregate(latest=Max(field))['latest']
+
+
+def most_recent(*timestamps):
+    """Latest of the given datetimes, ignoring None."""
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def _has_pending_messages(request):
+    # Flash messages are shown once: a 304 would hide them
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(get_messages(request)) > 0
+
+
+def cache_policy(policy, last_modified=None, surrogate_keys=None):
+    """
+    Decorate a view with an HTTP caching policy.
+
+    Parameters:
+    policy (str): Name of a policy of settings.HTTP_CACHE_POLICIES
+    last_modified (callable): Called with the view arguments, returns the
+        datetime of the last change of what the page displays (or None)
+    surrogate_keys (callable): Called with the view arguments, returns the
+        surrogate keys of the page
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            personalized = request.user.is_authenticated
+            directives = settings.HTTP_CACHE_POLICIES['private' if personalized else policy]
+
+            etag = timestamp = None
+            if last_modified is not None and not _has_pending_messages(request):
+                modified = last_modified(request, *args, **kwargs)
+                if modified is not None:
+                    timestamp = int(modified.timestamp())
+                    # The page also depends on who is logged in (navigation bar)
+                    etag = f'"{int(modified.timestamp() * 1000000):x}-{request.user.pk or 0}"'
+                    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+                    if response is not None:
+                        patch_cache_control(response, **directives)
+                        patch_vary_headers(response, ('Cookie',))
+                        return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+
+            if etag is not None:
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+            patch_cache_control(response, **directives)
+            patch_vary_headers(response, ('Cookie',))
+            if surrogate_keys is not None and not personalized:
+                keys = [SITE_KEY, *surrogate_keys(request, *args, **kwargs)]
+                response.headers['Surrogate-Key'] = ' '.join(keys)
+            return response
+        return wrapper
+    return decorator
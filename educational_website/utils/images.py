@@ -0,0 +1,231 @@
+# utils/images.py
+"""
+Content-addressed image cache with responsive variants.
+
+Every image (YouTube thumbnail, category icon, avatar) is stored once under
+MEDIA_ROOT/images/<aa>/<sha256>/ where the hash is that of its bytes, so an
+image shared by several objects or imported twice is downloaded and resized
+only once. Next to the original, generate_variants() writes one WebP and one
+JPEG per width of IMAGE_VARIANT_WIDTHS. Names never change content, so the
+files can be cached forever. Private images (avatars) are kept apart under
+MEDIA_ROOT/IMAGE_PRIVATE_DIR, a protected prefix checked by serve_media().
+
+Downloads happen during ingestion; variants are generated by a process pool
+(cache_thumbnails command) or, for uploads, by a small background thread
+pool. Everything works offline once the originals are on disk.
+"""
+import hashlib
+import logging
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from utils.metrics import external_call
+
+logger = logging.getLogger(__name__)
+
+# Output formats: (file extension, Pillow format, save options)
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+ORIGINAL = 'original'
+
+_executor = None
+
+
+def _prefix(private=False):
+    return settings.IMAGE_PRIVATE_DIR if private else 'images'
+
+
+def _root(private=False):
+    return Path(settings.MEDIA_ROOT) / _prefix(private)
+
+
+def image_dir(digest, private=False):
+    """Directory of an image and its variants."""
+    return _root(private) / digest[:2] / digest
+
+
+def variant_name(digest, width, extension, private=False):
+    """Path of a variant relative to MEDIA_ROOT (also its URL below MEDIA_URL)."""
+    return f'{_prefix(private)}/{digest[:2]}/{digest}/{width}.{extension}'
+
+
+def variant_url(digest, width, extension='jpg', private=False):
+    """
+    URL of a variant.
+
+    Parameters:
+    digest (str): Content hash of the image
+    width (int): One of IMAGE_VARIANT_WIDTHS
+    extension (str): 'webp' or 'jpg'
+    private (bool): Image of the protected area (avatars)
+    """
+    return settings.MEDIA_URL + variant_name(digest, width, extension, private)
+
+
+def srcset(digest, extension='jpg', private=False):
+    """srcset attribute listing every width of a variant format."""
+    return ', '.join(f'{variant_url(digest, width, extension, private)} {width}w'
+                     for width in settings.IMAGE_VARIANT_WIDTHS)
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def store_original(data, private=False):
+    """
+    Store image bytes in the content-addressed cache.
+
+    Parameters:
+    data (bytes): Image file content (any format Pillow reads)
+    private (bool): Store it in the protected area (avatars)
+
+    Returns:
+    str: Content hash identifying the image
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    directory = image_dir(digest, private)
+    path = directory / ORIGINAL
+    if not path.exists():
+        # Reject files Pillow cannot read before they enter the cache
+        with Image.open(BytesIO(data)) as image:
+            image.verify()
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_atomic(path, data)
+    return digest
+
+
+def _url_index_path(url):
+    return _root() / 'by-url' / hashlib.sha1(url.encode()).hexdigest()
+
+
+def cached_digest(url):
+    """Hash of an image already downloaded from url, or None (works offline)."""
+    try:
+        return _url_index_path(url).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def download(url):
+    """
+    Download an image once and store it in the cache.
+
+    Parameters:
+    url (str): Image URL
+
+    Returns:
+    str: Content hash of the image
+    """
+    digest = cached_digest(url)
+    if digest and (image_dir(digest) / ORIGINAL).exists():
+        return digest
+    with external_call('images', 'download'):
+        with urllib.request.urlopen(url, timeout=settings.IMAGE_DOWNLOAD_TIMEOUT) as response:
+            data = response.read()
+    digest = store_original(data)
+    index_path = _url_index_path(url)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(index_path, digest.encode())
+    return digest
+
+
+def missing_variants(digest, private=False):
+    """Whether some variant of an image has not been generated yet."""
+    directory = image_dir(digest, private)
+    return any(not (directory / f'{width}.{extension}').exists()
+               for width in settings.IMAGE_VARIANT_WIDTHS for extension, _, _ in FORMATS)
+
+
+def generate_variants(digest, private=False):
+    """
+    Write the WebP and JPEG variants of an image (existing ones are kept).
+
+    Images are never upscaled: variants wider than the original have its size.
+
+    Returns:
+    int: Number of files written
+    """
+    directory = image_dir(digest, private)
+    written = 0
+    with Image.open(directory / ORIGINAL) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ('RGBA', 'LA', 'P')
+        for width in settings.IMAGE_VARIANT_WIDTHS:
+            resized = None
+            for extension, image_format, options in FORMATS:
+                path = directory / f'{width}.{extension}'
+                if path.exists():
+                    continue
+                if resized is None:
+                    resized = original.copy()
+                    resized.thumbnail((width, width * 4), Image.LANCZOS)
+                image = resized.convert('RGB' if image_format == 'JPEG' or not has_alpha else 'RGBA')
+                buffer = BytesIO()
+                image.save(buffer, image_format, **options)
+                _write_atomic(path, buffer.getvalue())
+                written += 1
+    return written
+
+
+def _generate_safely(digest, private):
+    try:
+        generate_variants(digest, private)
+    except Exception:
+        logger.exception('Cannot generate the variants of image %s', digest)
+
+
+def submit_variants(digest, private=False):
+    """Generate the variants of an image in the background thread pool."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images')
+    return _executor.submit(_generate_safely, digest, private)
+
+
+def make_private(digest):
+    """
+    Move an image cached in the public area (before avatars had their own) to the protected one.
+
+    Returns:
+    bool: Whether the image was moved
+    """
+    public, private = image_dir(digest), image_dir(digest, private=True)
+    if not public.is_dir() or private.exists():
+        return False
+    private.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(public, private)
+    return True
+
+
+def hash_upload(field_file, private=False):
+    """
+    Store a newly uploaded image (ImageField) in the cache.
+
+    Meant for pre_save handlers: returns the hash of the upload, or None if
+    the file has not changed since the last save. Variants are generated in
+    the background once the transaction commits. private stores the image in
+    the protected area (avatars).
+    """
+    if not field_file:
+        return ''
+    if getattr(field_file, '_committed', True):
+        return None
+    field_file.seek(0)
+    data = field_file.read()
+    field_file.seek(0)
+    digest = store_original(data, private)
+    transaction.on_commit(lambda: submit_variants(digest, private))
+    return digest
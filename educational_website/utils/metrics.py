@@ -0,0 +1,414 @@
+# utils/metrics.py
+"""
+Lightweight performance metrics shared by every worker process.
+
+Each process aggregates counters and latency histograms in memory and
+periodically flushes them to METRICS_DIR/<pid>.json (a tmpfs directory by
+default). The /metrics view merges the files of every worker, so Prometheus
+sees the totals of the whole gunicorn pool and not just one process. A
+background thread keeps the file of an idle worker fresh; files of dead
+workers, or not rewritten for STALE_FLUSH_INTERVALS flush intervals, are
+skipped and deleted by the merge. The directory is local to one host, as
+the pids in the file names are.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+from pathlib import Path
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+# A worker file not rewritten for this many flush intervals belongs to a dead worker
+STALE_FLUSH_INTERVALS = 3
+
+# Upper bounds (in seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'http_request_duration_seconds': 'Total time spent handling a request',
+    'http_requests_total': 'Requests handled, by route and status',
+    'http_request_db_seconds': 'Time spent in database queries per request',
+    'http_request_db_queries_total': 'Database queries executed',
+    'http_request_template_seconds': 'Time spent rendering templates per request',
+    'cache_requests_total': 'Cache lookups, by result',
+    'query_cache_requests_total': 'ORM query cache lookups, by model and result',
+    'external_call_duration_seconds': 'Latency of calls to external services',
+    'external_call_errors_total': 'Failed calls to external services',
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_last_flush = 0.0
+_heartbeat_pid = None
+_local = threading.local()
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc(name, amount=1, **labels):
+    """
+    Increment a counter.
+
+    Parameters:
+    name (str): Metric name
+    amount (int|float): Value to add
+    labels: Prometheus labels of the series
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """
+    Record one observation in a histogram.
+
+    Parameters:
+    name (str): Metric name
+    value (float): Observed value, in seconds
+    labels: Prometheus labels of the series
+    """
+    key = _key(name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                series['buckets'][i] += 1
+                break
+        series['sum'] += value
+        series['count'] += 1
+
+
+# ---------------------------------------------------------------------------
+# Per-request accounting
+# ---------------------------------------------------------------------------
+
+def begin_request():
+    """Start collecting the statistics of the request handled by this thread."""
+    _local.stats = {
+        'db_time': 0.0,
+        'db_count': 0,
+        'template_time': 0.0,
+        'external_time': 0.0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+    }
+    return _local.stats
+
+
+def current_request_stats():
+    """Return the statistics of the current request, or None outside a request."""
+    return getattr(_local, 'stats', None)
+
+
+def end_request(route, method, status, duration):
+    """
+    Record the statistics of a finished request and detach them from the thread.
+
+    Returns:
+    dict: The statistics collected during the request
+    """
+    stats = current_request_stats() or begin_request()
+    _local.stats = None
+
+    observe('http_request_duration_seconds', duration, route=route, method=method)
+    inc('http_requests_total', route=route, method=method, status=str(status))
+    observe('http_request_db_seconds', stats['db_time'], route=route)
+    inc('http_request_db_queries_total', stats['db_count'], route=route)
+    observe('http_request_template_seconds', stats['template_time'], route=route)
+
+    flush()
+    return stats
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """Database execute wrapper timing every query of the current request."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats = current_request_stats()
+        if stats is not None:
+            stats['db_time'] += time.perf_counter() - start
+            stats['db_count'] += 1
+
+
+def record_cache_access(hit):
+    """
+    Count a cache lookup.
+
+    Parameters:
+    hit (bool): Whether the value was found in the cache
+    """
+    result = 'hit' if hit else 'miss'
+    inc('cache_requests_total', result=result)
+    stats = current_request_stats()
+    if stats is not None:
+        stats['cache_hits' if hit else 'cache_misses'] += 1
+
+
+def server_timing(stats, total):
+    """
+    Build the value of the Server-Timing header for a request.
+
+    Parameters:
+    stats (dict): Statistics returned by end_request()
+    total (float): Total request duration, in seconds
+
+    Returns:
+    str: Header value
+    """
+    parts = [
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={stats["db_time"] * 1000:.1f};desc="{stats["db_count"]} queries"',
+        f'tpl;dur={stats["template_time"] * 1000:.1f}',
+    ]
+    if stats['external_time']:
+        parts.append(f'ext;dur={stats["external_time"] * 1000:.1f}')
+    if stats['cache_hits'] or stats['cache_misses']:
+        parts.append(f'cache;desc="{stats["cache_hits"]} hits, {stats["cache_misses"]} misses"')
+    return ', '.join(parts)
+
+
+class external_call(ContextDecorator):
+    """
+    Time a call to an external service (YouTube API, payment gateways).
+
+    Usable as a context manager or as a decorator:
+
+        with external_call('youtube', 'videos.list'):
+            response = request.execute()
+    """
+
+    def __init__(self, service, operation):
+        self.service = service
+        self.operation = operation
+
+    def _recreate_cm(self):
+        # A fresh instance per decorated call keeps concurrent calls independent
+        return type(self)(self.service, self.operation)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        observe('external_call_duration_seconds', duration,
+                service=self.service, operation=self.operation)
+        if exc_type is not None:
+            inc('external_call_errors_total', service=self.service, operation=self.operation)
+        stats = current_request_stats()
+        if stats is not None:
+            stats['external_time'] += duration
+        return False
+
+
+class InstrumentedTemplate:
+    """Wrapper around a backend template measuring its render time."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats = current_request_stats()
+            if stats is not None:
+                stats['template_time'] += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend reporting render time to the current request."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+# ---------------------------------------------------------------------------
+# Sharing between worker processes
+# ---------------------------------------------------------------------------
+
+def _metrics_dir():
+    return Path(settings.METRICS_DIR)
+
+
+def _flush_interval():
+    # At least one second: the heartbeat must not spin with an interval of 0
+    return max(settings.METRICS_FLUSH_INTERVAL, 1)
+
+
+def _snapshot():
+    with _lock:
+        return {
+            'counters': [[name, dict(labels), value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, dict(labels), dict(series, buckets=list(series['buckets']))]
+                           for (name, labels), series in _histograms.items()],
+        }
+
+
+def flush(force=False):
+    """
+    Write the metrics of this process to the shared metrics directory.
+
+    Writes happen at most every METRICS_FLUSH_INTERVAL seconds unless force
+    is set. The file is replaced atomically so readers never see partial data.
+    """
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    _start_heartbeat()
+
+    directory = _metrics_dir()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = directory / f'.{os.getpid()}.json.tmp'
+        tmp_path.write_text(json.dumps(_snapshot()))
+        os.replace(tmp_path, directory / f'{os.getpid()}.json')
+    except OSError:
+        # Metrics must never make a request fail
+        pass
+
+
+def _start_heartbeat():
+    """Start the thread rewriting the file of this process while it is idle (once per process)."""
+    global _heartbeat_pid
+    with _lock:
+        # Compared to the pid: a forked worker does not inherit the thread of its parent
+        if _heartbeat_pid == os.getpid():
+            return
+        _heartbeat_pid = os.getpid()
+    threading.Thread(target=_heartbeat, name='metrics-heartbeat', daemon=True).start()
+
+
+def _heartbeat():
+    while True:
+        time.sleep(_flush_interval())
+        flush(force=True)
+
+
+def _pid_alive(pid):
+    if os.name != 'posix':
+        # os.kill() would terminate the process
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running under another user
+        return True
+    return True
+
+
+def _is_stale(path):
+    """Whether a worker file belongs to a dead worker."""
+    try:
+        pid = int(path.stem)
+    except ValueError:
+        return False
+    if not _pid_alive(pid):
+        return True
+    try:
+        age = time.time() - path.stat().st_mtime
+    except OSError:
+        return True
+    # The pid may have been reused by an unrelated process
+    return age > STALE_FLUSH_INTERVALS * _flush_interval()
+
+
+def _merged_snapshots():
+    """Merge the live metrics of this process with the files of the other workers."""
+    snapshots = [_snapshot()]
+    own_file = f'{os.getpid()}.json'
+    directory = _metrics_dir()
+    if directory.is_dir():
+        for path in directory.glob('*.json'):
+            if path.name == own_file:
+                continue
+            if _is_stale(path):
+                try:
+                    path.unlink(missing_ok=True)
+                except OSError:
+                    pass
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in snapshot['histograms']:
+            key = _key(name, labels)
+            merged = histograms.setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], series['buckets'])]
+            merged['sum'] += series['sum']
+            merged['count'] += series['count']
+    return counters, histograms
+
+
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    escaped = []
+    for name, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_prometheus():
+    """
+    Render the metrics of all workers in the Prometheus text exposition format.
+
+    Returns:
+    str: The metrics page
+    """
+    counters, histograms = _merged_snapshots()
+    lines = []
+
+    for metric in sorted({name for name, _ in counters}):
+        lines.append(f'# HELP {metric} {HELP.get(metric, metric)}')
+        lines.append(f'# TYPE {metric} counter')
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f'{metric}{_format_labels(labels)} {value}')
+
+    for metric in sorted({name for name, _ in histograms}):
+        lines.append(f'# HELP {metric} {HELP.get(metric, metric)}')
+        lines.append(f'# TYPE {metric} histogram')
+        for (name, labels), series in sorted(histograms.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS, series['buckets']):
+                cumulative += count
+                lines.append(f'{metric}_bucket{_format_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{metric}_bucket{_format_labels(labels, le="+Inf")} {series["count"]}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {series["sum"]}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {series["count"]}')
+
+    return '\n'.join(lines) + '\n'
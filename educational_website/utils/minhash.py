@@ -0,0 +1,117 @@
+# utils/minhash.py
+"""
+MinHash signatures and LSH banding for near-duplicate text detection, in NumPy.
+
+A text is reduced to its set of word 3-gram shingles; its signature keeps,
+for each of NUM_PERM random hash functions h(x) = (a*x + b) mod PRIME, the
+minimum over the shingles. Two signatures agree at a position with
+probability equal to the Jaccard similarity of the shingle sets, so the
+fraction of equal positions estimates it from 512 bytes per text.
+
+Candidates are found without comparing every pair: the signature is cut
+into BANDS bands of ROWS values and each band is hashed to a key. Texts
+sharing any key are compared; with 16 bands of 8 rows, pairs at 0.8
+similarity collide in at least one band ~95% of the time, pairs at 0.5
+less than 7% of the time.
+"""
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+# Mersenne prime 2**31 - 1: a*x + b stays below 2**63 for 32-bit shingle hashes
+PRIME = (1 << 31) - 1
+
+TOKEN = re.compile(r'[^\W_]+', re.UNICODE)
+# Links (channel, social networks, sponsors) repeat in every description of a channel
+URL = re.compile(r'https?://\S+|www\.\S+')
+
+
+def _permutations():
+    """(a, b) coefficients of the hash functions, derived from fixed digests so stored signatures stay comparable."""
+    a = np.empty(NUM_PERM, dtype=np.uint64)
+    b = np.empty(NUM_PERM, dtype=np.uint64)
+    for i in range(NUM_PERM):
+        digest = hashlib.blake2b(f'minhash-{i}'.encode(), digest_size=8).digest()
+        a[i] = int.from_bytes(digest[:4], 'little') % (PRIME - 1) + 1
+        b[i] = int.from_bytes(digest[4:], 'little') % PRIME
+    return a[:, None], b[:, None]
+
+
+_A, _B = _permutations()
+
+
+def shingles(title, description=''):
+    """
+    Hashes of the word shingles of a video text.
+
+    Parameters:
+    title (str): Video title
+    description (str): Video description (links are ignored)
+
+    Returns:
+    ndarray: Distinct uint64 shingle hashes (empty for a text without words)
+    """
+    text = URL.sub(' ', f'{title or ""}\n{description or ""}'.lower())
+    tokens = TOKEN.findall(text)
+    if len(tokens) < SHINGLE_SIZE:
+        grams = [' '.join(tokens)] if tokens else []
+    else:
+        grams = [' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    crc32 = zlib.crc32
+    return np.unique(np.fromiter((crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams)))
+
+
+def signature(shingle_hashes):
+    """
+    MinHash signature of a shingle set.
+
+    Returns:
+    ndarray: NUM_PERM uint32 values, or None for an empty set
+    """
+    if not len(shingle_hashes):
+        return None
+    # (NUM_PERM, n_shingles) matrix of hashes, minimum per hash function
+    return ((_A * shingle_hashes[None, :] + _B) % PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_keys(sig):
+    """
+    LSH keys of a signature, one signed 64-bit integer per band.
+
+    The band number is part of the hashed bytes: equal rows in different
+    bands do not collide.
+    """
+    rows = sig.reshape(BANDS, ROWS)
+    return [int.from_bytes(hashlib.blake2b(bytes([band]) + rows[band].tobytes(), digest_size=8).digest(),
+                           'little', signed=True)
+            for band in range(BANDS)]
+
+
+def similarity(sig, others):
+    """
+    Estimated Jaccard similarity between a signature and each row of others.
+
+    Parameters:
+    sig (ndarray): One signature
+    others (ndarray): (n, NUM_PERM) signatures
+
+    Returns:
+    ndarray: n similarities between 0 and 1
+    """
+    return (np.asarray(others) == sig).mean(axis=1)
+
+
+def to_bytes(sig):
+    """Compact storage form of a signature (NUM_PERM * 4 bytes)."""
+    return sig.astype('<u4').tobytes()
+
+
+def from_bytes(data):
+    """Signature stored by to_bytes()."""
+    return np.frombuffer(bytes(data), dtype='<u4')
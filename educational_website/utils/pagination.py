@@ -0,0 +1,69 @@
+# utils/pagination.py
+"""
+Paginator for very large tables (admin changelists).
+
+Paginating an unfiltered changelist runs SELECT COUNT(*) over the whole
+table on every page view, a full scan on PostgreSQL and SQLite. The
+planner statistics already hold an estimate of the row count (pg_class.
+reltuples, sqlite_stat1 after ANALYZE, information_schema on MySQL):
+EstimatedCountPaginator uses it for unfiltered querysets on large tables,
+and counts exactly everywhere else.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+def estimated_count(model, using='default'):
+    """
+    Row count of a model's table according to the planner statistics.
+
+    Returns:
+    int: Estimated number of rows, or None without statistics (table never analyzed)
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql, params = 'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [table]
+    elif connection.vendor == 'sqlite':
+        # First number of a stat row: rows in the table (any index of the table carries it)
+        sql, params = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table]
+    elif connection.vendor == 'mysql':
+        sql, params = ('SELECT table_rows FROM information_schema.tables '
+                       'WHERE table_schema = DATABASE() AND table_name = %s', [table])
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 only exists once ANALYZE has run
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for a table that was never vacuumed or analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting unfiltered querysets from the planner statistics.
+
+    Used with show_full_result_count = False on admin changelists:
+
+        class VideoAdmin(admin.ModelAdmin):
+            paginator = EstimatedCountPaginator
+            show_full_result_count = False
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimated_count(query.model, self.object_list.db)
+            if estimate is not None and estimate >= settings.ADMIN_COUNT_ESTIMATE_MIN_ROWS:
+                return estimate
+        return super().count
@@ -0,0 +1,221 @@
+# utils/profiling.py
+"""
+On-demand profiling of a request or a management command.
+
+A profiled block records a cProfile profile, a tracemalloc allocation
+summary and every database query slower than PROFILING_SLOW_QUERY_MS along
+with its EXPLAIN plan. Reports are written to PROFILING_DIR (.prof file for
+pstats/snakeviz plus a JSON summary) and indexed by core.ProfilingReport so
+they can be browsed in the admin; only the PROFILING_KEEP_REPORTS most recent
+reports are kept. tracemalloc is process-wide: it runs while at least one
+block is profiled, so the allocations of concurrent requests are mixed.
+"""
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.text import slugify
+
+
+_tracing_lock = threading.Lock()
+# Profiled blocks in progress, and whether tracemalloc was started by them
+_tracing_users = 0
+_tracing_started = False
+
+
+def _start_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    """Stop tracemalloc when the last profiled block exits (unless someone else started it)."""
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+class ProfileResult:
+    """Data collected while a block of code was profiled."""
+
+    def __init__(self, label):
+        self.label = label
+        self.duration_ms = 0.0
+        self.query_count = 0
+        self.slow_queries = []
+        self.top_functions = ''
+        self.allocations = ''
+        self.profiler = cProfile.Profile()
+
+
+class _QueryRecorder:
+    """Execute wrapper keeping the queries slower than a threshold."""
+
+    def __init__(self, result, alias, threshold_ms):
+        self.result = result
+        self.alias = alias
+        self.threshold_ms = threshold_ms
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.result.query_count += 1
+            if duration_ms >= self.threshold_ms:
+                self.result.slow_queries.append({
+                    'alias': self.alias,
+                    'sql': sql,
+                    'params': None if many else params,
+                    'duration_ms': round(duration_ms, 2),
+                })
+
+
+def explain(alias, sql, params):
+    """
+    Return the EXPLAIN plan of a query, or an empty string if it can't be explained.
+
+    Parameters:
+    alias (str): Database alias the query ran on
+    sql (str): The SQL statement
+    params (list|tuple|None): Query parameters
+
+    Returns:
+    str: The plan, one row per line
+    """
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params or ())
+            return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'EXPLAIN failed: {e}'
+
+
+@contextmanager
+def profiled(label, slow_query_ms=None):
+    """
+    Profile the enclosed block.
+
+    Parameters:
+    label (str): Description of what is profiled (request path, command...)
+    slow_query_ms (float): Threshold above which queries are captured,
+        defaults to settings.PROFILING_SLOW_QUERY_MS
+
+    Yields:
+    ProfileResult: Filled in when the block exits
+    """
+    if slow_query_ms is None:
+        slow_query_ms = settings.PROFILING_SLOW_QUERY_MS
+    result = ProfileResult(label)
+
+    _start_tracing()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                recorder = _QueryRecorder(result, connection.alias, slow_query_ms)
+                stack.enter_context(connection.execute_wrapper(recorder))
+            result.profiler.enable()
+            try:
+                yield result
+            finally:
+                result.profiler.disable()
+    finally:
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        after = tracemalloc.take_snapshot()
+        _stop_tracing()
+
+        stats_output = io.StringIO()
+        pstats.Stats(result.profiler, stream=stats_output).sort_stats('cumulative').print_stats(40)
+        result.top_functions = stats_output.getvalue()
+        result.allocations = '\n'.join(
+            str(stat) for stat in after.compare_to(before, 'lineno')[:25]
+        )
+        for query in result.slow_queries:
+            query['plan'] = explain(query['alias'], query['sql'], query['params'])
+
+
+def save_report(result):
+    """
+    Write a profiling result to PROFILING_DIR and index it for the admin.
+
+    Parameters:
+    result (ProfileResult): The result of a profiled() block
+
+    Returns:
+    ProfilingReport: The saved report
+    """
+    from core.models import ProfilingReport
+
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = f'{timezone.now():%Y%m%d-%H%M%S-%f}-{slugify(result.label)[:80]}'
+
+    profile_path = directory / f'{stem}.prof'
+    result.profiler.dump_stats(profile_path)
+
+    summary = {
+        'label': result.label,
+        'duration_ms': result.duration_ms,
+        'query_count': result.query_count,
+        'slow_queries': result.slow_queries,
+        'top_functions': result.top_functions,
+        'allocations': result.allocations,
+    }
+    (directory / f'{stem}.json').write_text(json.dumps(summary, indent=2, default=str))
+
+    report = ProfilingReport.objects.create(
+        label=result.label[:255],
+        duration_ms=result.duration_ms,
+        query_count=result.query_count,
+        slow_queries=json.loads(json.dumps(result.slow_queries, default=str)),
+        top_functions=result.top_functions,
+        allocations=result.allocations,
+        profile_file=str(profile_path),
+    )
+    prune_reports()
+    return report
+
+
+def prune_reports(keep=None):
+    """
+    Delete the reports older than the keep most recent ones, with their files.
+
+    Parameters:
+    keep (int): Reports kept, defaults to settings.PROFILING_KEEP_REPORTS
+
+    Returns:
+    int: Number of reports deleted
+    """
+    from core.models import ProfilingReport
+
+    keep = settings.PROFILING_KEEP_REPORTS if keep is None else keep
+    old = list(ProfilingReport.objects.order_by('-created_at', '-pk').values_list('pk', 'profile_file')[keep:])
+    for _, profile_file in old:
+        if profile_file:
+            for path in (Path(profile_file), Path(profile_file).with_suffix('.json')):
+                path.unlink(missing_ok=True)
+    ProfilingReport.objects.filter(pk__in=[pk for pk, _ in old]).delete()
+    return len(old)
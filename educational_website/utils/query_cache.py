@@ -0,0 +1,196 @@
+# utils/query_cache.py
+"""
+Opt-in ORM query result cache with table-based invalidation.
+
+A model opts in by using CachingManager; a query is then cached with
+.cached(). The cache key is built from the compiled SQL, its parameters and
+the current version of every table the query reads. Every write statement
+(save, delete, bulk_create, queryset.update(), raw SQL) on the table of such
+a model goes through track_writes(), which bumps the version of the table it
+touches, so stale entries are never read again and simply expire. Queries
+reading any other table (joins, subqueries) are not cached: writes to those
+tables are not tracked.
+"""
+import functools
+import hashlib
+import re
+import threading
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+
+from utils import metrics
+
+WRITE_STATEMENT = re.compile(
+    r'^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+[`"\[]?(\w+)',
+    re.IGNORECASE,
+)
+
+# Tables read by a query, subqueries included: identifiers following FROM or JOIN in the compiled SQL
+READ_TABLE = re.compile(r'\b(?:FROM|JOIN)\s+[`"\[]?(\w+)', re.IGNORECASE)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'bypassed': 0}
+
+
+def _cache():
+    return caches[settings.QUERY_CACHE_ALIAS]
+
+
+def _table_key(table):
+    return f'qc:table:{table}'
+
+
+def table_versions(tables):
+    """
+    Return the current version token of each table.
+
+    Parameters:
+    tables (iterable): Table names
+
+    Returns:
+    dict: Table name -> version token
+    """
+    cache = _cache()
+    keys = {table: _table_key(table) for table in tables}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for table, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            # add() keeps a version set concurrently by another worker
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[table] = version
+    return versions
+
+
+@functools.lru_cache(maxsize=None)
+def cached_tables():
+    """Tables of the models using CachingManager: the only ones whose writes are tracked."""
+    return frozenset(model._meta.db_table for model in apps.get_models()
+                     if any(isinstance(manager, CachingManager) for manager in model._meta.managers))
+
+
+def invalidate_tables(tables):
+    """Bump the version of the given tables, making their cached queries unreachable."""
+    _cache().set_many({_table_key(table): uuid.uuid4().hex for table in tables}, None)
+
+
+def track_writes(execute, sql, params, many, context):
+    """Database execute wrapper invalidating the tables touched by write statements."""
+    result = execute(sql, params, many, context)
+    match = WRITE_STATEMENT.match(sql)
+    # Sessions, metrics, job heartbeats... are written all the time and never cached
+    if match and match.group(1) in cached_tables():
+        table = match.group(1)
+        invalidate_tables([table])
+        connection = context['connection']
+        if connection.in_atomic_block:
+            # Readers may cache the old rows until the transaction commits
+            transaction.on_commit(lambda: invalidate_tables([table]), using=connection.alias)
+    return result
+
+
+def install_write_tracker(sender, connection, **kwargs):
+    """connection_created handler adding track_writes to every new connection."""
+    if track_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_writes)
+
+
+def _count(result, model_label):
+    with _stats_lock:
+        _stats[result] += 1
+    metrics.inc('query_cache_requests_total', result=result, model=model_label)
+    if result != 'bypassed':
+        metrics.record_cache_access(result == 'hits')
+
+
+def stats():
+    """
+    Hit and miss counters of this process.
+
+    Returns:
+    dict: hits, misses, bypassed and hit_rate
+    """
+    with _stats_lock:
+        result = dict(_stats)
+    lookups = result['hits'] + result['misses']
+    result['hit_rate'] = result['hits'] / lookups if lookups else None
+    return result
+
+
+class CachingQuerySet(models.QuerySet):
+    """QuerySet whose results can be served from the shared cache with .cached()."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._query_cache_timeout = None
+        self._use_query_cache = False
+
+    def cached(self, timeout=None):
+        """
+        Serve this query from the cache when possible.
+
+        Parameters:
+        timeout (int): Lifetime of the entry in seconds, defaults to
+            settings.QUERY_CACHE_TIMEOUT
+        """
+        clone = self._chain()
+        clone._use_query_cache = True
+        clone._query_cache_timeout = timeout
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._use_query_cache = self._use_query_cache
+        clone._query_cache_timeout = self._query_cache_timeout
+        return clone
+
+    def _cache_key(self):
+        query = self.query.clone()
+        compiler = query.get_compiler(using=self.db)
+        try:
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            return None
+        tables = {join.table_name for join in query.alias_map.values()}
+        tables.update(READ_TABLE.findall(sql))
+        if not tables <= cached_tables():
+            # A table whose writes are not tracked: the entry could never be invalidated
+            return None
+        versions = table_versions(tables)
+        fingerprint = repr((self.db, self._iterable_class.__name__, sql, params, sorted(versions.items())))
+        return 'qc:query:' + hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._use_query_cache:
+            model_label = self.model._meta.label
+            if connections[self.db].in_atomic_block:
+                # Uncommitted rows must not leak into the shared cache
+                _count('bypassed', model_label)
+            else:
+                key = self._cache_key()
+                if key is None:
+                    _count('bypassed', model_label)
+                else:
+                    cache = _cache()
+                    results = cache.get(key)
+                    if results is None:
+                        _count('misses', model_label)
+                        results = list(self._iterable_class(self))
+                        timeout = self._query_cache_timeout or settings.QUERY_CACHE_TIMEOUT
+                        cache.set(key, results, timeout)
+                    else:
+                        _count('hits', model_label)
+                    self._result_cache = results
+        super()._fetch_all()
+
+
+class CachingManager(models.Manager.from_queryset(CachingQuerySet)):
+    """Manager of the models whose queries may be cached (per-model opt-in)."""
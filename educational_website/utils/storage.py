@@ -0,0 +1,192 @@
+# utils/storage.py
+"""
+Content-addressed media storage and media serving through the web server.
+
+ContentAddressedStorage names every upload after the SHA-256 of its bytes,
+in sharded directories (category_icons/ab/cd/abcd....png), so the same file
+uploaded twice is stored once and a name always designates the same bytes,
+which makes media cacheable forever.
+
+serve_media() checks access in Django, then hands the file transfer over to
+nginx (X-Accel-Redirect) or Apache/lighttpd (X-Sendfile) so Python workers
+never stream file bytes; both servers handle Range requests themselves. The
+'django' mode streams the file with Range support, for development or
+deployments without such a server.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import urllib.parse
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from accounts.models import Profile
+
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage deduplicating files by content hash."""
+
+    def content_name(self, name, content):
+        """
+        Name of a file from its content: <upload dir>/<aa>/<bb>/<sha256><ext>.
+
+        Parameters:
+        name (str): Name proposed by the upload_to of the field
+        content (File): Uploaded file
+        """
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4], digest + extension)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Same bytes already stored: reuse the file
+            return name
+        return super()._save(name, content)
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from the content in _save(): never add a suffix
+        return name
+
+    def delete(self, name):
+        # A content-addressed file may be shared by several objects: files are
+        # only removed by an explicit cleanup, never when one object drops it
+        pass
+
+
+def _is_protected(path):
+    return any(path.startswith(prefix) for prefix in settings.MEDIA_PROTECTED_PREFIXES)
+
+
+def can_read(user, path):
+    """
+    Whether a user may read a protected file.
+
+    Avatars (uploads under profile_avatars/ and their variants in the private
+    image area) are readable by their owner and staff only; other protected
+    files by any logged-in user.
+    """
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    if path.startswith('profile_avatars/'):
+        return Profile.objects.filter(user=user, avatar=path).exists()
+    private_images = settings.IMAGE_PRIVATE_DIR.rstrip('/') + '/'
+    if path.startswith(private_images):
+        # <private dir>/<aa>/<digest>/<variant>
+        parts = path[len(private_images):].split('/')
+        return len(parts) == 3 and Profile.objects.filter(user=user, avatar_hash=parts[1]).exists()
+    return True
+
+
+def _parse_range(header, size):
+    """(start, end) of a single 'bytes=' range, None without a usable header, False if unsatisfiable."""
+    match = RANGE_HEADER.match(header or '')
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _file_chunks(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, path):
+    """
+    Serve a file of MEDIA_ROOT.
+
+    Files under MEDIA_PROTECTED_PREFIXES are only served to the users
+    can_read() allows. The transfer itself is delegated according to
+    MEDIA_SERVE_MODE.
+    """
+    try:
+        full_path = Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not full_path.is_file():
+        raise Http404
+    # Normalized name: « images/../profile_avatars/x » must not dodge the prefix checks
+    path = Path(os.path.relpath(full_path, os.path.abspath(settings.MEDIA_ROOT))).as_posix()
+
+    protected = _is_protected(path)
+    if protected and not can_read(request.user, path):
+        raise Http404
+
+    directives = ({'private': True, 'max_age': 3600} if protected
+                  else {'public': True, 'max_age': settings.MEDIA_MAX_AGE})
+    stat = full_path.stat()
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, last_modified=last_modified)
+    if response is not None:
+        patch_cache_control(response, **directives)
+        return response
+
+    content_type = mimetypes.guess_type(full_path.name)[0] or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'x-accel':
+        # nginx: « location /protected-media/ { internal; alias <MEDIA_ROOT>/; } »
+        response = HttpResponse(content_type=content_type)
+        # nginx decodes the URI: names with spaces, '?' or '%' must be quoted
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + urllib.parse.quote(path)
+    elif mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = str(full_path)
+    else:
+        size = stat.st_size
+        byte_range = _parse_range(request.headers.get('Range'), size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1 if size else 0
+        response = StreamingHttpResponse(_file_chunks(full_path, start, length), content_type=content_type,
+                                         status=206 if byte_range else 200)
+        response['Content-Length'] = str(length)
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, **directives)
+    return response
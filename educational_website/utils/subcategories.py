@@ -0,0 +1,139 @@
+# utils/subcategories.py
+"""
+Automatic subcategory assignment.
+
+Videos whose subcategory was chosen by hand (subcategory_status='manual')
+train a NaiveBayesClassifier over all subcategories; predictions are
+restricted to the subcategories of each video's category. Confident
+predictions are applied ('predicted'); the others are only suggested and
+wait in the admin review queue ('review').
+"""
+import os
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from utils.classifier import NaiveBayesClassifier
+from videos.models import Subcategory, Video, VideoCard
+
+UPDATED_FIELDS = ['subcategory', 'suggested_subcategory', 'subcategory_status', 'subcategory_confidence',
+                  'updated_at']
+
+_model = None
+_model_mtime = None
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_model():
+    """
+    Current classifier, reloaded when the model file changes.
+
+    Returns:
+    NaiveBayesClassifier: The model, or None if none has been trained yet
+    """
+    global _model, _model_mtime
+    path = Path(settings.SUBCATEGORY_MODEL_PATH)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if _model is None or mtime != _model_mtime:
+        _model, _model_mtime = NaiveBayesClassifier.load(path), mtime
+    return _model
+
+
+def training_set():
+    """(documents, labels) of the manually classified videos."""
+    rows = (Video.objects.filter(subcategory_status='manual', subcategory__isnull=False)
+            .order_by('pk').values_list('title', 'description', 'subcategory_id'))
+    documents, labels = [], []
+    for title, description, subcategory_id in rows.iterator(chunk_size=2000):
+        documents.append((title, description))
+        labels.append(subcategory_id)
+    return documents, labels
+
+
+def save_model(model):
+    """Store a trained model where load_model() finds it (atomically)."""
+    path = Path(settings.SUBCATEGORY_MODEL_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.stem}.{os.getpid()}.tmp.npz')
+    model.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def allowed_classes(model, category_ids):
+    """(n_videos, n_classes) mask of the subcategories belonging to each video's category."""
+    categories = dict(Subcategory.objects.filter(pk__in=model.classes.tolist()).values_list('pk', 'category_id'))
+    class_categories = np.array([categories.get(int(pk), -1) for pk in model.classes])
+    return np.asarray(category_ids)[:, None] == class_categories[None, :]
+
+
+def tag_videos(videos, model=None, threshold=None, batch_size=1000, refresh_cards=True):
+    """
+    Predict the subcategory of videos in vectorized batches and save the results.
+
+    Manually classified videos are never changed.
+
+    Parameters:
+    videos (QuerySet): Videos to classify
+    model (NaiveBayesClassifier): Classifier (default: load_model())
+    threshold (float): Minimum confidence to apply a prediction (default: SUBCATEGORY_CONFIDENCE_THRESHOLD)
+    batch_size (int): Videos predicted and written per batch
+    refresh_cards (bool): Rebuild the cards of the videos whose subcategory changed
+
+    Returns:
+    dict: Number of videos 'predicted', sent to 'review', and 'unclassified' (no subcategory in their category)
+    """
+    model = model or load_model()
+    counts = {'predicted': 0, 'review': 0, 'unclassified': 0}
+    if model is None:
+        return counts
+    threshold = settings.SUBCATEGORY_CONFIDENCE_THRESHOLD if threshold is None else threshold
+
+    rows = (videos.exclude(subcategory_status='manual').order_by()
+            .values_list('pk', 'title', 'description', 'category_id', 'subcategory_id'))
+    for batch in _chunks(rows.iterator(chunk_size=batch_size), batch_size):
+        labels, confidences = model.predict([(title, description) for _, title, description, _, _ in batch],
+                                            allowed_classes(model, [row[3] for row in batch]))
+        now = timezone.now()
+        updates, changed_cards = [], []
+        for (pk, _, _, _, subcategory_id), label, confidence in zip(batch, labels, confidences):
+            video = Video(pk=pk, updated_at=now, subcategory_confidence=float(confidence) if label else None)
+            if label is None:
+                video.subcategory_id, video.suggested_subcategory_id, video.subcategory_status = None, None, ''
+                counts['unclassified'] += 1
+            elif confidence >= threshold:
+                video.subcategory_id, video.suggested_subcategory_id, video.subcategory_status = int(label), None, 'predicted'
+                counts['predicted'] += 1
+            else:
+                # Low confidence: shown to reviewers, not to visitors
+                video.subcategory_id, video.suggested_subcategory_id, video.subcategory_status = None, int(label), 'review'
+                counts['review'] += 1
+            if video.subcategory_id != subcategory_id:
+                changed_cards.append(pk)
+            updates.append(video)
+        Video.objects.bulk_update(updates, UPDATED_FIELDS, batch_size=batch_size)
+        if refresh_cards and changed_cards:
+            VideoCard.objects.refresh(changed_cards)
+    return counts
+
+
+def tag_new_videos(video_ids):
+    """Classify freshly imported videos that have never been classified (no-op without a model)."""
+    model = load_model()
+    if model is None:
+        return None
+    return tag_videos(Video.objects.filter(pk__in=list(video_ids), subcategory_status=''), model=model,
+                      refresh_cards=False)
@@ -0,0 +1,256 @@
+# utils/transcripts.py
+"""
+Timestamped search inside videos.
+
+Caption files are streamed (utils.captions) into TranscriptCue rows and an
+inverted index: one TranscriptPosting per (term, transcript), holding the
+positions of the cues containing the term as packed 32-bit integers. A query
+first intersects the transcripts of its terms in the database (unique index
+on term), then finds the cues where all terms occur close together by
+binary search over the positions, so its cost depends on the matching
+transcripts, not on the number of caption lines.
+"""
+import hashlib
+import os
+import re
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from utils import cdn
+from utils.cache import invalidate
+from utils.captions import CAPTION_EXTENSIONS, read_captions
+from videos.models import Transcript, TranscriptCue, TranscriptPosting, Video
+
+TOKEN = re.compile(r'[^\W_]+', re.UNICODE)
+MAX_TERM_LENGTH = 50
+MAX_QUERY_TERMS = 8
+# Mots trop fréquents pour discriminer les passages (anglais et français)
+STOPWORDS = frozenset('''
+    a an and are as at be but by do for from has have he i if in is it its me my not of on or so that the
+    their them then there they this to was we were what when which who will with you your
+    au aux ce ces dans de des du elle en est et il ils je la le les leur mais ne nous on ou par pas pour
+    qu que qui sa se ses son sur un une vous
+'''.split())
+
+
+def tokenize(text):
+    """Index terms of a text: lowercase, without accents or stopwords."""
+    text = text.lower()
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN.findall(text)
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+def format_timestamp(seconds):
+    """'1:02:03' or '2:03' label of an offset in seconds."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
+
+
+def file_digest(path):
+    """sha1 of a file, read by blocks."""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def caption_files(paths):
+    """
+    Caption files named <youtube_id>.vtt or <youtube_id>.<language>.srt, in files and directories.
+
+    Yields:
+    tuple: (path, youtube_id, language)
+    """
+    for path in map(Path, paths):
+        if path.is_dir():
+            files = sorted(Path(root) / name for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for file in files:
+            if file.suffix.lower() in CAPTION_EXTENSIONS:
+                # YouTube ids never contain dots
+                youtube_id, _, language = file.stem.partition('.')
+                yield file, youtube_id, language
+
+
+def index_transcript(video_id, path, language='', force=False, chunk_size=2000):
+    """
+    Import a caption file and index its terms, replacing the previous import of the same track.
+
+    Parameters:
+    video_id (int): Primary key of the video
+    path (str): .vtt or .srt file
+    language (str): Language of the track (one transcript per video and language)
+    force (bool): Re-index a file that did not change since its last import
+    chunk_size (int): Rows written per query
+
+    Returns:
+    Transcript: The indexed transcript, or None if the file did not change
+    """
+    digest = file_digest(path)
+    transcript = Transcript.objects.filter(video_id=video_id, language=language).first()
+    if transcript is not None and transcript.file_hash == digest and not force:
+        return None
+
+    with transaction.atomic():
+        if transcript is None:
+            transcript = Transcript.objects.create(video_id=video_id, language=language, source=str(path),
+                                                   file_hash=digest)
+        else:
+            transcript.postings.all().delete()
+            transcript.cues.all().delete()
+        # term -> positions of the cues containing it, increasing
+        positions = {}
+        cues = []
+        cue_count = 0
+        for position, cue in enumerate(read_captions(path)):
+            cues.append(TranscriptCue(transcript_id=transcript.pk, position=position, start=cue.start, end=cue.end,
+                                      text=cue.text))
+            for term in set(tokenize(cue.text)):
+                positions.setdefault(term, []).append(position)
+            if len(cues) >= chunk_size:
+                TranscriptCue.objects.bulk_create(cues)
+                cues = []
+            cue_count = position + 1
+        TranscriptCue.objects.bulk_create(cues)
+        TranscriptPosting.objects.bulk_create(
+            (TranscriptPosting(term=term, transcript_id=transcript.pk, count=len(term_positions),
+                               positions=np.asarray(term_positions, dtype='<u4').tobytes())
+             for term, term_positions in positions.items()),
+            batch_size=chunk_size,
+        )
+        transcript.source, transcript.file_hash, transcript.cue_count = str(path), digest, cue_count
+        transcript.save()
+    return transcript
+
+
+def index_files(paths, force=False, chunk_size=2000, progress=None):
+    """
+    Index the caption files found in paths (see caption_files()).
+
+    Parameters:
+    paths (list): Files and directories
+    force (bool): Re-index unchanged files
+    chunk_size (int): Rows written per query
+    progress (callable): Optional progress(path, status) callback
+
+    Returns:
+    dict: Number of files 'indexed', 'unchanged', and 'unknown' (no video with their YouTube id)
+    """
+    files = list(caption_files(paths))
+    videos = {}
+    youtube_ids = sorted({youtube_id for _, youtube_id, _ in files})
+    for i in range(0, len(youtube_ids), chunk_size):
+        videos.update(Video.objects.filter(youtube_id__in=youtube_ids[i:i + chunk_size])
+                      .values_list('youtube_id', 'pk'))
+
+    counts = {'indexed': 0, 'unchanged': 0, 'unknown': 0}
+    indexed_videos = set()
+    for path, youtube_id, language in files:
+        if youtube_id not in videos:
+            status = 'unknown'
+        elif index_transcript(videos[youtube_id], path, language, force=force, chunk_size=chunk_size) is None:
+            status = 'unchanged'
+        else:
+            status = 'indexed'
+            indexed_videos.add(videos[youtube_id])
+        counts[status] += 1
+        if progress:
+            progress(path, status)
+
+    if indexed_videos:
+        # Search results change: bump the Last-Modified of the search pages and drop the cached ones
+        Video.objects.filter(pk__in=indexed_videos).update(updated_at=timezone.now())
+        invalidate('search')
+        cdn.purge('search')
+    return counts
+
+
+def _near(anchors, positions, window):
+    """Mask of the anchors with one of positions at most window cues away."""
+    after = np.searchsorted(positions, anchors)
+    nearest_after = positions[np.minimum(after, len(positions) - 1)].astype(np.int64)
+    nearest_before = positions[np.maximum(after - 1, 0)].astype(np.int64)
+    anchors = anchors.astype(np.int64)
+    return np.minimum(np.abs(nearest_after - anchors), np.abs(anchors - nearest_before)) <= window
+
+
+def search_transcripts(query, category_slug='', limit=None, window=None, moments=3):
+    """
+    Videos whose transcript has every term of a query within window cues, with the moments they are said.
+
+    Parameters:
+    query (str): Search terms
+    category_slug (str): Only videos of this category
+    limit (int): Maximum number of transcripts examined (default: TRANSCRIPT_SEARCH_LIMIT)
+    window (int): Maximum distance in cues between the terms of a moment (default: TRANSCRIPT_MATCH_WINDOW)
+    moments (int): Moments returned per video
+
+    Returns:
+    list: {'video_id', 'moments': [{'start', 'label', 'text'}]} dicts, best matches first
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    limit = settings.TRANSCRIPT_SEARCH_LIMIT if limit is None else limit
+    window = settings.TRANSCRIPT_MATCH_WINDOW if window is None else window
+
+    # Transcripts containing every term: one index lookup per term, intersected by the database
+    postings = TranscriptPosting.objects.filter(term=terms[0], transcript__video__duplicate_of__isnull=True)
+    for term in terms[1:]:
+        postings = postings.filter(transcript__in=TranscriptPosting.objects.filter(term=term).values('transcript'))
+    if category_slug:
+        postings = postings.filter(transcript__video__category__slug=category_slug)
+    transcript_ids = list(postings.order_by('-count').values_list('transcript_id', flat=True)[:limit])
+    if not transcript_ids:
+        return []
+
+    positions = {}
+    for transcript_id, term, data in (TranscriptPosting.objects.filter(transcript_id__in=transcript_ids,
+                                                                       term__in=terms)
+                                      .values_list('transcript_id', 'term', 'positions')):
+        positions.setdefault(transcript_id, {})[term] = np.frombuffer(bytes(data), dtype='<u4')
+
+    # Best transcript of each video: most moments where all the terms are close, then most occurrences
+    videos = dict(Transcript.objects.filter(pk__in=transcript_ids).values_list('pk', 'video_id'))
+    best = {}
+    for transcript_id, term_positions in positions.items():
+        anchors = term_positions[terms[0]]
+        near = np.ones(len(anchors), dtype=bool)
+        for term in terms[1:]:
+            near &= _near(anchors, term_positions[term], window)
+        if not near.any():
+            # Terms said far apart: not a moment covering the query
+            continue
+        hits = anchors[near]
+        score = (int(near.sum()), len(anchors))
+        video_id = videos[transcript_id]
+        if video_id not in best or score > best[video_id][0]:
+            best[video_id] = (score, transcript_id, hits[:moments].tolist())
+
+    ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)
+    lookup = Q()
+    for _, (_, transcript_id, hits) in ranked:
+        lookup |= Q(transcript_id=transcript_id, position__in=hits)
+    cues = {(transcript_id, position): (start, text) for transcript_id, position, start, text in
+            TranscriptCue.objects.filter(lookup).values_list('transcript_id', 'position', 'start', 'text')}
+
+    results = []
+    for video_id, (_, transcript_id, hits) in ranked:
+        found = [cues[transcript_id, position] for position in hits if (transcript_id, position) in cues]
+        results.append({
+            'video_id': video_id,
+            'moments': [{'start': int(start), 'label': format_timestamp(start), 'text': text}
+                        for start, text in found],
+        })
+    return results
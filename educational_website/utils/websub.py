@@ -0,0 +1,105 @@
+# utils/websub.py
+"""
+WebSub (PubSubHubbub) subscriber for YouTube upload notifications.
+
+YouTube publishes every channel upload feed to a WebSub hub. Once subscribed,
+the hub calls our callback: a GET to verify the (un)subscription intent, then
+a signed POST carrying an Atom entry for each new or updated video. New
+uploads are fetched one by one in the background instead of polling whole
+channels.
+"""
+import hashlib
+import hmac
+import urllib.parse
+import urllib.request
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.urls import reverse
+
+from utils.metrics import external_call
+
+NAMESPACES = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'yt': 'http://www.youtube.com/xml/schemas/2015',
+    'at': 'http://purl.org/atompub/tombstones/1.0',
+}
+
+SIGNATURE_ALGORITHMS = {'sha1': hashlib.sha1, 'sha256': hashlib.sha256, 'sha384': hashlib.sha384,
+                        'sha512': hashlib.sha512}
+
+
+def callback_url(subscription):
+    """Absolute URL the hub calls for a subscription."""
+    return settings.WEBSUB_CALLBACK_BASE_URL.rstrip('/') + reverse('websub_callback', args=[subscription.pk])
+
+
+def request_subscription(subscription, mode='subscribe'):
+    """
+    Ask the hub to (un)subscribe; the hub confirms later through the callback.
+
+    Parameters:
+    subscription (ChannelSubscription): Channel to (un)subscribe
+    mode (str): 'subscribe' or 'unsubscribe'
+
+    Raises:
+    URLError: The hub could not be reached or refused the request
+    """
+    data = urllib.parse.urlencode({
+        'hub.callback': callback_url(subscription),
+        'hub.topic': subscription.topic,
+        'hub.mode': mode,
+        'hub.verify': 'async',
+        'hub.secret': subscription.secret,
+        'hub.lease_seconds': settings.WEBSUB_LEASE_SECONDS,
+    }).encode()
+    request = urllib.request.Request(settings.WEBSUB_HUB_URL, data=data, method='POST')
+    with external_call('websub', mode):
+        with urllib.request.urlopen(request, timeout=settings.WEBSUB_TIMEOUT) as response:
+            return response.status
+
+
+def valid_signature(secret, body, header):
+    """
+    Check the X-Hub-Signature header ("sha1=<hex>") of a notification.
+
+    Parameters:
+    secret (str): Secret given to the hub when subscribing
+    body (bytes): Raw request body
+    header (str): Value of the X-Hub-Signature header
+    """
+    algorithm, _, signature = (header or '').partition('=')
+    digest = SIGNATURE_ALGORITHMS.get(algorithm.lower())
+    if digest is None or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, digest).hexdigest()
+    return hmac.compare_digest(expected, signature.lower())
+
+
+def parse_notification(body):
+    """
+    Extract the videos of an Atom notification.
+
+    Parameters:
+    body (bytes): Atom feed pushed by the hub
+
+    Returns:
+    tuple: (list of (video_id, channel_id, updated) of new or updated videos,
+            list of ids of deleted videos)
+
+    Raises:
+    ValueError: The body is not an XML document
+    """
+    try:
+        root = ElementTree.fromstring(body)
+    except ElementTree.ParseError as e:
+        raise ValueError(f'Invalid Atom feed: {e}')
+    entries = []
+    for entry in root.findall('atom:entry', NAMESPACES):
+        video_id = entry.findtext('yt:videoId', namespaces=NAMESPACES)
+        if video_id:
+            entries.append((video_id, entry.findtext('yt:channelId', '', NAMESPACES),
+                            entry.findtext('atom:updated', '', NAMESPACES)))
+    deleted = [tombstone.get('ref', '').rpartition(':')[2]
+               for tombstone in root.findall('at:deleted-entry', NAMESPACES)]
+    return entries, [video_id for video_id in deleted if video_id]
@@ -1,248 +1,385 @@
 # utils/youtube_api.py
-import os
-import googleapiclient.discovery
-from googleapiclient.errors import HttpError
-from django.conf import settings
-from videos.models import Category, Video, Subcategory
+import datetime
+import re
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from videos.models import Category, Video, Subcategory, VideoCard
+from utils import cdn
+from utils.duplicates import index_videos
+from utils.http_cache import SITE_KEY
+from utils.subcategories import tag_new_videos, tag_videos
+from utils.youtube_dump import read_dump
+from utils.youtube_client import clear_checkpoint, execute, get_service, load_checkpoint, save_checkpoint
 
-def determine_category(title, description):
+ISO_DURATION = re.compile(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+# Maximum number of ids per videos.list call (YouTube API limitation)
+VIDEOS_PER_CALL = 50
+
+# Keyword categories, in tie-break order: (name, description, keywords)
+CATEGORY_KEYWORDS = (
+    ("Programming", "Programming tutorials and coding content",
+     ['python', 'javascript', 'django', 'programming', 
+      'code', 'coding', 'developer', 'web development', 
+      'html', 'css', 'framework', 'algorithm']),
+    ("E-commerce", "E-commerce strategies and online business content",
+     ['ecommerce', 'e-commerce', 'online store', 'shop', 
+      'marketplace', 'shopify', 'woocommerce', 'amazon', 
+      'ebay', 'selling online', 'digital marketing']),
+    ("Entertainment", "Entertainment videos and fun content",
+     ['entertainment', 'funny', 'comedy', 'movie', 
+      'music', 'game', 'gaming', 'play', 'fun']),
+)
+
+# Category of the videos that don't match any keywords
+DEFAULT_CATEGORY = ("Uncategorized", "Videos that haven't been categorized yet")
+
+def classify_video(title, description):
+    """
+    Name and description of the category of a video, from its title and description.
+    
+    Pure function (no database access), shared by live imports and dump replays.
+    
+    Returns:
+    tuple: (category name, category description)
+    """
+    # Convert to lowercase for easier matching
+    title_lower = title.lower()
+    description_lower = description.lower()
+    
+    # Count keyword matches in title and description, keep the highest score
+    best, best_score = DEFAULT_CATEGORY, 0
+    for name, category_description, keywords in CATEGORY_KEYWORDS:
+        score = sum(1 for kw in keywords if kw in title_lower or kw in description_lower)
+        if score > best_score:
+            best, best_score = (name, category_description), score
+    return best
+
+def determine_category(title, description, categories=None):
     """
     Determine the appropriate category for a video based on its title and description.
     
     Parameters:
     title (str): The title of the video
     description (str): The description of the video
+    categories (dict): Optional name -> Category cache, to look each category up only once per import
     
     Returns:
     Category: The most appropriate category object
     """
-    # Convert to lowercase for easier matching
-    title_lower = title.lower()
-    description_lower = description.lower()
+    name, category_description = classify_video(title, description)
+    if categories is not None and name in categories:
+        return categories[name]
+    category, _ = Category.objects.get_or_create(name=name, defaults={"description": category_description})
+    if categories is not None:
+        categories[name] = category
+    return category
+
+def parse_duration(value):
+    """
+    Parse an ISO 8601 duration of the YouTube API ("PT1H2M3S", "P1DT2H").
+    
+    Parameters:
+    value (str): ISO 8601 duration
     
-    # Define keywords for each category
-    programming_keywords = ['python', 'javascript', 'django', 'programming', 
-                           'code', 'coding', 'developer', 'web development', 
-                           'html', 'css', 'framework', 'algorithm']
+    Returns:
+    timedelta: The duration (zero if the value cannot be parsed)
+    """
+    match = ISO_DURATION.match(value or '')
+    if not match:
+        return datetime.timedelta()
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return datetime.timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def video_fields(snippet, details, categories=None):
+    """
+    Video model fields from a playlist item snippet and its videos.list resource.
     
-    ecommerce_keywords = ['ecommerce', 'e-commerce', 'online store', 'shop', 
-                         'marketplace', 'shopify', 'woocommerce', 'amazon', 
-                         'ebay', 'selling online', 'digital marketing']
+    Parameters:
+    snippet (dict): Snippet of the playlist item (or of the video)
+    details (dict): Video resource with contentDetails and statistics
+    categories (dict): Optional category cache, see determine_category()
+    
+    Returns:
+    dict: Field values for Video.objects.update_or_create()
+    """
+    statistics = details.get("statistics", {})
+    thumbnails = snippet.get("thumbnails", {})
+    thumbnail = thumbnails.get("high") or thumbnails.get("default") or {}
+    return {
+        'title': snippet["title"],
+        'description': snippet["description"],
+        'thumbnail_url': thumbnail.get("url", ""),
+        'category': determine_category(snippet["title"], snippet["description"], categories),
+        'duration': parse_duration(details["contentDetails"].get("duration")),
+        'publish_date': parse_datetime(snippet["publishedAt"]),
+        'views_count': int(statistics.get("viewCount", 0)),
+        'likes_count': int(statistics.get("likeCount", 0)),
+    }
+
+
+class VideoWriter:
+    """
+    Chunked upsert of imported videos.
     
-    entertainment_keywords = ['entertainment', 'funny', 'comedy', 'movie', 
-                             'music', 'game', 'gaming', 'play', 'fun']
+    Videos are written with one INSERT ... ON CONFLICT (youtube_id) DO UPDATE
+    per chunk instead of one update_or_create() per video; bulk writes skip
+    the post_save signals, so the cards of each chunk are rebuilt here, after
+    new videos got their predicted subcategory; the chunk is then checked for
+    near-duplicates of the catalog (utils.duplicates).
+    """
+    UPDATE_FIELDS = ['title', 'description', 'thumbnail_url', 'category', 'duration', 'publish_date',
+                     'views_count', 'likes_count', 'updated_at']
     
-    # Count keyword matches in title and description
-    programming_score = sum(1 for kw in programming_keywords if kw in title_lower or kw in description_lower)
-    ecommerce_score = sum(1 for kw in ecommerce_keywords if kw in title_lower or kw in description_lower)
-    entertainment_score = sum(1 for kw in entertainment_keywords if kw in title_lower or kw in description_lower)
+    def __init__(self, chunk_size=1000, purge_pages=True):
+        """
+        Parameters:
+        chunk_size (int): Number of videos written per query
+        purge_pages (bool): Purge the CDN keys of the written videos (off for full replays,
+            which purge the whole site once)
+        """
+        self.chunk_size = chunk_size
+        self.purge_pages = purge_pages
+        self.categories = {}
+        # youtube_id -> Video: a video listed twice in a chunk is written once
+        self.pending = {}
+        self.written = 0
     
-    # Get or create the default category (for videos that don't match any keywords)
-    default_category, _ = Category.objects.get_or_create(
-        name="Uncategorized",
-        defaults={"description": "Videos that haven't been categorized yet"}
-    )
+    def add(self, video_id, snippet, details):
+        """Queue one video (playlist item snippet and videos.list resource) for writing."""
+        self.pending[video_id] = Video(youtube_id=video_id, **video_fields(snippet, details, self.categories))
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
     
-    # Find the category with the highest score
-    max_score = max(programming_score, ecommerce_score, entertainment_score)
-    
-    # If no significant matches, return default category
-    if max_score == 0:
-        return default_category
-    
-    # Return the category with the highest score
-    if programming_score == max_score:
-        category, _ = Category.objects.get_or_create(
-            name="Programming",
-            defaults={"description": "Programming tutorials and coding content"}
-        )
-    elif ecommerce_score == max_score:
-        category, _ = Category.objects.get_or_create(
-            name="E-commerce",
-            defaults={"description": "E-commerce strategies and online business content"}
-        )
-    elif entertainment_score == max_score:
-        category, _ = Category.objects.get_or_create(
-            name="Entertainment",
-            defaults={"description": "Entertainment videos and fun content"}
-        )
-    else:
-        category = default_category
-        
-    return category
+    def flush(self):
+        """Write the queued videos and their cards."""
+        if not self.pending:
+            return
+        videos = list(self.pending.values())
+        with transaction.atomic():
+            Video.objects.bulk_create(videos, update_conflicts=True, unique_fields=['youtube_id'],
+                                      update_fields=self.UPDATE_FIELDS)
+            pks = list(Video.objects.filter(youtube_id__in=list(self.pending)).values_list('pk', flat=True))
+            tag_new_videos(pks)
+            VideoCard.objects.refresh(pks)
+        index_videos(pks)
+        if self.purge_pages:
+            category_keys = {cdn.category_key(video.category_id) for video in videos}
+            cdn.purge(*[cdn.video_key(pk) for pk in pks], *category_keys, 'catalog', 'search')
+        self.written += len(videos)
+        self.pending = {}
 
-def fetch_channel_videos(channel_id):
+def fetch_video_details(youtube, video_ids, part="contentDetails,statistics", recorder=None):
+    """
+    Fetch video resources, VIDEOS_PER_CALL ids per call.
+    
+    Parameters:
+    recorder (DumpRecorder): Optional dump the responses are written to
+    
+    Returns:
+    dict: Video resource by YouTube id (deleted or private videos are missing)
+    """
+    details = {}
+    for i in range(0, len(video_ids), VIDEOS_PER_CALL):
+        response = execute(youtube.videos().list(part=part, id=",".join(video_ids[i:i + VIDEOS_PER_CALL])),
+                           'videos.list')
+        if recorder is not None:
+            recorder.write('videos.list', response)
+        details.update((item["id"], item) for item in response.get("items", []))
+    return details
+
+
+@cdn.batch()
+def fetch_channel_videos(channel_id, progress=None, resume=True, recorder=None):
     """
     Fetch videos from YouTube channel and categorize them.
     
+    The position in the uploads playlist is checkpointed after each page: if
+    the import fails (retries exhausted), running it again resumes at the
+    page that failed.
+    
     Parameters:
     channel_id (str): The YouTube channel ID to fetch videos from
+    progress (callable): Optional progress(processed, total) callback, called after each video
+    resume (bool): Resume an interrupted import of this channel instead of starting over
+    recorder (DumpRecorder): Optional dump the API responses are written to, for import_dump()
     
     Returns:
     int: Number of videos processed
+    
+    Raises:
+    HttpError: API error that retries could not overcome
+    """
+    youtube = get_service()
+    writer = VideoWriter()
+    checkpoint_name = f"channel:{channel_id}"
+    checkpoint = load_checkpoint(checkpoint_name) if resume else None
+    
+    if checkpoint:
+        uploads_playlist_id = checkpoint["playlist_id"]
+        next_page_token = checkpoint["page_token"]
+        videos_processed = checkpoint["processed"]
+    else:
+        # Get channel's uploads playlist (once per import)
+        channels_response = execute(youtube.channels().list(part="contentDetails", id=channel_id), 'channels.list')
+        if not channels_response.get("items"):
+            return 0
+        uploads_playlist_id = channels_response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+        next_page_token = None
+        videos_processed = 0
+    
+    while True:
+        # Get playlist items (videos)
+        playlist_items_response = execute(youtube.playlistItems().list(
+            part="snippet,contentDetails",
+            playlistId=uploads_playlist_id,
+            maxResults=50,
+            pageToken=next_page_token
+        ), 'playlistItems.list')
+        if recorder is not None:
+            recorder.write('playlistItems.list', playlist_items_response)
+        total = playlist_items_response.get("pageInfo", {}).get("totalResults")
+        items = playlist_items_response.get("items", [])
+        
+        # Get detailed video information of the whole page in one call
+        details = fetch_video_details(youtube, [item["contentDetails"]["videoId"] for item in items],
+                                      recorder=recorder)
+        
+        for item in items:
+            video_id = item["contentDetails"]["videoId"]
+            if video_id not in details:
+                continue
+            writer.add(video_id, item["snippet"], details[video_id])
+            videos_processed += 1
+            if progress is not None:
+                progress(videos_processed, total)
+        
+        # The page is in the database before the checkpoint moves past it
+        writer.flush()
+        
+        # Check if there are more videos
+        next_page_token = playlist_items_response.get("nextPageToken")
+        if not next_page_token:
+            break
+        save_checkpoint(checkpoint_name, playlist_id=uploads_playlist_id, page_token=next_page_token,
+                        processed=videos_processed)
+    
+    clear_checkpoint(checkpoint_name)
+    return videos_processed
+
+def fetch_video(video_id):
     """
-    api_service_name = "youtube"
-    api_version = "v3"
-    api_key = settings.YOUTUBE_API_KEY
+    Fetch one video (e.g. announced by a WebSub notification) and save it.
     
-    youtube = googleapiclient.discovery.build(
-        api_service_name, api_version, developerKey=api_key)
+    Parameters:
+    video_id (str): YouTube ID of the video
     
+    Returns:
+    Video: The created or updated video, or None if it is not available (private, deleted)
+    """
+    details = fetch_video_details(get_service(), [video_id], part="snippet,contentDetails,statistics")
+    if video_id not in details:
+        return None
+    video, _ = Video.objects.update_or_create(
+        youtube_id=video_id,
+        defaults=video_fields(details[video_id]["snippet"], details[video_id])
+    )
+    if not video.subcategory_status:
+        tag_videos(Video.objects.filter(pk=video.pk))
+    index_videos([video.pk])
+    return video
+
+def import_dump(path, chunk_size=2000, progress=None):
+    """
+    Replay a dump recorded by a live import, without calling the API.
+    
+    The dump is streamed: only the current playlist page is held in memory,
+    and videos are written chunk_size at a time.
+    
+    Parameters:
+    path (str): Dump written by DumpRecorder (.jsonl or .jsonl.gz)
+    chunk_size (int): Number of videos written per query
+    progress (callable): Optional progress(processed, None) callback
+    
+    Returns:
+    int: Number of videos processed
+    """
+    writer = VideoWriter(chunk_size=chunk_size, purge_pages=False)
+    snippets = {}
     videos_processed = 0
-    next_page_token = None
-    
-    try:
-        # Fetch channel uploads
-        while True:
-            # Get channel's uploads playlist
-            channels_response = youtube.channels().list(
-                part="contentDetails",
-                id=channel_id
-            ).execute()
-            
-            if not channels_response.get("items"):
-                break
-                
-            # Get the uploads playlist ID
-            uploads_playlist_id = channels_response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
-            
-            # Get playlist items (videos)
-            playlist_items_response = youtube.playlistItems().list(
-                part="snippet,contentDetails",
-                playlistId=uploads_playlist_id,
-                maxResults=50,
-                pageToken=next_page_token
-            ).execute()
-            
-            # Process each video
-            for item in playlist_items_response.get("items", []):
-                video_id = item["contentDetails"]["videoId"]
-                snippet = item["snippet"]
-                
-                # Get detailed video information
-                video_response = youtube.videos().list(
-                    part="contentDetails,statistics",
-                    id=video_id
-                ).execute()
-                
-                if not video_response.get("items"):
+    for operation, response in read_dump(path):
+        if operation == 'playlistItems.list':
+            # A new page: snippets of the previous one without details were private or deleted videos
+            snippets = {item["contentDetails"]["videoId"]: item["snippet"] for item in response.get("items", [])}
+        elif operation == 'videos.list':
+            for item in response.get("items", []):
+                snippet = snippets.pop(item["id"], None) or item.get("snippet")
+                if snippet is None or "contentDetails" not in item:
                     continue
-                    
-                video_details = video_response["items"][0]
-                content_details = video_details["contentDetails"]
-                statistics = video_details.get("statistics", {})
-                
-                # Parse duration (in ISO 8601 format)
-                duration_str = content_details.get("duration", "PT0M0S")
-                hours, minutes, seconds = 0, 0, 0
-                
-                if "H" in duration_str:
-                    hours = int(duration_str.split("H")[0].split("PT")[1])
-                    duration_str = duration_str.split("H")[1]
-                else:
-                    duration_str = duration_str.split("PT")[1]
-                    
-                if "M" in duration_str:
-                    minutes = int(duration_str.split("M")[0])
-                    duration_str = duration_str.split("M")[1]
-                    
-                if "S" in duration_str:
-                    seconds = int(duration_str.split("S")[0])
-                
-                import datetime
-                duration = datetime.timedelta(hours=hours, minutes=minutes, seconds=seconds)
-                
-                # Determine category based on video metadata
-                category = determine_category(snippet["title"], snippet["description"])
-                
-                # Get publish date
-                from django.utils.dateparse import parse_datetime
-                publish_date = parse_datetime(snippet["publishedAt"])
-                
-                # Create or update video in database
-                Video.objects.update_or_create(
-                    youtube_id=video_id,
-                    defaults={
-                        'title': snippet["title"],
-                        'description': snippet["description"],
-                        'thumbnail_url': snippet["thumbnails"]["high"]["url"] if "high" in snippet["thumbnails"] else snippet["thumbnails"]["default"]["url"],
-                        'category': category,
-                        'duration': duration,
-                        'publish_date': publish_date,
-                        'views_count': int(statistics.get("viewCount", 0)),
-                        'likes_count': int(statistics.get("likeCount", 0)),
-                    }
-                )
-                
+                writer.add(item["id"], snippet, item)
                 videos_processed += 1
-            
-            # Check if there are more videos
-            next_page_token = playlist_items_response.get("nextPageToken")
-            if not next_page_token:
-                break
-                
-        return videos_processed
-                
-    except HttpError as e:
-        print(f"An HTTP error {e.resp.status} occurred: {e.content}")
-        return videos_processed
-
-def update_video_statistics(days=7):
+                if progress is not None and videos_processed % chunk_size == 0:
+                    progress(videos_processed, None)
+    writer.flush()
+    # Every page may have changed
+    cdn.purge(SITE_KEY)
+    return videos_processed
+
+@cdn.batch()
+def update_video_statistics(days=7, video_ids=None, progress=None):
     """
     Update statistics for videos that were updated within the last X days.
     
     Parameters:
     days (int): Number of days to look back for videos to update
+    video_ids (iterable): Primary keys of the videos to update instead (e.g. an admin selection)
+    progress (callable): Optional progress(processed, total) callback, called after each API call
     
     Returns:
     int: Number of videos updated
-    """
-    api_service_name = "youtube"
-    api_version = "v3"
-    api_key = settings.YOUTUBE_API_KEY
     
-    youtube = googleapiclient.discovery.build(
-        api_service_name, api_version, developerKey=api_key)
+    Raises:
+    HttpError: API error that retries could not overcome
+    """
+    youtube = get_service()
     
     # Get videos updated within the specified time period
-    from django.utils import timezone
-    import datetime
-    
-    cutoff_date = timezone.now() - datetime.timedelta(days=days)
-    videos_to_update = Video.objects.filter(publish_date__gte=cutoff_date)
+    if video_ids is not None:
+        videos = Video.objects.filter(pk__in=list(video_ids))
+    else:
+        cutoff_date = timezone.now() - datetime.timedelta(days=days)
+        videos = Video.objects.filter(publish_date__gte=cutoff_date)
+    pks = dict(videos.values_list('youtube_id', 'pk'))
     
     videos_updated = 0
     
-    try:
-        # Update videos in batches of 50 (YouTube API limitation)
-        for i in range(0, videos_to_update.count(), 50):
-            batch = videos_to_update[i:i+50]
-            video_ids = [video.youtube_id for video in batch]
+    # Statistics change all the time: conditional requests would never match
+    video_ids = list(pks)
+    for i in range(0, len(video_ids), VIDEOS_PER_CALL):
+        video_response = execute(youtube.videos().list(
+            part="statistics",
+            id=",".join(video_ids[i:i + VIDEOS_PER_CALL])
+        ), 'videos.list', conditional=False)
+        
+        # Update each video
+        for item in video_response.get("items", []):
+            video_id = item["id"]
+            statistics = item.get("statistics", {})
             
-            if not video_ids:
-                continue
-                
-            # Get updated statistics
-            video_response = youtube.videos().list(
-                part="statistics",
-                id=",".join(video_ids)
-            ).execute()
+            counts = {
+                'views_count': int(statistics.get("viewCount", 0)),
+                'likes_count': int(statistics.get("likeCount", 0)),
+            }
+            Video.objects.filter(pk=pks[video_id]).update(updated_at=timezone.now(), **counts)
+            # update() doesn't send post_save: keep the video card in sync and purge its page
+            VideoCard.objects.filter(pk=pks[video_id]).update(**counts)
+            cdn.purge(cdn.video_key(pks[video_id]))
             
-            # Update each video
-            for item in video_response.get("items", []):
-                video_id = item["id"]
-                statistics = item.get("statistics", {})
-                
-                Video.objects.filter(youtube_id=video_id).update(
-                    views_count=int(statistics.get("viewCount", 0)),
-                    likes_count=int(statistics.get("likeCount", 0)),
-                )
-                
-                videos_updated += 1
-                
-        return videos_updated
-                
-    except HttpError as e:
-        print(f"An HTTP error {e.resp.status} occurred: {e.content}")
-        return videos_updated
-
+            videos_updated += 1
+        
+        if progress:
+            progress(min(i + VIDEOS_PER_CALL, len(video_ids)), len(video_ids))
+            
+    return videos_updated
@@ -0,0 +1,183 @@
+# utils/youtube_client.py
+"""
+Shared client of the YouTube Data API.
+
+Building a discovery client for every import parsed the discovery document
+again and opened new connections; a failed call stopped the import halfway.
+This module keeps:
+
+- one discovery document per process and one service per thread, each with
+  its own keep-alive httplib2 transport (httplib2.Http is not thread-safe);
+- execute(): retries on rate limits, 5xx and network errors with exponential
+  backoff and full jitter, and conditional requests (If-None-Match) backed by
+  an on-disk response cache, so unchanged resources come back as a 304;
+- page-token checkpoints, so an interrupted playlist walk resumes at the
+  page that failed instead of starting over.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import googleapiclient.discovery
+import httplib2
+from django.conf import settings
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+
+from utils.metrics import external_call
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: transient server errors and per-user/per-second rate limits.
+# quotaExceeded (daily quota) is not retried: it only clears the next day.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'backendError'}
+
+_local = threading.local()
+
+
+@lru_cache(maxsize=1)
+def discovery_document():
+    """YouTube v3 discovery document shipped with google-api-python-client (read once per process)."""
+    return get_static_doc('youtube', 'v3')
+
+
+def get_service():
+    """
+    YouTube service of the current thread, built once.
+
+    Returns:
+    Resource: googleapiclient resource of the YouTube Data API v3
+    """
+    service = getattr(_local, 'service', None)
+    if service is None:
+        http = httplib2.Http(timeout=settings.YOUTUBE_TIMEOUT)
+        service = googleapiclient.discovery.build_from_document(
+            discovery_document(), developerKey=settings.YOUTUBE_API_KEY, http=http)
+        _local.service = service
+    return service
+
+
+def error_reason(error):
+    """First 'reason' of the error body of an HttpError, or ''."""
+    try:
+        return json.loads(error.content)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return ''
+
+
+def is_retryable(error):
+    """Whether a failed call may succeed if tried again."""
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        return status in RETRY_STATUSES or (status == 403 and error_reason(error) in RETRY_REASONS)
+    return isinstance(error, (socket.timeout, ConnectionError, httplib2.HttpLib2Error))
+
+
+def backoff_delay(attempt):
+    """Full jitter: a random delay between 0 and base * 2^attempt, capped."""
+    return random.uniform(0, min(settings.YOUTUBE_RETRY_MAX_DELAY, settings.YOUTUBE_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _cache_path(uri):
+    return Path(settings.YOUTUBE_CACHE_DIR) / 'responses' / hashlib.sha256(uri.encode()).hexdigest()
+
+
+def _read_cached(uri):
+    try:
+        return json.loads(_cache_path(uri).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, path)
+
+
+def execute(request, operation, conditional=True):
+    """
+    Execute an API request with retries and conditional caching.
+
+    Parameters:
+    request (HttpRequest): Request built by the service, e.g. service.videos().list(...)
+    operation (str): Name used in the metrics, e.g. 'videos.list'
+    conditional (bool): Send the ETag of the cached response and reuse it on a 304
+
+    Returns:
+    dict: Response body
+
+    Raises:
+    HttpError: Non-retryable error, or the last error once retries are exhausted
+    """
+    cached = _read_cached(request.uri) if conditional else None
+    if cached and cached.get('etag'):
+        request.headers['If-None-Match'] = cached['etag']
+
+    attempt = 0
+    while True:
+        try:
+            with external_call('youtube', operation):
+                response = request.execute()
+        except HttpError as e:
+            if e.resp.status == 304 and cached:
+                return cached['body']
+            if attempt >= settings.YOUTUBE_MAX_RETRIES or not is_retryable(e):
+                raise
+            error = e
+        except (socket.timeout, ConnectionError, httplib2.HttpLib2Error) as e:
+            if attempt >= settings.YOUTUBE_MAX_RETRIES:
+                raise
+            error = e
+        else:
+            if conditional and response.get('etag'):
+                _write_json(_cache_path(request.uri), {'etag': response['etag'], 'body': response})
+            return response
+
+        delay = backoff_delay(attempt)
+        attempt += 1
+        # Not the error itself: its message contains the request URI, hence the API key
+        cause = (f'{error.resp.status} {error_reason(error)}'.strip() if isinstance(error, HttpError)
+                 else type(error).__name__)
+        logger.warning('YouTube %s failed (%s), retry %s/%s in %.1fs',
+                       operation, cause, attempt, settings.YOUTUBE_MAX_RETRIES, delay)
+        time.sleep(delay)
+
+
+def _checkpoint_path(name):
+    return Path(settings.YOUTUBE_CACHE_DIR) / 'checkpoints' / f'{hashlib.sha1(name.encode()).hexdigest()}.json'
+
+
+def load_checkpoint(name):
+    """
+    State saved by save_checkpoint() for an interrupted walk, or None.
+
+    Parameters:
+    name (str): Identifier of the walk, e.g. 'channel:<channel id>'
+    """
+    try:
+        return json.loads(_checkpoint_path(name).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(name, **state):
+    """Save the position of a walk (next page token, counters)."""
+    _write_json(_checkpoint_path(name), state)
+
+
+def clear_checkpoint(name):
+    """Forget the position of a finished walk."""
+    try:
+        _checkpoint_path(name).unlink()
+    except FileNotFoundError:
+        pass
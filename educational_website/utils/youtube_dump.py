@@ -0,0 +1,80 @@
+# utils/youtube_dump.py
+"""
+Recorded YouTube API responses, for offline replays of imports.
+
+A dump is a JSON Lines file (gzip-compressed when its name ends in .gz), one
+{"operation": ..., "response": ...} object per API response, in the order
+the import received them. import_youtube_videos --record writes one during a
+live import; --from-dump replays it through the same transforms without
+spending API quota.
+"""
+import gzip
+import json
+
+
+def open_dump(path, mode='r'):
+    """
+    Open a dump for reading ('r'), writing ('w') or appending ('a').
+
+    Parameters:
+    path (str): Dump file, compressed if its name ends in .gz
+    mode (str): 'r', 'w' or 'a'
+    """
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class DumpRecorder:
+    """
+    Writes the API responses of an import to a dump.
+
+    Appends by default, so a resumed import completes the dump of the
+    interrupted one:
+
+        with DumpRecorder('channel.jsonl.gz') as recorder:
+            fetch_channel_videos(channel_id, recorder=recorder)
+    """
+
+    def __init__(self, path, append=True):
+        self.path = path
+        self.mode = 'a' if append else 'w'
+        self.file = None
+        self.count = 0
+
+    def __enter__(self):
+        self.file = open_dump(self.path, self.mode)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def write(self, operation, response):
+        """
+        Record one API response.
+
+        Parameters:
+        operation (str): API method, e.g. 'playlistItems.list'
+        response (dict): Response body
+        """
+        self.file.write(json.dumps({'operation': operation, 'response': response}, separators=(',', ':')))
+        self.file.write('\n')
+        self.count += 1
+
+
+def read_dump(path):
+    """
+    Stream the responses of a dump.
+
+    Yields:
+    tuple: (operation, response) in recording order
+    """
+    with open_dump(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f'{path}:{line_number}: invalid JSON ({e})')
+            yield record['operation'], record['response']
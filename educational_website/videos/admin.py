@@ -1,3 +1,295 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
 
-# Register your models here.
+from .jobs import schedule_publish_catalog
+from .models import (Category, ChannelSubscription, DuplicateCandidate, Resource, Subcategory, SubcategoryReview,
+                     Transcript, Video, VideoCard)
+from jobs.registry import enqueue
+from utils import cdn
+from utils.cache import invalidate
+from utils.duplicates import hide_duplicates, merge_duplicates
+from utils.export import export_action
+from utils.http_cache import SITE_KEY
+from utils.pagination import EstimatedCountPaginator
+
+# Au-delà, une action groupée purge tout le site plutôt que chaque page vidéo
+PURGE_KEYS_LIMIT = 1000
+# Vidéos par tâche de rafraîchissement des statistiques
+REFRESH_STATS_CHUNK_SIZE = 5000
+
+
+def _published(pks=None, keys=()):
+    """
+    Invalide caches et CDN puis reconstruit l'instantané du catalogue en tâche de fond
+
+    pks : vidéos modifiées, None (ou plus de PURGE_KEYS_LIMIT vidéos) pour purger tout le site.
+    keys : autres clés de substitution à purger (pages de catégorie...).
+    """
+    invalidate('catalog', 'search')
+    if pks is None or len(pks) > PURGE_KEYS_LIMIT:
+        cdn.purge(SITE_KEY)
+    else:
+        cdn.purge(*[cdn.video_key(pk) for pk in pks], *keys, 'catalog')
+    # Une reconstruction en attente suffit pour plusieurs actions successives
+    schedule_publish_catalog()
+
+
+class VideoActionForm(ActionForm):
+    """Formulaire des actions groupées : catégorie cible de « Changer de catégorie »"""
+    category = forms.ModelChoiceField(Category.objects.order_by('name'), required=False, label="Catégorie")
+
+
+class ResourceInline(admin.TabularInline):
+    model = Resource
+    extra = 0
+
+
+@admin.register(Video)
+class VideoAdmin(admin.ModelAdmin):
+    """Catalogue complet : listes sans COUNT(*) sur toute la table, actions groupées en une requête"""
+    list_display = ('title', 'category', 'subcategory', 'publish_date', 'views_count', 'featured')
+    # Filtres sur des colonnes indexées uniquement
+    list_filter = ('featured', 'category', 'subcategory_status', 'publish_date')
+    list_select_related = ('category', 'subcategory__category')
+    list_per_page = 50
+    search_fields = ('title', '=youtube_id')
+    ordering = ('-publish_date',)
+    # Nombre de lignes estimé d'après les statistiques du planificateur, pas de second COUNT(*) filtré
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    autocomplete_fields = ('category', 'subcategory', 'suggested_subcategory')
+    raw_id_fields = ('duplicate_of',)
+    inlines = [ResourceInline]
+    action_form = VideoActionForm
+    actions = ['feature', 'unfeature', 'recategorize', 'refresh_stats',
+               export_action('videos', 'csv'), export_action('videos', 'jsonl')]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Pages de l'ancienne catégorie comprises si elle a changé
+        categories = {obj.category_id, form.initial.get('category') or obj.category_id}
+        _published([obj.pk], {cdn.category_key(pk) for pk in categories})
+
+    def delete_model(self, request, obj):
+        pk, category_id = obj.pk, obj.category_id
+        super().delete_model(request, obj)
+        _published([pk], {cdn.category_key(category_id)})
+
+    def delete_queryset(self, request, queryset):
+        videos = list(queryset.values_list('pk', 'category_id'))
+        super().delete_queryset(request, queryset)
+        _published([pk for pk, _ in videos], {cdn.category_key(c) for _, c in videos})
+
+    @admin.action(description="Mettre en avant", permissions=['change'])
+    def feature(self, request, queryset):
+        self._set_featured(request, queryset, True)
+
+    @admin.action(description="Retirer de la mise en avant", permissions=['change'])
+    def unfeature(self, request, queryset):
+        self._set_featured(request, queryset, False)
+
+    def _set_featured(self, request, queryset, featured):
+        videos = queryset.exclude(featured=featured)
+        # Au plus PURGE_KEYS_LIMIT + 1 clés : au-delà, le site entier est purgé
+        pks = list(videos.values_list('pk', flat=True)[:PURGE_KEYS_LIMIT + 1])
+        with transaction.atomic():
+            # update() ne déclenche pas les signaux : cartes mises à jour ici, avant que
+            # la sélection (featured différent) ne devienne vide
+            VideoCard.objects.filter(video__in=videos.values('pk')).update(featured=featured)
+            count = videos.update(featured=featured, updated_at=timezone.now())
+        if count:
+            _published(pks)
+        self.message_user(request, f"{count} vidéo(s) modifiée(s)", messages.SUCCESS)
+
+    @admin.action(description="Changer de catégorie (catégorie choisie ci-dessous)", permissions=['change'])
+    def recategorize(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        category = form.cleaned_data['category'] if form.is_valid() else None
+        if category is None:
+            self.message_user(request, "Choisissez la catégorie cible", messages.WARNING)
+            return
+        videos = queryset.exclude(category=category)
+        with transaction.atomic():
+            VideoCard.objects.filter(video__in=videos.values('pk')).update(
+                category=category, category_name=category.name, category_slug=category.slug, subcategory=None)
+            # Les sous-catégories appartiennent à l'ancienne catégorie : classement à refaire
+            count = videos.update(category=category, subcategory=None, suggested_subcategory=None,
+                                  subcategory_status='', subcategory_confidence=None, updated_at=timezone.now())
+        # Pages des anciennes catégories comprises : purge du site entier
+        if count:
+            _published()
+        self.message_user(request, f"{count} vidéo(s) déplacée(s) vers {category.name}", messages.SUCCESS)
+
+    @admin.action(description="Rafraîchir les statistiques YouTube (tâche de fond)", permissions=['change'])
+    def refresh_stats(self, request, queryset):
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        for i in range(0, len(pks), REFRESH_STATS_CHUNK_SIZE):
+            enqueue('videos.refresh_statistics', created_by=request.user, video_ids=pks[i:i + REFRESH_STATS_CHUNK_SIZE])
+        self.message_user(request, f"Statistiques de {len(pks)} vidéo(s) mises en file", messages.SUCCESS)
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'updated_at')
+    search_fields = ('name', 'slug')
+    ordering = ('name',)
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(Subcategory)
+class SubcategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'category', 'slug')
+    list_filter = ('category',)
+    list_select_related = ('category',)
+    search_fields = ('name', 'category__name')
+    prepopulated_fields = {'slug': ('name',)}
+    ordering = ('category__name', 'name')
+    autocomplete_fields = ('category',)
+
+    def get_queryset(self, request):
+        # __str__ affiche la catégorie (listes et champs d'autocomplétion des vidéos)
+        return super().get_queryset(request).select_related('category')
+
+
+@admin.register(Resource)
+class ResourceAdmin(admin.ModelAdmin):
+    list_display = ('title', 'file_type', 'video')
+    list_filter = ('file_type',)
+    list_select_related = ('video',)
+    search_fields = ('title', 'video__title', '=video__youtube_id')
+    raw_id_fields = ('video',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(ChannelSubscription)
+class ChannelSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ('channel_id', 'title', 'status', 'lease_expires_at', 'last_notification_at')
+    list_filter = ('status',)
+    search_fields = ('channel_id', 'title')
+    readonly_fields = ('status', 'lease_expires_at', 'subscribed_at', 'last_notification_at', 'created_at')
+
+
+@admin.register(SubcategoryReview)
+class SubcategoryReviewAdmin(admin.ModelAdmin):
+    """File des prédictions peu sûres : valider la suggestion ou choisir la sous-catégorie"""
+    list_display = ('title', 'category', 'suggested_subcategory', 'subcategory_confidence', 'subcategory')
+    list_editable = ('subcategory',)
+    list_filter = ('category', 'suggested_subcategory')
+    list_select_related = ('category', 'suggested_subcategory__category')
+    search_fields = ('title',)
+    ordering = ('subcategory_confidence',)
+    fields = ('title', 'description', 'category', 'suggested_subcategory', 'subcategory_confidence', 'subcategory')
+    readonly_fields = ('title', 'description', 'category', 'suggested_subcategory', 'subcategory_confidence')
+    actions = ['accept_suggestion']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(subcategory_status='review')
+
+    def has_add_permission(self, request):
+        return False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'subcategory':
+            kwargs['queryset'] = db_field.related_model.objects.select_related('category')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def save_model(self, request, obj, form, change):
+        # Un choix humain devient un exemple d'apprentissage
+        if obj.subcategory_id:
+            obj.subcategory_status = 'manual'
+            obj.suggested_subcategory = None
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description="Valider la sous-catégorie suggérée")
+    def accept_suggestion(self, request, queryset):
+        queryset = queryset.exclude(suggested_subcategory=None)
+        videos = list(queryset.values_list('pk', 'category_id'))
+        # subcategory avant suggested_subcategory : MySQL évalue les affectations dans l'ordre
+        queryset.update(subcategory=F('suggested_subcategory'), suggested_subcategory=None,
+                        subcategory_status='manual', updated_at=timezone.now())
+        pks = [pk for pk, _ in videos]
+        # update() ne déclenche pas les signaux : cartes, caches et pages mises à jour ici
+        VideoCard.objects.refresh(pks)
+        if pks:
+            _published(pks, {cdn.category_key(c) for _, c in videos})
+        self.message_user(request, f"{len(pks)} sous-catégorie(s) validée(s)", messages.SUCCESS)
+
+
+@admin.register(DuplicateCandidate)
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+    """Paires de quasi-doublons détectées par MinHash : fusionner, masquer ou écarter"""
+    list_display = ('video_link', 'original_link', 'similarity', 'status', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('video', 'original')
+    search_fields = ('video__title', 'original__title', 'video__youtube_id', 'original__youtube_id')
+    ordering = ('-similarity',)
+    fields = ('video_link', 'original_link', 'similarity', 'status', 'created_at', 'resolved_at',
+              'video_description', 'original_description')
+    readonly_fields = fields
+    actions = ['merge', 'hide', 'dismiss']
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('video', 'original')
+
+    @admin.display(description="Doublon", ordering='video__title')
+    def video_link(self, obj):
+        return self._video_link(obj.video)
+
+    @admin.display(description="Original", ordering='original__title')
+    def original_link(self, obj):
+        return self._video_link(obj.original)
+
+    @admin.display(description="Description du doublon")
+    def video_description(self, obj):
+        return obj.video.description
+
+    @admin.display(description="Description de l'original")
+    def original_description(self, obj):
+        return obj.original.description
+
+    def _video_link(self, video):
+        return format_html('<a href="{}">{}</a> ({}, {})', reverse('video_detail', args=[video.pk]), video.title,
+                           video.youtube_id, video.publish_date.date())
+
+    @admin.action(description="Fusionner dans l'original (ressources, favoris, historique)")
+    def merge(self, request, queryset):
+        merged = merge_duplicates(queryset)
+        self.message_user(request, f"{len(merged)} doublon(s) fusionné(s)", messages.SUCCESS)
+
+    @admin.action(description="Masquer le doublon")
+    def hide(self, request, queryset):
+        hidden = hide_duplicates(queryset)
+        self.message_user(request, f"{len(hidden)} doublon(s) masqué(s)", messages.SUCCESS)
+
+    @admin.action(description="Pas un doublon")
+    def dismiss(self, request, queryset):
+        count = queryset.filter(status='pending').update(status='dismissed', resolved_at=timezone.now())
+        self.message_user(request, f"{count} paire(s) écartée(s)", messages.SUCCESS)
+
+
+@admin.register(Transcript)
+class TranscriptAdmin(admin.ModelAdmin):
+    """Transcriptions importées par « manage.py index_transcripts » (lecture seule)"""
+    list_display = ('video', 'language', 'cue_count', 'indexed_at')
+    list_filter = ('language',)
+    list_select_related = ('video',)
+    search_fields = ('video__title', 'video__youtube_id')
+    raw_id_fields = ('video',)
+    readonly_fields = ('video', 'language', 'source', 'file_hash', 'cue_count', 'indexed_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,106 @@
+# videos/jobs.py
+"""
+Background jobs of the videos app, run by « manage.py run_jobs ».
+"""
+import logging
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import enqueue, job
+from utils import images
+from utils.catalog_snapshot import publish_catalog
+from utils.youtube_api import fetch_channel_videos, fetch_video, update_video_statistics
+from videos.models import Video, VideoCard
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_publish_catalog():
+    """Queue a catalog snapshot rebuild, unless one is already waiting (it will see every change)."""
+    if not Job.objects.filter(name='videos.publish_catalog', status='queued').exists():
+        enqueue('videos.publish_catalog')
+
+
+def cache_thumbnail(video):
+    """
+    Download the thumbnail of one video and generate its variants (cache_thumbnails does the whole catalog).
+
+    A failed download is only logged: the next cache_thumbnails run retries it.
+    """
+    if video.thumbnail_hash or not video.thumbnail_url:
+        return
+    try:
+        digest = images.download(video.thumbnail_url)
+    except OSError as e:
+        logger.warning('Cannot download the thumbnail of video %s: %s', video.pk, e)
+        return
+    # update() skips the signals: the card is updated alongside the video
+    Video.objects.filter(pk=video.pk).update(thumbnail_hash=digest, updated_at=timezone.now())
+    VideoCard.objects.filter(pk=video.pk).update(thumbnail_hash=digest)
+    if images.missing_variants(digest):
+        images.generate_variants(digest)
+
+
+@job('videos.import_channel', concurrency=1, max_attempts=3)
+def import_channel(job, channel_id):
+    """
+    Import the videos of a YouTube channel, cache their thumbnails and publish the catalog.
+
+    Only one import runs at a time: imports share the YouTube API quota.
+
+    Parameters:
+    channel_id (str): The YouTube channel ID to fetch videos from
+
+    Returns:
+    dict: Number of videos processed
+    """
+    count = fetch_channel_videos(channel_id, progress=job.report_progress)
+    call_command('cache_thumbnails')
+    publish_catalog()
+    return {'videos': count}
+
+
+@job('videos.fetch_video', concurrency=4, priority=10)
+def fetch_single_video(job, video_id):
+    """
+    Fetch one new or updated video announced by a WebSub notification.
+
+    Parameters:
+    video_id (str): YouTube ID of the video
+
+    Returns:
+    dict: Primary key of the saved video (None if it is not available)
+    """
+    video = fetch_video(video_id)
+    if video is not None:
+        cache_thumbnail(video)
+        # Several notifications in a row share one rebuild, never run concurrently
+        schedule_publish_catalog()
+    return {'video': video.pk if video else None}
+
+
+@job('videos.refresh_statistics', concurrency=1, max_attempts=3)
+def refresh_statistics(job, video_ids):
+    """
+    Refresh the view and like counts of selected videos (admin bulk action).
+
+    Parameters:
+    video_ids (list): Primary keys of the videos
+
+    Returns:
+    dict: Number of videos updated
+    """
+    return {'videos': update_video_statistics(video_ids=video_ids, progress=job.report_progress)}
+
+
+@job('videos.publish_catalog', concurrency=1)
+def publish_catalog_job(job):
+    """
+    Rebuild the catalog snapshot after bulk edits made in the admin.
+
+    Returns:
+    dict: Version of the new snapshot
+    """
+    return {'version': publish_catalog().name}
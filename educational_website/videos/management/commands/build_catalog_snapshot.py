@@ -0,0 +1,12 @@
+# videos/management/commands/build_catalog_snapshot.py
+from django.core.management.base import BaseCommand
+from utils.catalog_snapshot import build_snapshot, CatalogSnapshot
+
+class Command(BaseCommand):
+    help = 'Export the catalog to a new memory-mapped NumPy snapshot and make it current'
+
+    def handle(self, *args, **options):
+        version_dir = build_snapshot()
+        snapshot = CatalogSnapshot(version_dir)
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot {snapshot.version} is now current ({len(snapshot)} videos)'))
@@ -0,0 +1,94 @@
+# videos/management/commands/cache_thumbnails.py
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from accounts.models import Profile
+from utils import images
+from videos.models import Category, Video, VideoCard
+
+
+def fetch(url, offline):
+    """Return (url, hash or None, error or None) for one thumbnail."""
+    try:
+        digest = images.cached_digest(url) if offline else images.download(url)
+        return url, digest, None
+    except Exception as e:
+        return url, None, f'{type(e).__name__}: {e}'
+
+
+def generate(image):
+    """Worker: number of files written for a (digest, private) image, or the error message."""
+    try:
+        return images.generate_variants(*image)
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+
+
+class Command(BaseCommand):
+    help = 'Download video thumbnails into the local image cache and generate their WebP/JPEG variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offline', action='store_true',
+                            help='Do not download: only link already cached images and generate variants')
+        parser.add_argument('--download-workers', type=int, default=8, help='Parallel downloads')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes generating the variants')
+
+    def handle(self, *args, **options):
+        offline = options['offline']
+
+        # 1. Thumbnails not cached yet (downloads are I/O bound: threads)
+        pending = {}
+        for pk, url in (Video.objects.filter(thumbnail_hash='').exclude(thumbnail_url='')
+                        .values_list('pk', 'thumbnail_url').iterator()):
+            pending.setdefault(url, []).append(pk)
+
+        linked = failed = missing = 0
+        with ThreadPoolExecutor(max_workers=options['download_workers']) as pool:
+            for url, digest, error in pool.map(lambda url: fetch(url, offline), pending):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{url}: {error}')
+                    continue
+                if digest is None:
+                    missing += 1
+                    continue
+                pks = pending[url]
+                # update() skips the signals: the card is updated alongside the video
+                Video.objects.filter(pk__in=pks).update(thumbnail_hash=digest, updated_at=timezone.now())
+                VideoCard.objects.filter(pk__in=pks).update(thumbnail_hash=digest)
+                linked += len(pks)
+        mode = 'from the local cache' if offline else 'downloaded or cached'
+        self.stdout.write(f'{linked} videos linked to a thumbnail {mode}: '
+                          f'{len(pending) - failed - missing} of {len(pending)} URLs resolved, '
+                          f'{failed} failed, {missing} not cached')
+
+        # 2. Variants of every cached image (CPU bound: processes)
+        public = set(Video.objects.exclude(thumbnail_hash='').values_list('thumbnail_hash', flat=True).distinct())
+        public.update(Category.objects.exclude(icon_hash='').values_list('icon_hash', flat=True))
+        avatars = set(Profile.objects.exclude(avatar_hash='').values_list('avatar_hash', flat=True))
+        # Avatars cached in the public area by earlier versions move to the protected one
+        moved = sum(images.make_private(digest) for digest in avatars - public)
+        if moved:
+            self.stdout.write(f'{moved} avatars moved to the protected image area')
+        todo = sorted(image for image in {(digest, False) for digest in public} | {(digest, True) for digest in avatars}
+                      if (images.image_dir(*image) / images.ORIGINAL).exists() and images.missing_variants(*image))
+
+        written = 0
+        if todo:
+            # The forked processes must not share the parent's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                for (digest, _), result in zip(todo, pool.map(generate, todo, chunksize=16)):
+                    if isinstance(result, str):
+                        self.stderr.write(f'{digest}: {result}')
+                    else:
+                        written += result
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {written} variant files for {len(todo)} images '
+            f'({len(settings.IMAGE_VARIANT_WIDTHS)} widths, WebP and JPEG)'))
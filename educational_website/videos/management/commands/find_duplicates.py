@@ -0,0 +1,36 @@
+# videos/management/commands/find_duplicates.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from utils.duplicates import index_videos
+from videos.models import DuplicateCandidate, Video, VideoSignature
+
+
+class Command(BaseCommand):
+    help = 'Sign the videos with MinHash and record the near-duplicate pairs for review in the admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Re-sign every video, not only the new and changed ones')
+        parser.add_argument('--threshold', type=float,
+                            help='Minimum estimated similarity (default: DUPLICATE_SIMILARITY_THRESHOLD)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Videos signed and looked up per batch')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            video_ids = None
+        else:
+            # New videos and videos edited since they were signed; index_videos() skips unchanged texts
+            video_ids = Video.objects.exclude(signature__computed_at__gte=F('updated_at')).values_list('pk', flat=True)
+
+        start = time.perf_counter()
+        counts = index_videos(video_ids, threshold=options['threshold'], batch_size=options['batch_size'],
+                              force=options['rebuild'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'Signed {counts["indexed"]} videos in {elapsed:.2f}s '
+                          f'({counts["indexed"] / elapsed if elapsed else 0:,.0f} videos/s), '
+                          f'{VideoSignature.objects.count()} in the index')
+        pending = DuplicateCandidate.objects.filter(status='pending').count()
+        self.stdout.write(self.style.SUCCESS(f'{counts["candidates"]} new duplicate pairs, {pending} waiting for review'))
@@ -1,14 +1,78 @@
 # videos/management/commands/import_youtube_videos.py
-from django.core.management.base import BaseCommand
-from utils.youtube_api import fetch_channel_videos
+import time
+from contextlib import ExitStack
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from googleapiclient.errors import HttpError
+from utils.youtube_api import fetch_channel_videos, import_dump
+from utils.youtube_dump import DumpRecorder
+from utils.profiling import profiled, save_report
+from utils.catalog_snapshot import publish_catalog
 
 class Command(BaseCommand):
-    help = 'Import videos from YouTube channel'
+    help = 'Import videos from YouTube channel, or replay a recorded dump of API responses'
 
     def add_arguments(self, parser):
-        parser.add_argument('channel_id', type=str, help='YouTube channel ID')
+        parser.add_argument('channel_id', type=str, nargs='?', help='YouTube channel ID')
+        parser.add_argument('--profile', action='store_true',
+                            help='Record a cProfile/tracemalloc report and slow queries of the import')
+        parser.add_argument('--skip-thumbnails', action='store_true',
+                            help='Do not download the thumbnails (run cache_thumbnails later)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the checkpoint of an interrupted import and start from the first page')
+        parser.add_argument('--record', metavar='PATH',
+                            help='Append the API responses to this dump (.jsonl or .jsonl.gz) for later replays')
+        parser.add_argument('--from-dump', metavar='PATH',
+                            help='Replay a dump written by --record instead of calling the API')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Videos written per query when replaying a dump')
 
     def handle(self, *args, **options):
         channel_id = options['channel_id']
-        count = fetch_channel_videos(channel_id)
+        if bool(channel_id) == bool(options['from_dump']):
+            raise CommandError('Give either a channel ID or --from-dump')
+        if options['from_dump'] and options['record']:
+            raise CommandError('--record only applies to live imports')
+
+        if options['from_dump']:
+            label = f'import_youtube_videos --from-dump {options["from_dump"]}'
+            run = lambda: import_dump(options['from_dump'], chunk_size=options['chunk_size'],
+                                      progress=lambda done, total: self.stdout.write(f'{done} videos written'))
+        else:
+            label = f'import_youtube_videos {channel_id}'
+            run = lambda recorder=None: fetch_channel_videos(channel_id, resume=not options['restart'],
+                                                             recorder=recorder)
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                if options['record']:
+                    recorder = stack.enter_context(DumpRecorder(options['record']))
+                    import_videos = lambda: run(recorder)
+                else:
+                    import_videos = run
+                if options['profile']:
+                    with profiled(label) as result:
+                        count = import_videos()
+                    report = save_report(result)
+                    self.stdout.write(f'Profile saved to {report.profile_file} (report #{report.pk})')
+                else:
+                    count = import_videos()
+        except HttpError as e:
+            raise CommandError(f'YouTube API error {e.resp.status}: {e.content!r}. '
+                               'Run the command again to resume from the last imported page.')
+        except (OSError, ValueError, KeyError) as e:
+            if not options['from_dump']:
+                raise
+            raise CommandError(f'Cannot replay {options["from_dump"]}: {e!r}')
+        if options['record']:
+            self.stdout.write(f'Recorded {recorder.count} API responses to {options["record"]}')
+        self.stdout.write(f'Imported {count} videos in {time.perf_counter() - start:.1f}s')
+
+        if not options['skip_thumbnails']:
+            call_command('cache_thumbnails', stdout=self.stdout, stderr=self.stderr)
+
+        version_dir = publish_catalog()
+        self.stdout.write(f'Catalog snapshot {version_dir.name} is now current')
         self.stdout.write(self.style.SUCCESS(f'Successfully processed {count} videos'))
@@ -0,0 +1,38 @@
+# videos/management/commands/index_transcripts.py
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.transcripts import index_files
+
+
+class Command(BaseCommand):
+    help = 'Import WebVTT/SRT caption files named <youtube_id>[.<language>].vtt|.srt into the transcript search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Caption files or directories (default: TRANSCRIPT_DIR)')
+        parser.add_argument('--force', action='store_true', help='Re-index files that did not change')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Cues and postings written per query')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or [settings.TRANSCRIPT_DIR]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            raise CommandError(f'No such file or directory: {", ".join(missing)}')
+
+        def progress(path, status):
+            if status == 'unknown':
+                self.stderr.write(f'No video with the YouTube id of {path}, skipped')
+            elif status == 'indexed' and options['verbosity'] > 1:
+                self.stdout.write(f'Indexed {path}')
+
+        start = time.perf_counter()
+        try:
+            counts = index_files(paths, force=options['force'], chunk_size=options['chunk_size'], progress=progress)
+        except OSError as e:
+            raise CommandError(f'Cannot read captions: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{counts["indexed"]} transcripts indexed, {counts["unchanged"]} unchanged, '
+            f'{counts["unknown"]} without video in {time.perf_counter() - start:.1f}s'))
@@ -0,0 +1,13 @@
+# videos/management/commands/rebuild_video_cards.py
+from django.core.management.base import BaseCommand
+from videos.models import VideoCard
+
+class Command(BaseCommand):
+    help = 'Rebuild the compact video cards used by list pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = VideoCard.objects.refresh(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} video cards'))
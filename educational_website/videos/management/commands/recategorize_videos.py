@@ -0,0 +1,144 @@
+# videos/management/commands/recategorize_videos.py
+import csv
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from utils import cdn
+from utils.cache import invalidate
+from utils.catalog_snapshot import publish_catalog
+from utils.http_cache import SITE_KEY
+from utils.youtube_api import CATEGORY_KEYWORDS, DEFAULT_CATEGORY, classify_video
+from videos.models import Category, Video, VideoCard
+
+
+def classify_chunk(rows):
+    """Worker: (pk, title, current category name, new category name) of the rows whose category changes."""
+    changed = []
+    for pk, title, description, current in rows:
+        name, _ = classify_video(title, description)
+        if name != current:
+            changed.append((pk, title, current, name))
+    return changed
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Re-run the keyword categorization over the existing catalog and save the changed categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the changes')
+        parser.add_argument('--report', metavar='CSV', help='Write every change to a CSV file')
+        parser.add_argument('--examples', type=int, default=3, help='Titles shown per change in the summary')
+        parser.add_argument('--category', action='append', metavar='SLUG',
+                            help='Only videos currently in this category (repeatable)')
+        parser.add_argument('--published-after', metavar='YYYY-MM-DD')
+        parser.add_argument('--published-before', metavar='YYYY-MM-DD')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Classifying processes')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows read and classified per chunk')
+
+    def handle(self, *args, **options):
+        videos = Video.objects.order_by()
+        if options['category']:
+            videos = videos.filter(category__slug__in=options['category'])
+        for option, lookup in (('published_after', 'publish_date__date__gte'),
+                               ('published_before', 'publish_date__date__lt')):
+            if options[option]:
+                day = parse_date(options[option])
+                if day is None:
+                    raise CommandError(f'Invalid date: {options[option]}')
+                videos = videos.filter(**{lookup: day})
+
+        start = time.perf_counter()
+        names = dict(Category.objects.values_list('pk', 'name'))
+        # Category name -> pks of the videos moving to it
+        moves = {}
+        transitions = Counter()
+        examples = {}
+        scanned = 0
+
+        report_file = open(options['report'], 'w', newline='', encoding='utf-8') if options['report'] else None
+        report = csv.writer(report_file) if report_file else None
+        if report:
+            report.writerow(['video_id', 'title', 'old_category', 'new_category'])
+
+        def collect(changed):
+            for pk, title, old, new in changed:
+                moves.setdefault(new, []).append(pk)
+                transitions[old, new] += 1
+                titles = examples.setdefault((old, new), [])
+                if len(titles) < options['examples']:
+                    titles.append(title)
+                if report:
+                    report.writerow([pk, title, old, new])
+
+        # Fork the workers before opening the cursor: children must not inherit a live connection
+        connections.close_all()
+        try:
+            with multiprocessing.Pool(options['workers']) as pool:
+                rows = ((pk, title, description, names.get(category_id, ''))
+                        for pk, title, description, category_id in
+                        videos.values_list('pk', 'title', 'description', 'category_id')
+                        .iterator(chunk_size=options['chunk_size']))
+                pending = deque()
+                for chunk in chunks(rows, options['chunk_size']):
+                    scanned += len(chunk)
+                    pending.append(pool.apply_async(classify_chunk, (chunk,)))
+                    # Bounded read-ahead: memory stays constant whatever the catalog size
+                    while len(pending) > 2 * options['workers']:
+                        collect(pending.popleft().get())
+                while pending:
+                    collect(pending.popleft().get())
+        finally:
+            if report_file:
+                report_file.close()
+
+        changed = sum(transitions.values())
+        verb = 'would change' if options['dry_run'] else 'to change'
+        self.stdout.write(f'Scanned {scanned} videos in {time.perf_counter() - start:.1f}s: {changed} {verb}')
+        for (old, new), count in transitions.most_common():
+            self.stdout.write(f'  {old or "?"} -> {new}: {count}')
+            for title in examples[old, new]:
+                self.stdout.write(f'      {title}')
+        if report:
+            self.stdout.write(f'Changes written to {options["report"]}')
+
+        if options['dry_run'] or not changed:
+            return
+
+        now = timezone.now()
+        descriptions = dict([DEFAULT_CATEGORY] + [(name, description) for name, description, _ in CATEGORY_KEYWORDS])
+        for name, pks in moves.items():
+            category, _ = Category.objects.get_or_create(name=name, defaults={'description': descriptions[name]})
+            for chunk in chunks(pks, options['chunk_size']):
+                # One UPDATE per target category and chunk; update() skips the signals,
+                # so the cards are moved alongside. Subcategories belong to the old category:
+                # cleared for the classifier to suggest new ones (as VideoAdmin.recategorize does)
+                with transaction.atomic():
+                    Video.objects.filter(pk__in=chunk).update(
+                        category=category, subcategory=None, suggested_subcategory=None, subcategory_status='',
+                        subcategory_confidence=None, updated_at=now)
+                    VideoCard.objects.filter(pk__in=chunk).update(
+                        category=category, category_name=category.name, category_slug=category.slug,
+                        subcategory=None)
+
+        invalidate('catalog', 'search')
+        cdn.purge(SITE_KEY)
+        version_dir = publish_catalog()
+        self.stdout.write(f'Catalog snapshot {version_dir.name} is now current')
+        self.stdout.write(self.style.SUCCESS(f'Moved {changed} videos to {len(moves)} categories'))
@@ -0,0 +1,47 @@
+# videos/management/commands/tag_subcategories.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils import cdn
+from utils.cache import invalidate
+from utils.catalog_snapshot import publish_catalog
+from utils.http_cache import SITE_KEY
+from utils.subcategories import load_model, tag_videos
+from videos.models import Video
+
+
+class Command(BaseCommand):
+    help = 'Predict the subcategory of videos with the trained classifier'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-tag every video not classified by hand, not only the unclassified ones')
+        parser.add_argument('--category', action='append', metavar='SLUG', help='Only this category (repeatable)')
+        parser.add_argument('--threshold', type=float,
+                            help='Minimum confidence to apply a prediction (default: SUBCATEGORY_CONFIDENCE_THRESHOLD)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        model = load_model()
+        if model is None:
+            raise CommandError('No model: run train_subcategory_classifier first')
+
+        videos = Video.objects.all()
+        if not options['all']:
+            videos = videos.filter(subcategory_status='')
+        if options['category']:
+            videos = videos.filter(category__slug__in=options['category'])
+
+        start = time.perf_counter()
+        counts = tag_videos(videos, model=model, threshold=options['threshold'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        self.stdout.write(f'Classified {total} videos in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} videos/s): '
+                          f'{counts["predicted"]} predicted, {counts["review"]} sent to review, '
+                          f'{counts["unclassified"]} without subcategory')
+
+        if counts['predicted'] or options['all']:
+            invalidate('catalog', 'search')
+            cdn.purge(SITE_KEY)
+            publish_catalog()
@@ -0,0 +1,69 @@
+# videos/management/commands/train_subcategory_classifier.py
+import random
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.classifier import NaiveBayesClassifier
+from utils.subcategories import save_model, training_set
+
+
+class Command(BaseCommand):
+    help = 'Train the subcategory classifier on the manually classified videos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--features', type=int, default=settings.SUBCATEGORY_HASH_FEATURES,
+                            help='Number of hashed n-gram features')
+        parser.add_argument('--alpha', type=float, default=settings.SUBCATEGORY_SMOOTHING, help='Smoothing')
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Hold out --test-split of the examples to report accuracy and throughput')
+        parser.add_argument('--test-split', type=float, default=0.2)
+        parser.add_argument('--no-save', action='store_true', help='Do not replace the current model')
+
+    def handle(self, *args, **options):
+        documents, labels = training_set()
+        classes = len(set(labels))
+        if classes < 2:
+            raise CommandError(f'Need manually classified videos in at least 2 subcategories, found {classes}')
+        self.stdout.write(f'{len(documents)} examples in {classes} subcategories')
+
+        if options['benchmark']:
+            self.benchmark(documents, labels, options)
+
+        start = time.perf_counter()
+        model = NaiveBayesClassifier(options['features'], options['alpha']).fit(documents, labels)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'Trained on {len(documents)} videos in {elapsed:.2f}s '
+                          f'({len(documents) / elapsed:,.0f} videos/s)')
+        if not options['no_save']:
+            save_model(model)
+            self.stdout.write(self.style.SUCCESS(f'Model saved to {settings.SUBCATEGORY_MODEL_PATH}'))
+
+    def benchmark(self, documents, labels, options):
+        order = list(range(len(documents)))
+        random.Random(0).shuffle(order)
+        split = max(1, int(len(order) * options['test_split']))
+        test, train = order[:split], order[split:]
+
+        start = time.perf_counter()
+        model = NaiveBayesClassifier(options['features'], options['alpha']).fit(
+            [documents[i] for i in train], [labels[i] for i in train])
+        train_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        predicted, confidences = model.predict([documents[i] for i in test])
+        predict_time = time.perf_counter() - start
+
+        expected = np.array([labels[i] for i in test])
+        accuracy = float(np.mean(predicted == expected))
+        threshold = settings.SUBCATEGORY_CONFIDENCE_THRESHOLD
+        confident = confidences >= threshold
+        confident_accuracy = float(np.mean(predicted[confident] == expected[confident])) if confident.any() else 0
+        self.stdout.write(
+            f'Benchmark on {len(test)} held-out videos:\n'
+            f'  training    {len(train) / train_time:>12,.0f} videos/s\n'
+            f'  prediction  {len(test) / predict_time:>12,.0f} videos/s\n'
+            f'  accuracy    {accuracy:>12.1%}\n'
+            f'  above {threshold:.2f}  {confident.mean():>12.1%} of videos, {confident_accuracy:.1%} accurate')
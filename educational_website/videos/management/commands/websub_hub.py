@@ -0,0 +1,120 @@
+# videos/management/commands/websub_hub.py
+import hashlib
+import hmac
+import secrets
+import threading
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+ATOM_ENTRY = '''<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <title>YouTube video feed</title>
+  <entry>
+    <id>yt:video:{video_id}</id>
+    <yt:videoId>{video_id}</yt:videoId>
+    <yt:channelId>{channel_id}</yt:channelId>
+    <title>New video</title>
+    <link rel="alternate" href="https://www.youtube.com/watch?v={video_id}"/>
+    <published>{updated}</published>
+    <updated>{updated}</updated>
+  </entry>
+</feed>
+'''
+
+
+class StandInHub:
+    """In-memory WebSub hub: verifies subscriptions and delivers signed notifications."""
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        # topic -> {callback: secret}
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def verify(self, mode, topic, callback, secret, lease_seconds):
+        challenge = secrets.token_urlsafe(16)
+        query = urllib.parse.urlencode({'hub.mode': mode, 'hub.topic': topic, 'hub.challenge': challenge,
+                                        'hub.lease_seconds': lease_seconds})
+        separator = '&' if '?' in callback else '?'
+        try:
+            with urllib.request.urlopen(f'{callback}{separator}{query}', timeout=10) as response:
+                confirmed = response.status == 200 and response.read().decode() == challenge
+        except OSError as e:
+            self.stdout.write(f'Verification of {callback} failed: {e}')
+            return
+        if not confirmed:
+            self.stdout.write(f'{callback} did not confirm the {mode} of {topic}')
+            return
+        with self.lock:
+            if mode == 'subscribe':
+                self.subscriptions.setdefault(topic, {})[callback] = secret
+            else:
+                self.subscriptions.get(topic, {}).pop(callback, None)
+        self.stdout.write(f'{mode} of {callback} to {topic} verified')
+
+    def publish(self, topic, video_id):
+        channel_id = urllib.parse.parse_qs(urllib.parse.urlparse(topic).query).get('channel_id', [''])[0]
+        body = ATOM_ENTRY.format(video_id=video_id, channel_id=channel_id,
+                                 updated=timezone.now().isoformat()).encode()
+        with self.lock:
+            callbacks = dict(self.subscriptions.get(topic, {}))
+        for callback, secret in callbacks.items():
+            signature = hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+            request = urllib.request.Request(callback, data=body, method='POST', headers={
+                'Content-Type': 'application/atom+xml', 'X-Hub-Signature': f'sha1={signature}'})
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    self.stdout.write(f'Delivered {video_id} to {callback}: {response.status}')
+            except OSError as e:
+                self.stdout.write(f'Delivery of {video_id} to {callback} failed: {e}')
+        return len(callbacks)
+
+
+class Command(BaseCommand):
+    help = ('Run a local stand-in WebSub hub for tests: point WEBSUB_HUB_URL at it, then publish '
+            'with « curl -d hub.mode=publish -d hub.url=<topic> -d video_id=<id> http://HOST:PORT/ »')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        hub = StandInHub(self.stdout)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                form = {key: values[0] for key, values in
+                        urllib.parse.parse_qs(self.rfile.read(length).decode()).items()}
+                mode = form.get('hub.mode')
+                if mode in ('subscribe', 'unsubscribe') and form.get('hub.callback') and form.get('hub.topic'):
+                    # Verification happens after the 202, as with a real hub (hub.verify=async)
+                    self.send_response(202)
+                    self.end_headers()
+                    threading.Thread(target=hub.verify, args=(
+                        mode, form['hub.topic'], form['hub.callback'], form.get('hub.secret', ''),
+                        form.get('hub.lease_seconds', '86400'))).start()
+                elif mode == 'publish' and form.get('hub.url') and form.get('video_id'):
+                    delivered = hub.publish(form['hub.url'], form['video_id'])
+                    self.send_response(200)
+                    self.end_headers()
+                    self.wfile.write(f'delivered to {delivered} subscribers\n'.encode())
+                else:
+                    self.send_response(400)
+                    self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(f'Stand-in WebSub hub listening on http://{options["host"]}:{options["port"]}/')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
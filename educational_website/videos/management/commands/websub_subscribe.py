@@ -0,0 +1,64 @@
+# videos/management/commands/websub_subscribe.py
+import datetime
+from urllib.error import URLError
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from utils import websub
+from videos.models import ChannelSubscription
+
+
+class Command(BaseCommand):
+    help = 'Subscribe to the WebSub notifications of YouTube channels and renew expiring leases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('channel_ids', nargs='*', help='YouTube channel IDs to subscribe to')
+        parser.add_argument('--renew', action='store_true',
+                            help='Renew the subscriptions expiring within WEBSUB_RENEW_BEFORE seconds '
+                                 'and retry the unconfirmed or denied ones')
+        parser.add_argument('--unsubscribe', action='store_true', help='Unsubscribe the given channels')
+
+    def handle(self, *args, **options):
+        if options['unsubscribe']:
+            subscriptions = list(ChannelSubscription.objects.filter(channel_id__in=options['channel_ids']))
+            # The callback only confirms an unsubscription once the status says so
+            ChannelSubscription.objects.filter(pk__in=[s.pk for s in subscriptions]).update(status='unsubscribed')
+            self.request(subscriptions, 'unsubscribe')
+            return
+
+        subscriptions = []
+        for channel_id in options['channel_ids']:
+            subscription, created = ChannelSubscription.objects.get_or_create(channel_id=channel_id)
+            if not created and subscription.status in ('unsubscribed', 'denied'):
+                subscription.status = 'pending'
+                subscription.save(update_fields=['status'])
+            subscriptions.append(subscription)
+
+        if options['renew']:
+            deadline = timezone.now() + datetime.timedelta(seconds=settings.WEBSUB_RENEW_BEFORE)
+            # Denied ones are requested again: the callback only confirms pending subscriptions
+            ChannelSubscription.objects.filter(status='denied').update(status='pending')
+            subscriptions += ChannelSubscription.objects.filter(
+                Q(status='subscribed', lease_expires_at__lt=deadline) | Q(status='pending')
+            ).exclude(pk__in=[s.pk for s in subscriptions])
+
+        if not subscriptions:
+            self.stdout.write('Nothing to subscribe or renew')
+            return
+        self.request(subscriptions, 'subscribe')
+
+    def request(self, subscriptions, mode):
+        failed = 0
+        for subscription in subscriptions:
+            try:
+                status = websub.request_subscription(subscription, mode)
+            except (URLError, OSError) as e:
+                failed += 1
+                self.stderr.write(f'{subscription}: {e}')
+                continue
+            self.stdout.write(f'{mode} {subscription}: hub answered {status}, waiting for its verification')
+        if failed:
+            raise CommandError(f'{failed} of {len(subscriptions)} requests failed')
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['category', '-publish_date'], name='video_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['featured', '-publish_date'], name='video_featured_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['publish_date'], name='video_publish_date_idx'),
+        ),
+    ]
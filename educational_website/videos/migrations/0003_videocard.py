@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Substr
+
+
+def build_cards(apps, schema_editor):
+    Video = apps.get_model('videos', 'Video')
+    VideoCard = apps.get_model('videos', 'VideoCard')
+    fields = ['title', 'youtube_id', 'thumbnail_url', 'duration', 'publish_date',
+              'views_count', 'likes_count', 'featured', 'category_id', 'subcategory_id']
+
+    videos = (Video.objects.select_related('category')
+              .annotate(excerpt=Substr('description', 1, 300))
+              .defer('description').order_by())
+    batch = []
+    for video in videos.iterator(chunk_size=2000):
+        card = VideoCard(video_id=video.pk, excerpt=video.excerpt or '',
+                         category_name=video.category.name, category_slug=video.category.slug)
+        for field in fields:
+            setattr(card, field, getattr(video, field))
+        batch.append(card)
+        if len(batch) >= 2000:
+            VideoCard.objects.bulk_create(batch)
+            batch = []
+    VideoCard.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoCard',
+            fields=[
+                ('video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='videos.video')),
+                ('category_name', models.CharField(max_length=100)),
+                ('category_slug', models.SlugField(db_index=False)),
+                ('title', models.CharField(max_length=200)),
+                ('excerpt', models.CharField(blank=True, max_length=300)),
+                ('youtube_id', models.CharField(max_length=20)),
+                ('thumbnail_url', models.URLField()),
+                ('duration', models.DurationField(blank=True, null=True)),
+                ('publish_date', models.DateTimeField()),
+                ('views_count', models.IntegerField(default=0)),
+                ('likes_count', models.IntegerField(default=0)),
+                ('featured', models.BooleanField(default=False)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='video_cards', to='videos.category')),
+                ('subcategory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='video_cards', to='videos.subcategory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', '-publish_date'], name='card_category_date_idx'), models.Index(fields=['featured', '-publish_date'], name='card_featured_date_idx'), models.Index(fields=['-publish_date'], name='card_publish_date_idx')],
+            },
+        ),
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+    ]
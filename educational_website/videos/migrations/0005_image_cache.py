@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0004_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='icon_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='thumbnail_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='videocard',
+            name='thumbnail_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
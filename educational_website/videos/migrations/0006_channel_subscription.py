@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:36
+
+from django.db import migrations, models
+import videos.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0005_image_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel_id', models.CharField(max_length=30, unique=True)),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'En attente de vérification'), ('subscribed', 'Abonné'), ('unsubscribed', 'Désabonné'), ('denied', 'Refusé par le hub')], default='pending', max_length=20)),
+                ('secret', models.CharField(default=videos.models._websub_secret, editable=False, max_length=64)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('subscribed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_notification_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'lease_expires_at'], name='websub_lease_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_manual_subcategories(apps, schema_editor):
+    # Subcategories set before the classifier existed were chosen by hand: they are the training set
+    Video = apps.get_model('videos', 'Video')
+    Video.objects.filter(subcategory__isnull=False).update(subcategory_status='manual')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0006_channel_subscription'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubcategoryReview',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Sous-catégorie à vérifier',
+                'verbose_name_plural': 'Sous-catégories à vérifier',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('videos.video',),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='subcategory_confidence',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='subcategory_status',
+            field=models.CharField(blank=True, choices=[('', 'Non classée'), ('manual', 'Manuelle'), ('predicted', 'Prédite'), ('review', 'À vérifier')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='suggested_subcategory',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='suggested_videos', to='videos.subcategory'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['subcategory_status', 'subcategory_confidence'], name='video_subcat_review_idx'),
+        ),
+        migrations.RunPython(mark_manual_subcategories, migrations.RunPython.noop),
+    ]
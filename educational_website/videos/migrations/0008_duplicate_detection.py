@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0007_subcategory_classifier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoSignature',
+            fields=[
+                ('video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='videos.video')),
+                ('minhash', models.BinaryField()),
+                ('text_hash', models.CharField(max_length=40)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='videos.video'),
+        ),
+        migrations.CreateModel(
+            name='VideoSignatureBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signature_bands', to='videos.video')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key'], name='signature_band_key_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('status', models.CharField(choices=[('pending', 'À traiter'), ('merged', 'Fusionné'), ('hidden', 'Masqué'), ('dismissed', 'Pas un doublon')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('original', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='videos.video')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates', to='videos.video')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', '-similarity'], name='duplicate_status_idx')],
+                'unique_together': {('video', 'original')},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0008_duplicate_detection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transcript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(blank=True, max_length=10)),
+                ('source', models.CharField(max_length=500)),
+                ('file_hash', models.CharField(max_length=40)),
+                ('cue_count', models.PositiveIntegerField(default=0)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transcripts', to='videos.video')),
+            ],
+            options={
+                'unique_together': {('video', 'language')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TranscriptPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50)),
+                ('positions', models.BinaryField()),
+                ('count', models.PositiveIntegerField()),
+                ('transcript', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='videos.transcript')),
+            ],
+            options={
+                'unique_together': {('term', 'transcript')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TranscriptCue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('start', models.FloatField(help_text='Début en secondes')),
+                ('end', models.FloatField()),
+                ('text', models.TextField()),
+                ('transcript', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cues', to='videos.transcript')),
+            ],
+            options={
+                'unique_together': {('transcript', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0009_transcripts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='videocard',
+            index=models.Index(fields=['-views_count'], name='card_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videocard',
+            index=models.Index(fields=['-likes_count'], name='card_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videocard',
+            index=models.Index(fields=['duration'], name='card_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videocard',
+            index=models.Index(fields=['category', '-views_count'], name='card_category_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videocard',
+            index=models.Index(fields=['category', '-likes_count'], name='card_category_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videocard',
+            index=models.Index(fields=['category', 'duration'], name='card_category_duration_idx'),
+        ),
+    ]
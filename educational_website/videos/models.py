@@ -1,12 +1,26 @@
 # Create your models here.# videos/models.py
+import secrets
+
 from django.db import models
+from django.db.models.functions import Substr
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 from django.utils.text import slugify
+from utils.query_cache import CachingManager
+from utils.cache import invalidate
+from utils import cdn, images
+
+# Length of the description excerpt stored on video cards
+CARD_EXCERPT_LENGTH = 300
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     icon = models.ImageField(upload_to='category_icons/', blank=True)
     slug = models.SlugField(unique=True)
+    # Hash of the icon in the image cache (utils.images), set on upload
+    icon_hash = models.CharField(max_length=64, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -25,6 +39,8 @@ class Subcategory(models.Model):
     description = models.TextField(blank=True)
     slug = models.SlugField()
     
+    objects = CachingManager()
+    
     def __str__(self):
         return f"{self.name} ({self.category.name})"
     
@@ -33,20 +49,60 @@ class Subcategory(models.Model):
         verbose_name_plural = "Subcategories"
 
 class Video(models.Model):
+    SUBCATEGORY_STATUS_CHOICES = (
+        ('', 'Non classée'),
+        ('manual', 'Manuelle'),
+        ('predicted', 'Prédite'),
+        ('review', 'À vérifier'),
+    )
+
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='videos')
     subcategory = models.ForeignKey(Subcategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='videos')
+    # Classement automatique (utils.subcategories) : les sous-catégories manuelles servent
+    # d'exemples d'apprentissage, les prédictions peu sûres attendent une vérification
+    subcategory_status = models.CharField(max_length=10, choices=SUBCATEGORY_STATUS_CHOICES, default='', blank=True)
+    subcategory_confidence = models.FloatField(null=True, blank=True)
+    suggested_subcategory = models.ForeignKey(Subcategory, on_delete=models.SET_NULL, null=True, blank=True,
+                                              related_name='suggested_videos')
     title = models.CharField(max_length=200)
     description = models.TextField()
     youtube_id = models.CharField(max_length=20, unique=True)
     thumbnail_url = models.URLField()
+    # Hash of the locally cached thumbnail (utils.images), set by cache_thumbnails
+    thumbnail_hash = models.CharField(max_length=64, blank=True)
     duration = models.DurationField(null=True, blank=True)
     publish_date = models.DateTimeField()
     views_count = models.IntegerField(default=0)
     likes_count = models.IntegerField(default=0)
     featured = models.BooleanField(default=False)
+    # Doublon masqué (utils.duplicates) : plus de carte, la page redirige vers l'original
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='duplicates')
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.title
+    
+    class Meta:
+        indexes = [
+            # Listes par catégorie et vidéos mises en avant, triées par date
+            models.Index(fields=['category', '-publish_date'], name='video_category_date_idx'),
+            models.Index(fields=['featured', '-publish_date'], name='video_featured_date_idx'),
+            # Vidéos récentes et rafraîchissement des statistiques
+            models.Index(fields=['publish_date'], name='video_publish_date_idx'),
+            # Date de dernière modification des pages (requêtes conditionnelles)
+            models.Index(fields=['updated_at'], name='video_updated_idx'),
+            models.Index(fields=['category', 'updated_at'], name='video_category_updated_idx'),
+            # File de vérification des sous-catégories, par confiance croissante
+            models.Index(fields=['subcategory_status', 'subcategory_confidence'], name='video_subcat_review_idx'),
+        ]
+
+class SubcategoryReview(Video):
+    """Videos whose predicted subcategory needs a human check (admin review queue)."""
+    class Meta:
+        proxy = True
+        verbose_name = "Sous-catégorie à vérifier"
+        verbose_name_plural = "Sous-catégories à vérifier"
 
 class Resource(models.Model):
     video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='resources')
@@ -58,3 +114,288 @@ class Resource(models.Model):
     def __str__(self):
         return f"{self.title} ({self.file_type})"
 
+class VideoSignature(models.Model):
+    """MinHash signature of the title and description of a video (utils.minhash)."""
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    # NUM_PERM entiers 32 bits (512 octets)
+    minhash = models.BinaryField()
+    # Empreinte du texte signé : un texte inchangé n'est pas ré-indexé
+    text_hash = models.CharField(max_length=40)
+    computed_at = models.DateTimeField(auto_now=True)
+
+class VideoSignatureBand(models.Model):
+    """LSH key of one band of a video signature: videos sharing a key are duplicate candidates."""
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='signature_bands')
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key'], name='signature_band_key_idx'),
+        ]
+
+class DuplicateCandidate(models.Model):
+    """Pair of videos with near-identical texts, waiting for an admin decision."""
+    STATUS_CHOICES = (
+        ('pending', 'À traiter'),
+        ('merged', 'Fusionné'),
+        ('hidden', 'Masqué'),
+        ('dismissed', 'Pas un doublon'),
+    )
+
+    # video : la plus récente des deux ; original : celle qui est conservée
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='duplicate_candidates')
+    original = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='+')
+    similarity = models.FloatField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.video_id} ≈ {self.original_id}"
+
+    class Meta:
+        unique_together = ('video', 'original')
+        indexes = [
+            # File des doublons à traiter, les plus proches d'abord
+            models.Index(fields=['status', '-similarity'], name='duplicate_status_idx'),
+        ]
+
+class Transcript(models.Model):
+    """Caption track of a video, imported from a .vtt or .srt file by « manage.py index_transcripts »."""
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='transcripts')
+    language = models.CharField(max_length=10, blank=True)
+    source = models.CharField(max_length=500)
+    # Empreinte du fichier importé : un fichier inchangé n'est pas ré-indexé
+    file_hash = models.CharField(max_length=40)
+    cue_count = models.PositiveIntegerField(default=0)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.video_id} [{self.language or '?'}]"
+
+    class Meta:
+        unique_together = ('video', 'language')
+
+class TranscriptCue(models.Model):
+    """One caption of a transcript (the text shown under a search result)."""
+    transcript = models.ForeignKey(Transcript, on_delete=models.CASCADE, related_name='cues')
+    position = models.PositiveIntegerField()
+    start = models.FloatField(help_text="Début en secondes")
+    end = models.FloatField()
+    text = models.TextField()
+
+    class Meta:
+        unique_together = ('transcript', 'position')
+
+class TranscriptPosting(models.Model):
+    """
+    Inverted index entry: the cues of a transcript containing a term.
+
+    One row per (term, transcript) instead of one per occurrence keeps the
+    index a fraction of the size of the captions.
+    """
+    term = models.CharField(max_length=50)
+    transcript = models.ForeignKey(Transcript, on_delete=models.CASCADE, related_name='postings')
+    # Positions des cues contenant le terme : entiers 32 bits croissants (utils.transcripts)
+    positions = models.BinaryField()
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        # L'index unique (term, transcript) sert aussi aux recherches par terme
+        unique_together = ('term', 'transcript')
+
+def _websub_secret():
+    return secrets.token_hex(20)
+
+class ChannelSubscription(models.Model):
+    """
+    WebSub (PubSubHubbub) subscription to the upload feed of a YouTube channel.
+
+    The hub pushes an Atom entry to the callback URL of the subscription for
+    each new or updated video; leases expire and are renewed by
+    « manage.py websub_subscribe --renew ».
+    """
+    STATUS_CHOICES = (
+        ('pending', 'En attente de vérification'),
+        ('subscribed', 'Abonné'),
+        ('unsubscribed', 'Désabonné'),
+        ('denied', 'Refusé par le hub'),
+    )
+
+    channel_id = models.CharField(max_length=30, unique=True)
+    title = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Clé HMAC des notifications (en-tête X-Hub-Signature), transmise au hub à l'abonnement
+    secret = models.CharField(max_length=64, default=_websub_secret, editable=False)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    subscribed_at = models.DateTimeField(null=True, blank=True)
+    last_notification_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title or self.channel_id
+
+    @property
+    def topic(self):
+        return f"https://www.youtube.com/xml/feeds/videos.xml?channel_id={self.channel_id}"
+
+    class Meta:
+        indexes = [
+            # Renouvellement des abonnements qui expirent bientôt
+            models.Index(fields=['status', 'lease_expires_at'], name='websub_lease_idx'),
+        ]
+
+class VideoCardManager(models.Manager):
+    # Fields copied from Video (and its category) onto the card
+    COPIED_FIELDS = ['title', 'youtube_id', 'thumbnail_url', 'thumbnail_hash', 'duration', 'publish_date',
+                     'views_count', 'likes_count', 'featured']
+
+    def refresh(self, video_ids=None, chunk_size=2000):
+        """
+        Rebuild the cards of the given videos from the Video table.
+        
+        Videos hidden as duplicates (duplicate_of set) lose their card.
+
+        Parameters:
+        video_ids (iterable): Primary keys of the videos, or None for every video
+        chunk_size (int): Number of cards written per query
+
+        Returns:
+        int: Number of cards written
+        """
+        videos = (Video.objects
+                  .select_related('category')
+                  .annotate(excerpt=Substr('description', 1, CARD_EXCERPT_LENGTH))
+                  .defer('description', 'category__description')
+                  .order_by())
+        hidden = Video.objects.filter(duplicate_of__isnull=False)
+        if video_ids is not None:
+            video_ids = list(video_ids)
+            videos = videos.filter(pk__in=video_ids)
+            hidden = hidden.filter(pk__in=video_ids)
+        # Hidden duplicates have no card
+        self.filter(video__in=hidden).delete()
+        videos = videos.filter(duplicate_of__isnull=True)
+
+        written = 0
+        batch = []
+        for video in videos.iterator(chunk_size=chunk_size):
+            batch.append(self.model.from_video(video))
+            if len(batch) >= chunk_size:
+                written += self._upsert(batch)
+                batch = []
+        if batch:
+            written += self._upsert(batch)
+        return written
+
+    def _upsert(self, cards):
+        self.bulk_create(
+            cards,
+            update_conflicts=True,
+            unique_fields=['video'],
+            update_fields=self.COPIED_FIELDS + ['category', 'category_name', 'category_slug',
+                                                'subcategory', 'excerpt'],
+        )
+        return len(cards)
+
+class VideoCard(models.Model):
+    """
+    Compact read model of a video holding only what list pages display.
+
+    List pages (home, category, search, related videos) read these narrow rows
+    instead of full Video rows with their large description and a join on
+    Category. Cards are kept in sync by the signal handlers below; code that
+    writes videos with queryset.update() or bulk_create() must call
+    VideoCard.objects.refresh() itself.
+    """
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='video_cards')
+    category_name = models.CharField(max_length=100)
+    category_slug = models.SlugField(db_index=False)
+    subcategory = models.ForeignKey(Subcategory, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='video_cards')
+    title = models.CharField(max_length=200)
+    excerpt = models.CharField(max_length=CARD_EXCERPT_LENGTH, blank=True)
+    youtube_id = models.CharField(max_length=20)
+    thumbnail_url = models.URLField()
+    thumbnail_hash = models.CharField(max_length=64, blank=True)
+    duration = models.DurationField(null=True, blank=True)
+    publish_date = models.DateTimeField()
+    views_count = models.IntegerField(default=0)
+    likes_count = models.IntegerField(default=0)
+    featured = models.BooleanField(default=False)
+
+    objects = VideoCardManager()
+
+    def __str__(self):
+        return self.title
+
+    @classmethod
+    def from_video(cls, video):
+        """Build the card of a video (its category must be loaded or cheap to fetch)."""
+        card = cls(
+            video_id=video.pk,
+            category_id=video.category_id,
+            category_name=video.category.name,
+            category_slug=video.category.slug,
+            subcategory_id=video.subcategory_id,
+            excerpt=getattr(video, 'excerpt', None) or video.description[:CARD_EXCERPT_LENGTH],
+        )
+        for field in VideoCardManager.COPIED_FIELDS:
+            setattr(card, field, getattr(video, field))
+        return card
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', '-publish_date'], name='card_category_date_idx'),
+            models.Index(fields=['featured', '-publish_date'], name='card_featured_date_idx'),
+            models.Index(fields=['-publish_date'], name='card_publish_date_idx'),
+            # Tris des listes (core.forms.ListingFilterForm), sur tout le catalogue et par catégorie
+            models.Index(fields=['-views_count'], name='card_views_idx'),
+            models.Index(fields=['-likes_count'], name='card_likes_idx'),
+            models.Index(fields=['duration'], name='card_duration_idx'),
+            models.Index(fields=['category', '-views_count'], name='card_category_views_idx'),
+            models.Index(fields=['category', '-likes_count'], name='card_category_likes_idx'),
+            models.Index(fields=['category', 'duration'], name='card_category_duration_idx'),
+        ]
+
+@receiver(pre_save, sender=Category)
+def cache_category_icon(sender, instance, raw=False, **kwargs):
+    """Store a newly uploaded icon in the image cache (variants are built in the background)."""
+    if not raw:
+        digest = images.hash_upload(instance.icon)
+        if digest is not None:
+            instance.icon_hash = digest
+
+@receiver(post_save, sender=Video)
+def update_video_card(sender, instance, raw=False, **kwargs):
+    """Keep the card of a video in sync when the video is saved."""
+    if not raw:
+        VideoCard.objects.refresh([instance.pk])
+
+@receiver(post_save, sender=Category)
+def update_category_cards(sender, instance, created, raw=False, **kwargs):
+    """Propagate a category rename to the cards of its videos."""
+    if not created and not raw:
+        VideoCard.objects.filter(category=instance).update(
+            category_name=instance.name, category_slug=instance.slug)
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Category lists and counts are cached in the 'catalog' namespace."""
+    invalidate('catalog')
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def purge_video_pages(sender, instance, raw=False, **kwargs):
+    """Drop the pages showing a video from the CDN."""
+    if not raw:
+        cdn.purge(cdn.video_key(instance.pk), cdn.category_key(instance.category_id), 'catalog', 'search')
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_category_pages(sender, instance, raw=False, **kwargs):
+    """Category names appear on every catalog page."""
+    if not raw:
+        cdn.purge(cdn.category_key(instance.pk), 'catalog', 'search')
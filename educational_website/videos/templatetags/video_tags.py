@@ -0,0 +1,35 @@
+# videos/templatetags/video_tags.py
+from django import template
+
+register = template.Library()
+
+# Thumbnails published by YouTube for every video: name -> width in pixels.
+# mqdefault is 16:9; hqdefault and sddefault are 4:3 with black bars, which
+# object-fit: cover crops away.
+YOUTUBE_THUMBNAILS = {
+    'mqdefault': 320,
+    'hqdefault': 480,
+    'sddefault': 640,
+}
+
+
+@register.filter
+def youtube_thumbnail(youtube_id, name='mqdefault'):
+    """
+    URL of one of the thumbnails YouTube publishes for a video.
+
+    Usage: {{ video.youtube_id|youtube_thumbnail:'hqdefault' }}
+    """
+    return f'https://i.ytimg.com/vi/{youtube_id}/{name}.jpg'
+
+
+@register.filter
+def youtube_srcset(youtube_id):
+    """
+    srcset attribute listing the thumbnail sizes of a video, so the browser
+    downloads the smallest one covering the displayed width.
+
+    Usage: <img srcset="{{ video.youtube_id|youtube_srcset }}" sizes="...">
+    """
+    return ', '.join(f'{youtube_thumbnail(youtube_id, name)} {width}w'
+                     for name, width in YOUTUBE_THUMBNAILS.items())
@@ -1,3 +1,726 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import hmac
+import io
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import googleapiclient.discovery
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import Client, LiveServerTestCase, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
+from PIL import Image, UnidentifiedImageError
+
+from accounts.models import Bookmark
+from jobs.models import Job
+from utils import cdn, images
+from utils.cache import get_or_compute
+from utils.duplicates import index_videos, merge_duplicates
+from utils.catalog_snapshot import KEEP_VERSIONS, CatalogSnapshot, build_snapshot
+from utils.transcripts import index_transcript, search_transcripts
+from utils.youtube_api import fetch_channel_videos
+from utils.youtube_client import discovery_document, execute, load_checkpoint
+from videos.management.commands.websub_hub import ATOM_ENTRY, StandInHub
+from videos.models import (CARD_EXCERPT_LENGTH, Category, ChannelSubscription, DuplicateCandidate, Subcategory, Video,
+                           VideoCard)
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Pages rendered without collected static files (no manifest)
+PLAIN_STATIC_STORAGES = {**settings.STORAGES,
+                         'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+
+
+def notification(channel_id, video_id, updated='2024-01-01T00:00:00+00:00'):
+    return ATOM_ENTRY.format(video_id=video_id, channel_id=channel_id, updated=updated).encode()
+
+
+def signature(secret, body):
+    return 'sha1=' + hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WebSubHubTests(LiveServerTestCase):
+    """Handshake and delivery through the stand-in hub of « manage.py websub_hub »."""
+
+    def setUp(self):
+        self.subscription = ChannelSubscription.objects.create(channel_id='UCstandin')
+        self.hub = StandInHub(io.StringIO())
+        self.callback = self.live_server_url + reverse('websub_callback', args=[self.subscription.pk])
+
+    def test_subscription_is_verified(self):
+        self.hub.verify('subscribe', self.subscription.topic, self.callback, self.subscription.secret, '3600')
+
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'subscribed')
+        lease = self.subscription.lease_expires_at - self.subscription.subscribed_at
+        self.assertEqual(lease.total_seconds(), 3600)
+        self.assertIn(self.callback, self.hub.subscriptions[self.subscription.topic])
+
+    def test_unrequested_topic_is_not_confirmed(self):
+        topic = 'https://www.youtube.com/xml/feeds/videos.xml?channel_id=UCother'
+        self.hub.verify('subscribe', topic, self.callback, self.subscription.secret, '3600')
+
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'pending')
+        self.assertEqual(self.hub.subscriptions, {})
+
+    def test_published_video_is_fetched_in_background(self):
+        self.hub.verify('subscribe', self.subscription.topic, self.callback, self.subscription.secret, '3600')
+        self.assertEqual(self.hub.publish(self.subscription.topic, 'vid00000001'), 1)
+
+        job = Job.objects.get(name='videos.fetch_video')
+        self.assertEqual(job.kwargs, {'video_id': 'vid00000001'})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WebSubCallbackTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.subscription = ChannelSubscription.objects.create(channel_id='UCcallback', status='subscribed')
+        self.url = reverse('websub_callback', args=[self.subscription.pk])
+
+    def post(self, body, header=None):
+        return self.client.post(self.url, body, content_type='application/atom+xml',
+                                HTTP_X_HUB_SIGNATURE=header or signature(self.subscription.secret, body))
+
+    def test_invalid_lease_seconds_is_rejected(self):
+        for lease_seconds in ('soon', '-5'):
+            response = self.client.get(self.url, {'hub.mode': 'subscribe', 'hub.topic': self.subscription.topic,
+                                                  'hub.challenge': 'abc', 'hub.lease_seconds': lease_seconds})
+            self.assertEqual(response.status_code, 400)
+
+    def test_denial_needs_the_topic_of_a_requested_subscription(self):
+        response = self.client.get(self.url, {'hub.mode': 'denied'})
+        self.assertEqual(response.status_code, 404)
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'subscribed')
+
+        with self.assertLogs('videos.views', 'WARNING'):
+            response = self.client.get(self.url, {'hub.mode': 'denied', 'hub.topic': self.subscription.topic})
+        self.assertEqual(response.status_code, 200)
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'denied')
+
+    def test_denied_subscription_is_requested_again_on_renewal(self):
+        ChannelSubscription.objects.update(status='denied')
+        with mock.patch('utils.websub.request_subscription', return_value=202) as request_subscription:
+            call_command('websub_subscribe', '--renew', stdout=io.StringIO())
+        request_subscription.assert_called_once_with(self.subscription, 'subscribe')
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'pending')
+
+    def test_bad_signature_is_ignored(self):
+        body = notification(self.subscription.channel_id, 'vid00000002')
+        response = self.post(body, signature('not-the-secret', body))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Job.objects.exists())
+
+    def test_duplicate_delivery_is_fetched_once(self):
+        body = notification(self.subscription.channel_id, 'vid00000003')
+        self.assertEqual(self.post(body).status_code, 204)
+        # Already running: only the delivery cache recognizes the repeat
+        Job.objects.update(status='running')
+        self.assertEqual(self.post(body).status_code, 204)
+        self.assertEqual(Job.objects.filter(name='videos.fetch_video').count(), 1)
+
+        # A new version of the video is fetched again
+        self.post(notification(self.subscription.channel_id, 'vid00000003', '2024-01-02T00:00:00+00:00'))
+        self.assertEqual(Job.objects.filter(name='videos.fetch_video').count(), 2)
+
+    def test_other_channel_is_ignored(self):
+        self.post(notification('UCsomeoneelse', 'vid00000004'))
+        self.assertFalse(Job.objects.exists())
+
+
+def create_video(category, youtube_id, **fields):
+    fields.setdefault('title', f'Video {youtube_id}')
+    fields.setdefault('description', '')
+    fields.setdefault('publish_date', timezone.now())
+    return Video.objects.create(category=category, youtube_id=youtube_id,
+                                thumbnail_url=f'https://i.ytimg.com/vi/{youtube_id}/hqdefault.jpg', **fields)
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        override = override_settings(CATALOG_SNAPSHOT_DIR=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.maths = Category.objects.create(name='Maths', slug='maths')
+        self.physics = Category.objects.create(name='Physics', slug='physics')
+        now = timezone.now()
+        for i in range(25):
+            create_video(self.maths if i % 2 else self.physics, f'vid{i:08d}', views_count=i,
+                         publish_date=now - datetime.timedelta(days=i), featured=i % 5 == 0,
+                         duration=datetime.timedelta(minutes=i) if i else None)
+
+    def test_build_in_chunks_matches_the_cards(self):
+        snapshot = CatalogSnapshot(build_snapshot(chunk_size=4))
+
+        self.assertEqual(len(snapshot), 25)
+        self.assertEqual(snapshot.count(category=self.maths.pk), 12)
+        self.assertEqual(snapshot.count(featured=True), 5)
+        by_views = snapshot.query('-views_count', limit=3)
+        self.assertEqual([Video.objects.get(pk=pk).views_count for pk in by_views], [24, 23, 22])
+        newest = snapshot.query(category=self.physics.pk, limit=2)
+        self.assertEqual([Video.objects.get(pk=pk).youtube_id for pk in newest], ['vid00000000', 'vid00000002'])
+
+    def test_rebuild_swaps_current_and_prunes_old_versions(self):
+        for _ in range(KEEP_VERSIONS + 2):
+            version_dir = build_snapshot()
+        Video.objects.filter(youtube_id='vid00000001').delete()
+        version_dir = build_snapshot()
+
+        self.assertEqual(os.readlink(os.path.join(self.root, 'current')), version_dir.name)
+        self.assertEqual(len(CatalogSnapshot(version_dir)), 24)
+        versions = [name for name in os.listdir(self.root) if name.startswith('v')]
+        self.assertEqual(len(versions), KEEP_VERSIONS + 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SubcategoryReviewAdminTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Maths', slug='maths')
+        self.algebra = Subcategory.objects.create(category=category, name='Algebra', slug='algebra')
+        self.video = create_video(category, 'vid00000001', suggested_subcategory=self.algebra,
+                                  subcategory_status='review', subcategory_confidence=0.4)
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+
+    def test_accepted_suggestion_is_published(self):
+        get_or_compute('catalog', ('home',), lambda: 'old', ttl=60)
+        response = self.client.post(reverse('admin:videos_subcategoryreview_changelist'),
+                                    {'action': 'accept_suggestion', '_selected_action': [self.video.pk]})
+        self.assertEqual(response.status_code, 302)
+
+        self.video.refresh_from_db()
+        self.assertEqual((self.video.subcategory, self.video.subcategory_status), (self.algebra, 'manual'))
+        self.assertEqual(VideoCard.objects.get(video=self.video).subcategory_id, self.algebra.pk)
+        self.assertEqual(get_or_compute('catalog', ('home',), lambda: 'new', ttl=60), 'new')
+        self.assertTrue(Job.objects.filter(name='videos.publish_catalog', status='queued').exists())
+
+
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STATIC_STORAGES, CATALOG_SNAPSHOT_CHECK_INTERVAL=0)
+class CategoryViewTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(CATALOG_SNAPSHOT_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.maths = Category.objects.create(name='Maths', slug='maths')
+        now = timezone.now()
+        for i in range(15):
+            create_video(self.maths, f'vid{i:08d}', publish_date=now - datetime.timedelta(days=i))
+        self.client = Client(HTTP_HOST='localhost')
+        self.url = reverse('category_detail', args=['maths'])
+
+    def youtube_ids(self, response):
+        return [card.youtube_id for card in response.context['page_obj']]
+
+    def test_cards_are_paginated(self):
+        first = self.client.get(self.url)
+        # SiteConfiguration.videos_per_page: 12 by default
+        self.assertEqual(self.youtube_ids(first), [f'vid{i:08d}' for i in range(12)])
+        self.assertContains(first, 'Page 1 / 2')
+        # The card template no longer sends its HTML comments once per card
+        self.assertNotContains(first, 'eager=True')
+        second = self.client.get(self.url, {'page': 2})
+        self.assertEqual(self.youtube_ids(second), [f'vid{i:08d}' for i in range(12, 15)])
+
+    def test_pages_come_from_the_snapshot(self):
+        build_snapshot()
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count, 15)
+        self.assertEqual(self.youtube_ids(response), [f'vid{i:08d}' for i in range(12, 15)])
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VideoAdminTests(TestCase):
+    def setUp(self):
+        self.maths = Category.objects.create(name='Maths', slug='maths')
+        self.physics = Category.objects.create(name='Physics', slug='physics')
+        self.videos = [create_video(self.maths, f'vid{i:08d}') for i in range(3)]
+        self.admin = site._registry[Video]
+        self.request = RequestFactory().post('/')
+        self.request.user = User.objects.create_superuser('admin', password='secret')
+        get_or_compute('catalog', ('home',), lambda: 'old', ttl=60)
+
+    def assertPublished(self, purge, *keys):
+        self.assertEqual(get_or_compute('catalog', ('home',), lambda: 'new', ttl=60), 'new')
+        self.assertTrue(Job.objects.filter(name='videos.publish_catalog', status='queued').exists())
+        purged = {key for call in purge.call_args_list for key in call.args}
+        self.assertTrue(set(keys) <= purged, purged)
+
+    def test_single_edit_is_published(self):
+        video = self.videos[0]
+        form = self.admin.get_form(self.request, video)(instance=video)
+        video.category, video.featured = self.physics, True
+        with mock.patch.object(cdn, 'purge') as purge:
+            self.admin.save_model(self.request, video, form, True)
+        self.assertPublished(purge, cdn.video_key(video.pk), cdn.category_key(self.maths.pk),
+                             cdn.category_key(self.physics.pk))
+        self.assertTrue(VideoCard.objects.get(video=video).featured)
+
+    def test_deletions_are_published(self):
+        first, *others = self.videos
+        first_pk = first.pk
+        with mock.patch.object(cdn, 'purge') as purge:
+            self.admin.delete_model(self.request, first)
+        self.assertPublished(purge, cdn.video_key(first_pk), cdn.category_key(self.maths.pk))
+
+        Job.objects.all().delete()
+        get_or_compute('catalog', ('home',), lambda: 'old', ttl=60)
+        with mock.patch.object(cdn, 'purge') as purge:
+            self.admin.delete_queryset(self.request, Video.objects.filter(pk__in=[video.pk for video in others]))
+        self.assertPublished(purge, *[cdn.video_key(video.pk) for video in others])
+        self.assertFalse(VideoCard.objects.exists())
+
+DESCRIPTION = ('In this lesson we derive the quadratic formula by completing the square, then solve several '
+               'exercises with real and complex roots and discuss the sign of the discriminant.')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, DUPLICATE_SIMILARITY_THRESHOLD=0.8)
+class DuplicateTests(TestCase):
+    def setUp(self):
+        self.maths = Category.objects.create(name='Maths', slug='maths')
+        now = timezone.now()
+        self.original = create_video(self.maths, 'vid00000001', title='The quadratic formula',
+                                     description=DESCRIPTION, publish_date=now - datetime.timedelta(days=30))
+        self.reupload = create_video(self.maths, 'vid00000002', title='The quadratic formula (re-upload)',
+                                     description=DESCRIPTION, publish_date=now)
+        self.other = create_video(self.maths, 'vid00000003', title='Vectors in the plane',
+                                  description='Adding vectors, scalar product and the angle between two vectors.')
+        VideoCard.objects.refresh([self.original.pk, self.reupload.pk, self.other.pk])
+
+    def test_reupload_is_paired_with_the_older_original(self):
+        self.assertEqual(index_videos(), {'indexed': 3, 'candidates': 1})
+        candidate = DuplicateCandidate.objects.get()
+        self.assertEqual((candidate.video, candidate.original), (self.reupload, self.original))
+        self.assertGreaterEqual(candidate.similarity, 0.8)
+
+        # Incremental: unchanged texts are not signed again
+        self.assertEqual(index_videos(), {'indexed': 0, 'candidates': 0})
+
+    def test_merge_moves_bookmarks_and_hides_the_duplicate(self):
+        index_videos()
+        user = User.objects.create_user('learner')
+        Bookmark.objects.create(user=user, video=self.reupload)
+
+        self.assertEqual(merge_duplicates(DuplicateCandidate.objects.all()), {self.reupload.pk: self.original.pk})
+        self.reupload.refresh_from_db()
+        self.assertEqual(self.reupload.duplicate_of, self.original)
+        self.assertEqual(list(Bookmark.objects.values_list('video_id', flat=True)), [self.original.pk])
+        self.assertFalse(VideoCard.objects.filter(video=self.reupload).exists())
+        self.assertEqual(DuplicateCandidate.objects.get().status, 'merged')
+        self.assertTrue(Job.objects.filter(name='videos.publish_catalog', status='queued').exists())
+
+
+CAPTIONS = """WEBVTT
+
+00:00:01.000 --> 00:00:04.000
+Today we study the derivative.
+
+00:00:04.000 --> 00:00:08.000
+First an example with a polynomial.
+
+00:01:05.000 --> 00:01:09.000
+The chain rule gives the derivative of a composition.
+
+00:02:00.000 --> 00:02:04.000
+Integration comes next week.
+
+00:02:04.000 --> 00:02:08.000
+Thank you for watching, see you soon.
+
+00:02:08.000 --> 00:02:12.000
+Remember the polynomial exercises.
+"""
+
+
+@override_settings(CACHES=LOCMEM_CACHES, TRANSCRIPT_MATCH_WINDOW=1)
+class TranscriptSearchTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'vid00000001.vtt')
+        with open(path, 'w') as f:
+            f.write(CAPTIONS)
+        self.video = create_video(Category.objects.create(name='Maths', slug='maths'), 'vid00000001')
+        self.transcript = index_transcript(self.video.pk, path)
+
+    def test_moments_of_the_terms_are_found(self):
+        self.assertEqual(self.transcript.cue_count, 6)
+        [result] = search_transcripts('derivative')
+        self.assertEqual(result['video_id'], self.video.pk)
+        self.assertEqual([moment['label'] for moment in result['moments']], ['0:01', '1:05'])
+
+    def test_every_term_must_be_said_close_together(self):
+        [result] = search_transcripts('chain rule derivative')
+        self.assertEqual([moment['start'] for moment in result['moments']], [65])
+        # Both terms are said, but several cues apart
+        self.assertEqual(search_transcripts('watching derivative'), [])
+        self.assertEqual(search_transcripts('derivative calculus'), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecategorizeVideosTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(CATALOG_SNAPSHOT_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.entertainment = Category.objects.create(name='Entertainment', slug='entertainment')
+        self.music = Subcategory.objects.create(category=self.entertainment, name='Music', slug='music')
+        self.video = create_video(self.entertainment, 'vid00000001', title='Python programming: Django tutorial',
+                                  subcategory=self.music, suggested_subcategory=self.music,
+                                  subcategory_status='predicted', subcategory_confidence=0.9)
+        self.kept = create_video(self.entertainment, 'vid00000002', title='Funny comedy music', subcategory=self.music)
+
+    def test_moved_videos_lose_the_subcategories_of_their_old_category(self):
+        call_command('recategorize_videos', '--workers', '1', stdout=io.StringIO())
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.category.name, 'Programming')
+        self.assertEqual((self.video.subcategory, self.video.suggested_subcategory, self.video.subcategory_status,
+                          self.video.subcategory_confidence), (None, None, '', None))
+        card = VideoCard.objects.get(video=self.video)
+        self.assertEqual((card.category_id, card.category_slug, card.subcategory), (self.video.category_id,
+                                                                                    self.video.category.slug, None))
+        self.kept.refresh_from_db()
+        self.assertEqual((self.kept.category, self.kept.subcategory), (self.entertainment, self.music))
+
+    def test_dry_run_changes_nothing(self):
+        out = io.StringIO()
+        call_command('recategorize_videos', '--workers', '1', '--dry-run', stdout=out)
+        self.assertIn('Entertainment -> Programming: 1', out.getvalue())
+        self.video.refresh_from_db()
+        self.assertEqual((self.video.category, self.video.subcategory), (self.entertainment, self.music))
+
+
+def image_bytes(size, image_format='PNG', mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'red').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, IMAGE_VARIANT_WIDTHS=(320, 640))
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(MEDIA_ROOT=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_originals_are_stored_once_by_content(self):
+        data = image_bytes((800, 450))
+        digest = images.store_original(data)
+        self.assertEqual(digest, hashlib.sha256(data).hexdigest())
+        self.assertEqual(images.store_original(data), digest)
+        self.assertEqual((images.image_dir(digest) / images.ORIGINAL).read_bytes(), data)
+        self.assertFalse(images.image_dir(digest, private=True).exists())
+        with self.assertRaises(UnidentifiedImageError):
+            images.store_original(b'<html>not an image</html>')
+
+    def test_variants_are_resized_without_upscaling(self):
+        digest = images.store_original(image_bytes((480, 270), mode='RGBA'))
+        self.assertTrue(images.missing_variants(digest))
+        self.assertEqual(images.generate_variants(digest), 4)
+        self.assertFalse(images.missing_variants(digest))
+        sizes = {}
+        for name in ('320.webp', '320.jpg', '640.webp', '640.jpg'):
+            with Image.open(images.image_dir(digest) / name) as image:
+                sizes[name] = (image.format, image.size)
+        self.assertEqual(sizes, {'320.webp': ('WEBP', (320, 180)), '320.jpg': ('JPEG', (320, 180)),
+                                 '640.webp': ('WEBP', (480, 270)), '640.jpg': ('JPEG', (480, 270))})
+
+        # Existing variants are kept
+        os.remove(images.image_dir(digest) / '640.jpg')
+        self.assertEqual(images.generate_variants(digest), 1)
+        self.assertEqual(images.srcset(digest, 'webp'),
+                         f'/media/images/{digest[:2]}/{digest}/320.webp 320w, '
+                         f'/media/images/{digest[:2]}/{digest}/640.webp 640w')
+
+    def test_cache_thumbnails_offline_links_cached_images(self):
+        category = Category.objects.create(name='Maths', slug='maths')
+        cached, missing = create_video(category, 'vid00000001'), create_video(category, 'vid00000002')
+        digest = images.store_original(image_bytes((640, 360), 'JPEG'))
+        index_path = images._url_index_path(cached.thumbnail_url)
+        index_path.parent.mkdir(parents=True)
+        index_path.write_text(digest)
+
+        out = io.StringIO()
+        call_command('cache_thumbnails', '--offline', '--workers', '1', stdout=out, stderr=io.StringIO())
+        self.assertIn('1 videos linked to a thumbnail from the local cache', out.getvalue())
+        self.assertIn('Generated 4 variant files for 1 images', out.getvalue())
+        cached.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual((cached.thumbnail_hash, missing.thumbnail_hash), (digest, ''))
+        self.assertEqual(VideoCard.objects.get(video=cached).thumbnail_hash, digest)
+        self.assertFalse(images.missing_variants(digest))
+
+
+class RecordingHttp(HttpMockSequence):
+    """HttpMockSequence keeping the URI and headers of each request."""
+
+    def __init__(self, responses):
+        super().__init__([({'status': str(status)}, json.dumps(body)) for status, body in responses])
+        self.requests = []
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        self.requests.append((uri, dict(headers or {})))
+        return super().request(uri, method, body, headers, **kwargs)
+
+
+def api_error(reason):
+    return {'error': {'errors': [{'reason': reason}], 'code': 403, 'message': reason}}
+
+
+def playlist_page(video_id, next_page=None):
+    page = {'items': [{'snippet': {'title': f'Python tutorial {video_id}', 'description': 'Learn programming',
+                                   'publishedAt': '2024-01-01T00:00:00Z', 'thumbnails': {}},
+                       'contentDetails': {'videoId': video_id}}], 'pageInfo': {'totalResults': 2}}
+    if next_page:
+        page['nextPageToken'] = next_page
+    return page
+
+
+def video_details(video_id):
+    return {'items': [{'id': video_id, 'contentDetails': {'duration': 'PT4M13S'}, 'statistics': {'viewCount': '7'}}]}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, YOUTUBE_MAX_RETRIES=2)
+class YouTubeClientTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(YOUTUBE_CACHE_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch('utils.youtube_client.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def service(self, *responses):
+        self.http = RecordingHttp(responses)
+        return googleapiclient.discovery.build_from_document(discovery_document(), developerKey='key', http=self.http)
+
+    def test_rate_limits_and_server_errors_are_retried(self):
+        youtube = self.service((403, api_error('rateLimitExceeded')), (503, {}), (200, {'items': []}))
+        with self.assertLogs('utils.youtube_client', 'WARNING') as logs:
+            self.assertEqual(execute(youtube.videos().list(part='id', id='a'), 'videos.list'), {'items': []})
+        self.assertEqual(len(self.http.requests), 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertIn('403 rateLimitExceeded', logs.output[0])
+        # The request URI carries the API key
+        self.assertNotIn('key', ''.join(logs.output))
+
+    def test_quota_and_exhausted_retries_are_raised(self):
+        youtube = self.service((403, api_error('quotaExceeded')))
+        with self.assertRaises(HttpError):
+            execute(youtube.videos().list(part='id', id='a'), 'videos.list')
+        self.assertEqual(len(self.http.requests), 1)
+
+        youtube = self.service((500, {}), (500, {}), (500, {}))
+        with self.assertLogs('utils.youtube_client', 'WARNING'), self.assertRaises(HttpError):
+            execute(youtube.videos().list(part='id', id='a'), 'videos.list')
+        self.assertEqual(len(self.http.requests), 3)
+
+    def test_unchanged_response_comes_from_the_etag_cache(self):
+        body = {'etag': 'abc', 'items': [{'id': 'a'}]}
+        youtube = self.service((200, body), (304, {}))
+        self.assertEqual(execute(youtube.videos().list(part='id', id='a'), 'videos.list'), body)
+        self.assertEqual(execute(youtube.videos().list(part='id', id='a'), 'videos.list'), body)
+        self.assertNotIn('if-none-match', {name.lower() for name in self.http.requests[0][1]})
+        self.assertEqual({name.lower(): value for name, value in self.http.requests[1][1].items()}['if-none-match'],
+                         'abc')
+
+    def test_interrupted_import_resumes_at_the_failed_page(self):
+        youtube = self.service(
+            (200, {'items': [{'contentDetails': {'relatedPlaylists': {'uploads': 'UUchannel'}}}]}),
+            (200, playlist_page('vid00000001', next_page='page2')), (200, video_details('vid00000001')),
+            (404, api_error('playlistNotFound')))
+        with mock.patch('utils.youtube_api.get_service', return_value=youtube), self.assertRaises(HttpError):
+            fetch_channel_videos('UCchannel')
+        self.assertEqual(list(Video.objects.values_list('youtube_id', flat=True)), ['vid00000001'])
+        self.assertEqual(load_checkpoint('channel:UCchannel'),
+                         {'playlist_id': 'UUchannel', 'page_token': 'page2', 'processed': 1})
+
+        youtube = self.service((200, playlist_page('vid00000002')), (200, video_details('vid00000002')))
+        with mock.patch('utils.youtube_api.get_service', return_value=youtube):
+            self.assertEqual(fetch_channel_videos('UCchannel'), 2)
+        self.assertIn('pageToken=page2', self.http.requests[0][0])
+        self.assertEqual(Video.objects.count(), 2)
+        self.assertEqual(Video.objects.get(youtube_id='vid00000002').category.name, 'Programming')
+        self.assertIsNone(load_checkpoint('channel:UCchannel'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VideoCardTests(TestCase):
+    def setUp(self):
+        self.maths = Category.objects.create(name='Maths', slug='maths')
+        self.video = create_video(self.maths, 'vid00000001', description='x' * 1000, views_count=3)
+
+    def test_cards_follow_saves_renames_and_deletes(self):
+        card = VideoCard.objects.get(video=self.video)
+        self.assertEqual((card.title, card.category_name, card.category_slug, card.views_count),
+                         ('Video vid00000001', 'Maths', 'maths', 3))
+        self.assertEqual(card.excerpt, 'x' * CARD_EXCERPT_LENGTH)
+
+        self.video.title = 'Renamed'
+        self.video.save()
+        self.maths.name, self.maths.slug = 'Mathematics', 'mathematics'
+        self.maths.save()
+        card.refresh_from_db()
+        self.assertEqual((card.title, card.category_name, card.category_slug),
+                         ('Renamed', 'Mathematics', 'mathematics'))
+
+        self.video.delete()
+        self.assertFalse(VideoCard.objects.exists())
+
+    def test_refresh_after_bulk_writes(self):
+        Video.objects.filter(pk=self.video.pk).update(views_count=42)
+        other = create_video(self.maths, 'vid00000002')
+        Video.objects.filter(pk=other.pk).update(duplicate_of=self.video)
+        self.assertEqual(VideoCard.objects.get(video=self.video).views_count, 3)
+
+        out = io.StringIO()
+        call_command('rebuild_video_cards', '--chunk-size', '1', stdout=out)
+        self.assertIn('Rebuilt 1 video cards', out.getvalue())
+        self.assertEqual(VideoCard.objects.get(video=self.video).views_count, 42)
+        # Hidden duplicates lose their card
+        self.assertFalse(VideoCard.objects.filter(video=other).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STATIC_STORAGES)
+class HttpCacheTests(TestCase):
+    def setUp(self):
+        self.maths = Category.objects.create(name='Maths', slug='maths')
+        self.video = create_video(self.maths, 'vid00000001')
+        self.url = reverse('video_detail', args=[self.video.pk])
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_anonymous_page_is_public_and_revalidated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response['Cache-Control'].split(', ')),
+                         {'public', 'max-age=60', 's-maxage=300', 'stale-while-revalidate=600'})
+        self.assertEqual(response['Surrogate-Key'], f'site video-{self.video.pk} category-{self.maths.pk}')
+        self.assertIn('Cookie', response['Vary'])
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertIn('s-maxage=300', not_modified['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        # A change of any video of the category changes the page (latest videos)
+        create_video(self.maths, 'vid00000002')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_logged_in_page_is_private(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(User.objects.create_user('learner'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response['Cache-Control'].split(', ')), {'private', 'no-cache'})
+        self.assertNotIn('Surrogate-Key', response)
+
+    @override_settings(CDN_PURGE_URL='https://cdn.example.com/purge')
+    def test_saves_purge_the_pages_showing_the_video(self):
+        with mock.patch('utils.cdn.send_purge') as send_purge, self.captureOnCommitCallbacks(execute=True):
+            self.video.title = 'Renamed'
+            self.video.save()
+        purged = {key for call in send_purge.call_args_list for key in call.args[0]}
+        self.assertTrue({f'video-{self.video.pk}', f'category-{self.maths.pk}'} <= purged)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STATIC_STORAGES)
+class YouTubeFacadeTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Maths', slug='maths')
+        self.video = create_video(category, 'vid00000001', title='Fractions & ratios')
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_detail_page_loads_no_iframe(self):
+        response = self.client.get(reverse('video_detail', args=[self.video.pk]))
+        self.assertNotContains(response, '<iframe')
+        self.assertContains(response, 'data-youtube-id="vid00000001" data-title="Fractions &amp; ratios"')
+        # Without JavaScript the play link opens the video on YouTube
+        self.assertContains(response, 'href="https://www.youtube.com/watch?v=vid00000001"')
+        self.assertContains(response, 'srcset="https://i.ytimg.com/vi/vid00000001/mqdefault.jpg 320w, '
+                                      'https://i.ytimg.com/vi/vid00000001/hqdefault.jpg 480w, '
+                                      'https://i.ytimg.com/vi/vid00000001/sddefault.jpg 640w"')
+        self.assertContains(response, 'src="/static/videos/js/video.js" defer')
+
+    def test_cached_thumbnail_is_served_locally(self):
+        Video.objects.filter(pk=self.video.pk).update(thumbnail_hash='ab' * 32)
+        response = self.client.get(reverse('video_detail', args=[self.video.pk]))
+        self.assertContains(response, '<picture><source type="image/webp"')
+        self.assertContains(response, f'/media/images/ab/{"ab" * 32}/320.jpg')
+        self.assertNotContains(response, 'i.ytimg.com/vi/vid00000001/hqdefault.jpg"')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImportDumpTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        override = override_settings(YOUTUBE_CACHE_DIR=self.root,
+                                     CATALOG_SNAPSHOT_DIR=os.path.join(self.root, 'catalog'))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.dump = os.path.join(self.root, 'channel.jsonl.gz')
+
+    def import_videos(self, *args):
+        out = io.StringIO()
+        call_command('import_youtube_videos', *args, '--skip-thumbnails', stdout=out)
+        return out.getvalue()
+
+    def test_recorded_import_is_replayed_offline(self):
+        page = playlist_page('vid00000001')
+        # vid00000002 is private: listed in the playlist, missing from videos.list
+        page['items'].append({**page['items'][0], 'contentDetails': {'videoId': 'vid00000002'}})
+        http = RecordingHttp([
+            (200, {'items': [{'contentDetails': {'relatedPlaylists': {'uploads': 'UUchannel'}}}]}),
+            (200, page), (200, video_details('vid00000001')),
+        ])
+        youtube = googleapiclient.discovery.build_from_document(discovery_document(), developerKey='key', http=http)
+        with mock.patch('utils.youtube_api.get_service', return_value=youtube):
+            out = self.import_videos('UCchannel', '--record', self.dump)
+        self.assertIn('Recorded 2 API responses', out)
+        recorded = list(Video.objects.values_list('youtube_id', 'title', 'duration', 'views_count'))
+        self.assertEqual([row[0] for row in recorded], ['vid00000001'])
+
+        Video.objects.all().delete()
+        with mock.patch('utils.youtube_api.get_service', side_effect=AssertionError('no API call')):
+            out = self.import_videos('--from-dump', self.dump, '--chunk-size', '1')
+        self.assertIn('Imported 1 videos', out)
+        self.assertEqual(list(Video.objects.values_list('youtube_id', 'title', 'duration', 'views_count')), recorded)
+        self.assertEqual(VideoCard.objects.count(), 1)
+
+    def test_unreadable_dump_is_reported(self):
+        with open(os.path.join(self.root, 'broken.jsonl'), 'w') as f:
+            f.write('{"operation": "videos.list", "response": {}}\nnot json\n')
+        with self.assertRaisesMessage(CommandError, 'broken.jsonl:2: invalid JSON'):
+            self.import_videos('--from-dump', os.path.join(self.root, 'broken.jsonl'))
+        with self.assertRaisesMessage(CommandError, '--record only applies to live imports'):
+            self.import_videos('--from-dump', self.dump, '--record', self.dump)
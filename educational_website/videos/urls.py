@@ -6,5 +6,7 @@ urlpatterns = [
     path('', views.HomeView.as_view(), name='home'),
     path('category/<slug:slug>/', views.CategoryView.as_view(), name='category_detail'),
     path('video/<int:pk>/', views.VideoDetailView.as_view(), name='video_detail'),
+    path('import/', views.import_videos, name='import_videos'),
+    path('websub/<int:pk>/', views.websub_callback, name='websub_callback'),
     # Additional URL patterns
 ]
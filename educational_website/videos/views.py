@@ -1,45 +1,178 @@
 # videos/views.py
-from django.shortcuts import render, get_object_or_404
-from django.views.generic import ListView, DetailView
-from .models import Category, Video
-# videos/views.py
-from django.shortcuts import render, redirect
+import datetime
+import logging
+from django.conf import settings
 from django.contrib import messages
-from utils.youtube_api import fetch_channel_videos
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse
+from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.html import format_html
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from django.views.generic import ListView, DetailView
+from .models import Category, ChannelSubscription, Video, VideoCard
+from core.views import get_site_config
+from jobs.models import Job
+from jobs.registry import enqueue
+from utils.http_cache import cache_policy, latest_change, most_recent
+from utils import cdn, websub
+from utils.catalog_snapshot import listing as catalog_listing
 
+logger = logging.getLogger(__name__)
 
+
+@staff_member_required
 def import_videos(request):
+    """Queue the import of a channel; the admin follows its progress on the job page."""
     if request.method == 'POST':
-        channel_id = request.POST.get('channel_id')
+        channel_id = request.POST.get('channel_id', '').strip()
+        if not channel_id:
+            messages.error(request, 'Error importing videos: no channel ID given')
+            return redirect('admin:videos_video_changelist')
 
-        try:
-            count = fetch_channel_videos(channel_id)
-            messages.success(request, f'Successfully imported {count} videos from YouTube')
-        except Exception as e:
-            messages.error(request, f'Error importing videos: {str(e)}')
+        job = enqueue('videos.import_channel', created_by=request.user, channel_id=channel_id)
+        url = reverse('admin:jobs_job_change', args=[job.pk])
+        messages.success(request, format_html('Import of channel {} queued: <a href="{}">follow job #{}</a>',
+                                              channel_id, url, job.pk))
+        return redirect(url)
 
     return redirect('admin:videos_video_changelist')
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def websub_callback(request, pk):
+    """
+    WebSub callback of a channel subscription.
+
+    GET: the hub verifies a (un)subscription we requested.
+    POST: the hub pushes an Atom entry for new or updated videos; each video
+    is fetched by a background job (duplicate deliveries are dropped).
+    """
+    subscription = get_object_or_404(ChannelSubscription, pk=pk)
+
+    if request.method == 'GET':
+        mode = request.GET.get('hub.mode')
+        # Only confirm intents we actually have for this topic (a denial answers a subscription or renewal)
+        expected = {'subscribe': ('pending', 'subscribed'), 'denied': ('pending', 'subscribed'),
+                    'unsubscribe': ('unsubscribed',)}
+        if request.GET.get('hub.topic') != subscription.topic or subscription.status not in expected.get(mode, ()):
+            raise Http404
+        if mode == 'denied':
+            logger.warning('WebSub hub denied %s: %s', subscription, request.GET.get('hub.reason', ''))
+            subscription.status = 'denied'
+            subscription.save(update_fields=['status'])
+            return HttpResponse(status=200)
+        if mode == 'subscribe':
+            try:
+                lease_seconds = int(request.GET.get('hub.lease_seconds') or settings.WEBSUB_LEASE_SECONDS)
+            except ValueError:
+                return HttpResponse(status=400)
+            if lease_seconds <= 0:
+                return HttpResponse(status=400)
+            subscription.status = 'subscribed'
+            subscription.subscribed_at = timezone.now()
+            subscription.lease_expires_at = subscription.subscribed_at + datetime.timedelta(seconds=lease_seconds)
+            subscription.save(update_fields=['status', 'subscribed_at', 'lease_expires_at'])
+        return HttpResponse(request.GET.get('hub.challenge', ''), content_type='text/plain')
+
+    # Always acknowledge (2xx) so the hub does not retry messages we ignore
+    if subscription.status != 'subscribed':
+        return HttpResponse(status=202)
+    if not websub.valid_signature(subscription.secret, request.body, request.headers.get('X-Hub-Signature')):
+        logger.warning('Ignored WebSub notification with a bad signature for %s', subscription)
+        return HttpResponse(status=202)
+    try:
+        entries, deleted = websub.parse_notification(request.body)
+    except ValueError:
+        return HttpResponse(status=400)
+
+    for video_id, channel_id, updated in entries:
+        if channel_id and channel_id != subscription.channel_id:
+            continue
+        # The hub may deliver the same entry several times: one fetch per version of the video
+        if not cache.add(f'websub:{video_id}:{updated}', 1, settings.WEBSUB_DEDUPE_TTL):
+            continue
+        if Job.objects.filter(name='videos.fetch_video', status='queued', kwargs__video_id=video_id).exists():
+            continue
+        enqueue('videos.fetch_video', video_id=video_id)
+    for video_id in deleted:
+        logger.info('YouTube video %s of %s was deleted', video_id, subscription)
+
+    ChannelSubscription.objects.filter(pk=pk).update(last_notification_at=timezone.now())
+    return HttpResponse(status=204)
+
+
+def category_changed(request, slug):
+    return most_recent(
+        latest_change(Category.objects.filter(slug=slug)),
+        latest_change(Video.objects.filter(category__slug=slug)),
+    )
+
+
+def category_keys(request, slug):
+    return [cdn.category_key(pk) for pk in Category.objects.filter(slug=slug).values_list('pk', flat=True)]
+
+
+def video_changed(request, pk):
+    """The detail page also lists the latest videos of the same category."""
+    category_id = Video.objects.filter(pk=pk).values_list('category_id', flat=True).first()
+    if category_id is None:
+        return None
+    return most_recent(
+        latest_change(Category.objects.filter(pk=category_id)),
+        latest_change(Video.objects.filter(category_id=category_id)),
+    )
+
+
+def video_keys(request, pk):
+    category_ids = Video.objects.filter(pk=pk).values_list('category_id', flat=True)
+    return [cdn.video_key(pk)] + [cdn.category_key(category_id) for category_id in category_ids]
+
+
+@method_decorator(cache_policy('catalog', last_modified=lambda request: latest_change(Category.objects.all()),
+                               surrogate_keys=lambda request: ['catalog']), name='dispatch')
 class HomeView(ListView):
     model = Category
     template_name = 'videos/home.html'
     context_object_name = 'categories'
 
+@method_decorator(cache_policy('catalog', last_modified=category_changed, surrogate_keys=category_keys),
+                  name='dispatch')
 class CategoryView(DetailView):
     model = Category
     template_name = 'videos/category.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['videos'] = self.object.videos.all().order_by('-publish_date')
+        # Paginée comme core.views.category_page, depuis le snapshot du catalogue s'il existe
+        videos = catalog_listing(VideoCard.objects.filter(category=self.object).order_by('-publish_date'),
+                                 category=self.object.pk)
+        paginator = Paginator(videos, get_site_config().videos_per_page)
+        context['page_obj'] = paginator.get_page(self.request.GET.get('page'))
         return context
 
+@method_decorator(cache_policy('catalog', last_modified=video_changed, surrogate_keys=video_keys),
+                  name='dispatch')
 class VideoDetailView(DetailView):
     model = Video
     template_name = 'videos/video_detail.html'
     
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        # Doublon masqué : la page de l'original fait foi
+        if self.object.duplicate_of_id:
+            return redirect('video_detail', pk=self.object.duplicate_of_id, permanent=True)
+        return self.render_to_response(self.get_context_data(object=self.object))
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['related_videos'] = Video.objects.filter(
-            category=self.object.category
-        ).exclude(id=self.object.id)[:5]
+        context['related_videos'] = VideoCard.objects.filter(
+            category_id=self.object.category_id
+        ).exclude(pk=self.object.pk).order_by('-publish_date')[:5]
         return context# Create your views here.